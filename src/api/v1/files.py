@@ -1,18 +1,59 @@
+import functools
 import typing as tp
 
-from fastapi import APIRouter, Depends, status, Body, Query
+from fastapi import APIRouter, Depends, status, Body, Header, Query, Request, UploadFile, File, Form
 from fastapi.responses import Response
+from fastapi.routing import APIRoute
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core import exceptions
-from core.compressors import CompressorProtocol, get_compressor
+from core.compressors import ArchiveCompressor, CompressorProtocol, get_compressor
+from core.config import settings
+from core.responses import (
+    AccelRedirectResponse,
+    FileValidators,
+    RangeFileResponse,
+    StreamFileResponse,
+    is_not_modified,
+    is_range_allowed,
+    parse_range_header,
+)
 from core.utils import Paginator, query_paginator
 from db import get_session
+from db.base import database
 from schemas import files as files_schemas, users as users_schemas
 from services import files as files_services, users as users_services
 from services.files import PreparedFileObject
 
-files_router = APIRouter()
+
+class UploadSizeCheckedRoute(APIRoute):
+    """Rejects a multipart body beyond the storage left to the user by its Content-Length, before it is spooled.
+
+    FastAPI parses a form before the dependencies of the route are solved, so the check can't be a dependency.
+    """
+
+    def get_route_handler(self) -> tp.Callable[[Request], tp.Coroutine[tp.Any, tp.Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def checked_handler(request: Request) -> Response:
+            if request.headers.get("content-type", "").startswith("multipart/form-data"):
+                await _check_upload_size(request)
+            return await handler(request)
+
+        return checked_handler
+
+
+async def _check_upload_size(request: Request) -> None:
+    content_length = request.headers.get("content-length", "")
+    if settings.app.user_storage_quota is None or not content_length.isdigit():
+        return
+    token = await users_services.oauth2_scheme(request)
+    async with database.session() as db:
+        current_user = await users_services.get_current_user(token, db)
+        await files_services.check_multipart_size(db, user_id=current_user.id, content_length=int(content_length))
+
+
+files_router = APIRouter(route_class=UploadSizeCheckedRoute)
 
 
 @files_router.get(
@@ -23,20 +64,22 @@ files_router = APIRouter()
 async def files_list(  # type: ignore
     paginator: tp.Annotated[Paginator, Depends(query_paginator)],
     current_user: tp.Annotated[users_schemas.UserOutputDBSchema, Depends(users_services.get_current_user)],
-    db: AsyncSession = Depends(get_session),
+    db: AsyncSession = Depends(users_services.get_user_read_session),
 ):
     user_id = current_user.id
-    files = await files_services.get_user_files(  # type: ignore
+    files, next_cursor = await files_services.get_user_files(  # type: ignore
         db,
         user_id=user_id.hex,
         skip=paginator.offset,
         limit=paginator.limit,
+        cursor=paginator.cursor,
     )
     return {
         "account_id": user_id,
         "files": files,
         "skip": paginator.offset,
         "limit": paginator.limit,
+        "next_cursor": next_cursor,
     }
 
 
@@ -58,6 +101,51 @@ async def upload_file(  # type: ignore
     return file_in_db
 
 
+@files_router.put(
+    "/content",
+    response_model=files_schemas.FileOutputSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def upload_file_content(  # type: ignore
+    path: tp.Annotated[str, Query(description="File path, its last segment is the file name")],
+    request: Request,
+    current_user: tp.Annotated[users_schemas.UserOutputDBSchema, Depends(users_services.get_current_user)],
+    content_length: tp.Annotated[int | None, Header(ge=0)] = None,
+    checksum: tp.Annotated[
+        str | None, Header(alias="X-Content-SHA256", description="Content sha256 hex digest")
+    ] = None,
+    db: AsyncSession = Depends(get_session),
+):
+    file_in_db = await files_services.create_file_from_stream(  # type: ignore
+        db,
+        path=path,
+        stream=request.stream(),
+        user_id=current_user.id,
+        content_length=content_length,
+        checksum=checksum,
+    )
+    return file_in_db
+
+
+@files_router.post(
+    "/upload/batch",
+    response_model=files_schemas.BatchUploadOutputSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def upload_files(  # type: ignore
+    files: tp.Annotated[list[UploadFile], File(description="Files to upload")],
+    path: tp.Annotated[str, Form(description="Directory to upload the files to")],
+    current_user: tp.Annotated[users_schemas.UserOutputDBSchema, Depends(users_services.get_current_user)],
+    db: AsyncSession = Depends(get_session),
+):
+    max_files = settings.app.batch_upload_max_files
+    if len(files) > max_files:
+        raise exceptions.BadRequestException(f"Too many files, at most {max_files} can be uploaded at once")
+
+    results = await files_services.create_files(db, uploads=files, directory=path, user_id=current_user.id)
+    return {"results": results}
+
+
 @files_router.get(
     "/download",
     response_class=Response,
@@ -66,15 +154,117 @@ async def upload_file(  # type: ignore
 async def download_file(  # type: ignore
     path: tp.Annotated[str, Query(min_length=1, description="Path to file or File ID")],
     compressor: tp.Annotated[CompressorProtocol, Depends(get_compressor)],
+    request: Request,
     current_user: tp.Annotated[users_schemas.UserOutputDBSchema, Depends(users_services.get_current_user)],
     db: AsyncSession = Depends(get_session),
 ):
-    file_obj = await files_services.get_file_by_id_or_path(db, value=path)  # type: ignore
+    file_obj = await files_services.get_file_by_id_or_path(db, user_id=current_user.id, value=path)  # type: ignore
     if file_obj is None:
         raise exceptions.FileNotFoundException(path)
 
-    full_path = await files_services.get_absolute_storage_file_path(file_obj)
-    return compressor.get_response(file_path=full_path)
+    validators = files_services.get_file_validators(file_obj, compressor=compressor)
+    if is_not_modified(request.headers, validators):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators.headers)
+
+    range_response = _get_range_response(file_obj, compressor=compressor, request=request, validators=validators)
+    if range_response is not None:
+        return range_response
+
+    response = await _get_file_response(file_obj, compressor=compressor, validators=validators)
+    response.headers.update(validators.headers)
+    if compressor.accept_ranges:
+        response.headers["Accept-Ranges"] = "bytes"
+    return response
+
+
+def _get_range_response(
+    file_obj: tp.Any, *, compressor: CompressorProtocol, request: Request, validators: FileValidators
+) -> Response | None:
+    range_header = request.headers.get("range")
+    if not compressor.accept_ranges or not range_header or not is_range_allowed(request.headers, validators):
+        return None
+    # With offloading nginx answers range requests for the redirected file itself
+    if settings.app.accel_redirect_enabled and files_services.get_storage_file_path(file_obj) is not None:
+        return None
+
+    ranges = parse_range_header(range_header, size=file_obj.size)
+    if ranges == []:
+        raise exceptions.RangeNotSatisfiableException(file_obj.size)
+    if not ranges:
+        return None
+    return RangeFileResponse(
+        functools.partial(files_services.read_file, file_obj),
+        ranges=ranges,
+        file_size=file_obj.size,
+        filename=file_obj.name,
+        headers=validators.headers,
+    )
+
+
+async def _get_file_response(
+    file_obj: tp.Any, *, compressor: CompressorProtocol, validators: FileValidators
+) -> Response:
+    full_path = files_services.get_storage_file_path(file_obj)
+    offload = settings.app.accel_redirect_enabled
+    # Contents of a remote storage are compressed through the cache only, it keeps the local copy they need
+    if compressor.cacheable and (settings.app.compressed_cache_enabled or full_path is None):
+        if offload:
+            archive_path = await files_services.get_compressed_file_path(
+                file_obj,
+                compressor=compressor,
+                validators=validators,
+            )
+            return AccelRedirectResponse(
+                archive_path,
+                filename=compressor.get_filename(file_obj.name),
+                media_type=compressor.media_type or None,
+            )
+        # Opened right away, so the file stays readable when the cache evicts it meanwhile
+        archive_file = await files_services.open_compressed_file(
+            file_obj,
+            compressor=compressor,
+            validators=validators,
+        )
+        return compressor.get_cached_response(archive_file=archive_file, filename=file_obj.name)
+
+    if full_path is None:
+        return StreamFileResponse(files_services.read_file(file_obj), size=file_obj.size, filename=file_obj.name)
+    if offload and not compressor.cacheable:
+        return AccelRedirectResponse(full_path, filename=file_obj.name)
+    return compressor.get_response(file_path=full_path, filename=file_obj.name)
+
+
+@files_router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_file(
+    path: tp.Annotated[str, Query(min_length=1, description="Path to file or File ID")],
+    current_user: tp.Annotated[users_schemas.UserOutputDBSchema, Depends(users_services.get_current_user)],
+    db: AsyncSession = Depends(get_session),
+) -> None:
+    await files_services.delete_file(db, user_id=current_user.id, value=path)
+
+
+@files_router.post(
+    "/download/bulk",
+    response_class=Response,
+    status_code=status.HTTP_200_OK,
+)
+async def bulk_download_files(  # type: ignore
+    selection: tp.Annotated[files_schemas.BulkDownloadSchema, Body()],
+    compressor: tp.Annotated[CompressorProtocol, Depends(get_compressor)],
+    current_user: tp.Annotated[users_schemas.UserOutputDBSchema, Depends(users_services.get_current_user)],
+    db: AsyncSession = Depends(get_session),
+):
+    if not issubclass(compressor, ArchiveCompressor):
+        raise exceptions.BadRequestException("Bulk download needs an archive compression type")
+
+    members = await files_services.get_archive_members(
+        db,
+        user_id=current_user.id,
+        path=selection.path,
+        ids=selection.ids,
+    )
+    filename = selection.path.strip("/").rsplit("/", 1)[-1] if selection.path else ""
+    return compressor.get_archive_response(members=members, filename=filename or "files")
 
 
 @files_router.post(
@@ -85,7 +275,11 @@ async def download_file(  # type: ignore
 async def search_files(  # type: ignore
     search_options: tp.Annotated[files_schemas.SearchDataSchema, Body()],
     current_user: tp.Annotated[users_schemas.UserOutputDBSchema, Depends(users_services.get_current_user)],
-    db: AsyncSession = Depends(get_session),
+    db: AsyncSession = Depends(users_services.get_user_read_session),
 ):
-    files = await files_services.search_files(db, search_options=search_options)  # type: ignore
-    return {"matches": files}
+    matches = await files_services.search_files(  # type: ignore
+        db,
+        user_id=current_user.id,
+        search_options=search_options,
+    )
+    return matches
@@ -1,13 +1,32 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from dataclasses import asdict
 
-from db import get_session
+from fastapi import APIRouter, Response, status
+
+from core.enums import HealthStatus
 from services import root as root_services
 
 root_router = APIRouter()
 
 
 @root_router.get("/ping", status_code=status.HTTP_200_OK)
-async def ping_services(db: AsyncSession = Depends(get_session)) -> dict:
-    database_info = await root_services.database_access_time(db)
-    return {database_info.name: database_info.access_time}
+async def ping_services(response: Response) -> dict:
+    report = await root_services.check_health()
+    if report.status == HealthStatus.fail:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    # Access times of the services stay on the top level, the way the endpoint has always reported them
+    return {
+        **{name: result.latency for name, result in report.checks.items()},
+        "status": report.status,
+        "checks": {name: asdict(result) for name, result in report.checks.items()},
+    }
+
+
+@root_router.get("/stats", status_code=status.HTTP_200_OK)
+async def services_stats() -> dict:
+    return {
+        "db_pool": asdict(root_services.database_pool_stats()),
+        "executor": asdict(root_services.executor_stats()),
+        "compressed_cache": asdict(root_services.artifact_cache_stats()),
+        "blob_cache": asdict(root_services.blob_cache_stats()),
+        "users_cache": asdict(root_services.users_cache_stats()),
+    }
@@ -0,0 +1,88 @@
+import typing as tp
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, status, Body, Query, Header, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import get_session
+from schemas import files as files_schemas, uploads as uploads_schemas, users as users_schemas
+from services import uploads as uploads_services, users as users_services
+
+uploads_router = APIRouter()
+
+
+@uploads_router.post(
+    "",
+    response_model=uploads_schemas.UploadOutputSchema,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_upload(  # type: ignore
+    upload_in: tp.Annotated[uploads_schemas.UploadInputSchema, Body()],
+    current_user: tp.Annotated[users_schemas.UserOutputDBSchema, Depends(users_services.get_current_user)],
+    db: AsyncSession = Depends(get_session),
+):
+    upload = await uploads_services.create_upload(db, upload_in=upload_in, user_id=current_user.id)
+    return upload
+
+
+@uploads_router.get(
+    "/{upload_id}",
+    response_model=uploads_schemas.UploadStatusSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def upload_status(  # type: ignore
+    upload_id: UUID,
+    current_user: tp.Annotated[users_schemas.UserOutputDBSchema, Depends(users_services.get_current_user)],
+    db: AsyncSession = Depends(get_session),
+):
+    upload = await uploads_services.get_upload(db, idx=upload_id, user_id=current_user.id)
+    return await uploads_services.get_upload_status(db, upload=upload)
+
+
+@uploads_router.put(
+    "/{upload_id}",
+    response_model=uploads_schemas.UploadPartOutputSchema,
+    status_code=status.HTTP_200_OK,
+)
+async def upload_part(  # type: ignore
+    upload_id: UUID,
+    offset: tp.Annotated[int, Query(ge=0, description="Part offset in the destination file")],
+    request: Request,
+    current_user: tp.Annotated[users_schemas.UserOutputDBSchema, Depends(users_services.get_current_user)],
+    checksum: tp.Annotated[str | None, Header(alias="X-Content-SHA256", description="Part sha256 hex digest")] = None,
+    db: AsyncSession = Depends(get_session),
+):
+    upload = await uploads_services.get_upload(db, idx=upload_id, user_id=current_user.id)
+    part = await uploads_services.write_upload_part(
+        db,
+        upload=upload,
+        offset=offset,
+        stream=request.stream(),
+        checksum=checksum,
+    )
+    return part
+
+
+@uploads_router.post(
+    "/{upload_id}/complete",
+    response_model=files_schemas.FileOutputSchema,
+    status_code=status.HTTP_201_CREATED,
+)
+async def complete_upload(  # type: ignore
+    upload_id: UUID,
+    current_user: tp.Annotated[users_schemas.UserOutputDBSchema, Depends(users_services.get_current_user)],
+    db: AsyncSession = Depends(get_session),
+):
+    upload = await uploads_services.get_upload(db, idx=upload_id, user_id=current_user.id)
+    file_in_db = await uploads_services.complete_upload(db, upload=upload)
+    return file_in_db
+
+
+@uploads_router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload(
+    upload_id: UUID,
+    current_user: tp.Annotated[users_schemas.UserOutputDBSchema, Depends(users_services.get_current_user)],
+    db: AsyncSession = Depends(get_session),
+) -> None:
+    upload = await uploads_services.get_upload(db, idx=upload_id, user_id=current_user.id)
+    await uploads_services.abort_upload(db, upload=upload)
@@ -38,5 +38,21 @@ async def auth(
         username=form_data.username,
         password=form_data.password,
     )  # type: ignore
-    access_token = users_services.create_access_token(data={"sub": user.username})
+    access_token = users_services.create_user_access_token(user)
     return {"access_token": access_token}  # type: ignore
+
+
+@user_router.post("/tokens/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_tokens(
+    current_user: tp.Annotated[users_schemas.UserCacheSchema, Depends(users_services.get_current_user)],
+    db: AsyncSession = Depends(get_session),
+) -> None:
+    await users_services.revoke_tokens(db, user_id=current_user.id, username=current_user.username)
+
+
+@user_router.get("/me/usage", response_model=users_schemas.UsageOutputSchema)
+async def get_usage(  # type: ignore
+    current_user: tp.Annotated[users_schemas.UserCacheSchema, Depends(users_services.get_current_user)],
+    db: AsyncSession = Depends(users_services.get_user_read_session),
+):
+    return await users_services.get_usage(db, user_id=current_user.id)
@@ -0,0 +1,360 @@
+"""Measures throughput and latency percentiles of the file endpoints and writes the results as JSON.
+
+Without --base-url the app runs in this process, against the database and storage directory of the environment. The
+list and search scenarios use the user created by `python -m benchmarks.seed`. With --baseline the results are
+compared to an earlier run, the exit code is 1 when a scenario got slower than --max-regression allows.
+
+Usage: python -m benchmarks.run [--base-url http://127.0.0.1:8000] [--scenarios upload,download,list,search]
+    [--requests 100] [--concurrency 8] [--output benchmark.json] [--baseline benchmark.json --max-regression 0.2]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import typing as tp
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+
+import httpx
+
+from core.enums import CompressionType
+from core.utils import Cursor
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/api/v1"
+UPLOAD_SIZES = (1024, 1024 * 1024, 16 * 1024 * 1024)
+DOWNLOAD_SIZE = 4 * 1024 * 1024
+LIST_OFFSETS = (0, 1000, 100_000, 900_000)
+LIST_LIMIT = 100
+SEARCH_QUERIES: dict[str, dict[str, tp.Any]] = {
+    "name": {"query": "f12345"},
+    "content": {"query": "zebra", "content": True},
+    "path": {"options": {"path": "/bench/d42/"}},
+    "extension": {"options": {"extension": "pdf", "order_by": {"field": "size"}}},
+}
+
+Request = tp.Callable[[httpx.AsyncClient, int], tp.Awaitable[int]]
+
+
+@dataclass(frozen=True, slots=True)
+class Latency:
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+
+@dataclass(frozen=True, slots=True)
+class ScenarioResult:
+    name: str
+    params: dict[str, tp.Any]
+    requests: int
+    errors: int
+    duration: float
+    throughput: float
+    bytes_per_second: float
+    latency: Latency
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}:{json.dumps(self.params, sort_keys=True)}"
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+async def measure(
+    client: httpx.AsyncClient,
+    name: str,
+    params: dict[str, tp.Any],
+    request: Request,
+    *,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+) -> ScenarioResult:
+    """Sends `requests` requests from `concurrency` workers, `request` returns the number of transferred bytes."""
+    for index in range(warmup):
+        await request(client, -index - 1)
+
+    latencies: list[float] = []
+    transferred = errors = 0
+    indexes = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal transferred, errors
+        for index in indexes:
+            start = time.perf_counter()
+            try:
+                transferred += await request(client, index)
+            except (httpx.HTTPError, AssertionError) as err:
+                errors += 1
+                logger.error(f"{name} request failed: {err!r}")
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    result = ScenarioResult(
+        name=name,
+        params=params,
+        requests=requests,
+        errors=errors,
+        duration=round(duration, 4),
+        throughput=round(len(latencies) / duration, 2),
+        bytes_per_second=round(transferred / duration, 2),
+        latency=Latency(
+            mean=round(sum(latencies) / len(latencies), 6) if latencies else 0.0,
+            p50=round(percentile(latencies, 0.5), 6),
+            p90=round(percentile(latencies, 0.9), 6),
+            p99=round(percentile(latencies, 0.99), 6),
+            max=round(latencies[-1], 6) if latencies else 0.0,
+        ),
+    )
+    logger.info(
+        f"{name} {params}: {result.throughput} req/s, p50 {result.latency.p50 * 1000:.1f}ms, "
+        f"p99 {result.latency.p99 * 1000:.1f}ms, {errors} errors"
+    )
+    return result
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, name: str, params: dict[str, tp.Any], request: Request, options: argparse.Namespace
+) -> ScenarioResult:
+    return await measure(
+        client,
+        name,
+        params,
+        request,
+        requests=options.requests,
+        concurrency=options.concurrency,
+        warmup=options.warmup,
+    )
+
+
+async def login(client: httpx.AsyncClient, *, username: str, password: str, register: bool = False) -> None:
+    if register:
+        response = await client.post(f"{API_PREFIX}/users/register", json={"username": username, "password": password})
+        response.raise_for_status()
+    response = await client.post(f"{API_PREFIX}/users/auth", data={"username": username, "password": password})
+    response.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+
+def upload_request(*, size: int, directory: str) -> Request:
+    content = os.urandom(size)
+
+    async def request(client: httpx.AsyncClient, index: int) -> int:
+        # Every upload gets its own content, otherwise all but the first one would be deduplicated
+        data = index.to_bytes(8, "big", signed=True) + content[8:]
+        response = await client.post(
+            f"{API_PREFIX}/files/upload",
+            files={"file": (f"{index}.bin", data)},
+            data={"path": f"{directory}/"},
+        )
+        response.raise_for_status()
+        return len(data)
+
+    return request
+
+
+def download_request(*, path: str, compression_type: CompressionType) -> Request:
+    async def request(client: httpx.AsyncClient, index: int) -> int:
+        params = {"path": path, "compression_type": compression_type.value}
+        async with client.stream("GET", f"{API_PREFIX}/files/download", params=params) as response:
+            response.raise_for_status()
+            return sum([len(chunk) async for chunk in response.aiter_bytes()])
+
+    return request
+
+
+def list_request(*, params: dict[str, tp.Any]) -> Request:
+    async def request(client: httpx.AsyncClient, index: int) -> int:
+        response = await client.get(f"{API_PREFIX}/files/list", params=params)
+        response.raise_for_status()
+        return len(response.content)
+
+    return request
+
+
+def search_request(*, body: dict[str, tp.Any]) -> Request:
+    async def request(client: httpx.AsyncClient, index: int) -> int:
+        response = await client.post(f"{API_PREFIX}/files/search", json=body)
+        response.raise_for_status()
+        return len(response.content)
+
+    return request
+
+
+async def run_upload(client: httpx.AsyncClient, options: argparse.Namespace) -> list[ScenarioResult]:
+    await login(client, username=f"bench-{uuid.uuid4().hex[:8]}", password="bench", register=True)
+    return [
+        await run_scenario(
+            client, "upload", {"size": size}, upload_request(size=size, directory=f"/upload/{size}"), options
+        )
+        for size in options.upload_sizes
+    ]
+
+
+async def run_download(client: httpx.AsyncClient, options: argparse.Namespace) -> list[ScenarioResult]:
+    await login(client, username=f"bench-{uuid.uuid4().hex[:8]}", password="bench", register=True)
+    path = "/download/file.bin"
+    response = await client.post(
+        f"{API_PREFIX}/files/upload",
+        files={"file": ("file.bin", os.urandom(options.download_size))},
+        data={"path": path},
+    )
+    response.raise_for_status()
+    return [
+        await run_scenario(
+            client,
+            "download",
+            {"size": options.download_size, "compression_type": compression_type.value},
+            download_request(path=path, compression_type=compression_type),
+            options,
+        )
+        for compression_type in CompressionType
+    ]
+
+
+async def run_list(client: httpx.AsyncClient, options: argparse.Namespace) -> list[ScenarioResult]:
+    await login(client, username=options.username, password=options.password)
+    results = []
+    for offset in options.list_offsets:
+        params = {"offset": offset, "limit": LIST_LIMIT}
+        results.append(await run_scenario(client, "list", params, list_request(params=params), options))
+        if offset < LIST_LIMIT:
+            continue
+        # The same page reached with a cursor, which points past the last file of the previous page
+        response = await client.get(
+            f"{API_PREFIX}/files/list", params={"offset": offset - LIST_LIMIT, "limit": LIST_LIMIT}
+        )
+        response.raise_for_status()
+        if not (files := response.json()["files"]):
+            continue
+        cursor = Cursor(created_at=datetime.fromisoformat(files[-1]["created_at"]), id=uuid.UUID(files[-1]["id"]))
+        cursor_params = {"cursor": cursor.encode(), "limit": LIST_LIMIT}
+        results.append(await run_scenario(client, "list_cursor", params, list_request(params=cursor_params), options))
+    return results
+
+
+async def run_search(client: httpx.AsyncClient, options: argparse.Namespace) -> list[ScenarioResult]:
+    await login(client, username=options.username, password=options.password)
+    return [
+        await run_scenario(client, "search", {"kind": kind}, search_request(body=body), options)
+        for kind, body in SEARCH_QUERIES.items()
+    ]
+
+
+SCENARIOS: dict[str, tp.Callable[[httpx.AsyncClient, argparse.Namespace], tp.Awaitable[list[ScenarioResult]]]] = {
+    "upload": run_upload,
+    "download": run_download,
+    "list": run_list,
+    "search": run_search,
+}
+
+
+def get_client(base_url: str | None) -> tuple[httpx.AsyncClient, tp.Any]:
+    """Returns a client and, when there is no base URL, the app which the client calls in this process."""
+    timeout = httpx.Timeout(300.0)
+    if base_url:
+        return httpx.AsyncClient(base_url=base_url, timeout=timeout), None
+    # Imported here, so benchmarking a remote server doesn't need the app settings
+    from main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=timeout), app
+
+
+def compare(results: list[ScenarioResult], baseline: dict[str, tp.Any], *, max_regression: float) -> list[str]:
+    """Returns the scenarios whose p99 latency or throughput got worse than `max_regression` allows."""
+    previous = {f"{item['name']}:{json.dumps(item['params'], sort_keys=True)}": item for item in baseline["results"]}
+    regressions = []
+    for result in results:
+        if (before := previous.get(result.key)) is None:
+            continue
+        if result.latency.p99 > before["latency"]["p99"] * (1 + max_regression):
+            regressions.append(f"{result.key} p99 {before['latency']['p99']:.4f}s -> {result.latency.p99:.4f}s")
+        if result.throughput < before["throughput"] * (1 - max_regression):
+            regressions.append(f"{result.key} throughput {before['throughput']} -> {result.throughput} req/s")
+    return regressions
+
+
+async def main(options: argparse.Namespace) -> int:
+    client, app = get_client(options.base_url)
+    started_at = datetime.now(timezone.utc)
+    results: list[ScenarioResult] = []
+    # The ASGI transport doesn't send lifespan events, the app handlers are run here instead
+    if app is not None:
+        await app.router.startup()
+    try:
+        async with client:
+            for name in options.scenarios:
+                client.headers.pop("Authorization", None)
+                results.extend(await SCENARIOS[name](client, options))
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+
+    report = {
+        "meta": {
+            "started_at": started_at.isoformat(),
+            "base_url": options.base_url,
+            "requests": options.requests,
+            "concurrency": options.concurrency,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": [asdict(result) for result in results],
+    }
+    with open(options.output, "w") as output:
+        json.dump(report, output, indent=2)
+    logger.info(f"Results are written to {options.output}")
+
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), max_regression=options.max_regression)
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        if regressions:
+            return 1
+    return 1 if any(result.errors for result in results) else 0
+
+
+def int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--upload-sizes", type=int_list, default=list(UPLOAD_SIZES))
+    parser.add_argument("--download-size", type=int, default=DOWNLOAD_SIZE)
+    parser.add_argument("--list-offsets", type=int_list, default=list(LIST_OFFSETS))
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,148 @@
+"""Seeds a benchmark user with many files for the list and search benchmarks.
+
+The files share a pool of small text blobs, so the content search has something to match. The same arguments always
+produce the same data, seeding again only adds the missing files.
+
+Usage: python -m benchmarks.seed [--username bench] [--password bench] [--files 1000000] [--blobs 1000]
+    [--batch-size 100000] [--seed 0]
+"""
+import argparse
+import asyncio
+import logging
+import random
+import typing as tp
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.blobs import blob_store
+from db.base import database
+from repositories.blobs import blobs_crud
+from repositories.users import users_crud
+from services.files import index_blobs_content
+from services.users import create_user, reconcile_usage
+
+logger = logging.getLogger(__name__)
+
+VOCABULARY = (
+    "invoice report forecast budget contract meeting roadmap quarterly revenue design draft release backup "
+    "schedule holiday photo archive summary notes zebra research proposal agenda payroll audit"
+).split()
+EXTENSIONS = ["pdf", "txt", "png", "md", "jpg", "csv", "tar.gz", "docx"]
+DIRECTORIES = 1000
+
+INSERT_FILES = text(
+    """
+    INSERT INTO file (id, name, path, size, is_downloadable, user_id, blob_digest, created_at, updated_at)
+    SELECT
+        gen_random_uuid(),
+        'f' || i || '.' || e.ext,
+        '/bench/d' || i % :directories || '/f' || i || '.' || e.ext,
+        b.size,
+        true,
+        :user_id,
+        b.digest,
+        now() - i * interval '1 second',
+        now() - i * interval '1 second'
+    FROM generate_series(:start, :stop - 1) AS i
+    CROSS JOIN LATERAL (SELECT (CAST(:extensions AS text[]))[1 + i % :extension_count] AS ext) AS e
+    JOIN (
+        SELECT digest, size, row_number() OVER (ORDER BY digest) - 1 AS number
+        FROM blob WHERE digest = ANY(CAST(:digests AS varchar[]))
+    ) AS b ON b.number = i % :blob_count
+    ON CONFLICT DO NOTHING
+    """
+)
+COUNT_REFERENCES = text(
+    """
+    UPDATE blob SET ref_count = counts.ref_count
+    FROM (SELECT blob_digest, count(*) AS ref_count FROM file WHERE blob_digest = ANY(CAST(:digests AS varchar[]))
+          GROUP BY blob_digest) AS counts
+    WHERE blob.digest = counts.blob_digest
+    """
+)
+
+
+def make_contents(*, count: int, seed: int) -> list[bytes]:
+    generator = random.Random(seed)
+    return [
+        f"benchmark blob {index}\n{' '.join(generator.choices(VOCABULARY, k=200))}\n".encode()
+        for index in range(count)
+    ]
+
+
+async def seed_blobs(db: AsyncSession, *, contents: list[bytes]) -> list[str]:
+    digests = {}
+    for index, content in enumerate(contents):
+
+        async def stream(data: bytes = content) -> tp.AsyncIterator[bytes]:
+            yield data
+
+        tmp_path, digest, size = await blob_store.write_stream(stream())
+        try:
+            if not await blob_store.exists(digest):
+                await blob_store.move(tmp_path, digest=digest)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        digests[digest] = f"blob{index}.txt"
+        # Zero references until the files are inserted, the counts are set afterwards
+        await blobs_crud.acquire_many(db, blobs={digest: (size, 0)})
+    await index_blobs_content(db, blobs=digests)
+    await db.commit()
+    return sorted(digests)
+
+
+async def main(*, username: str, password: str, files: int, blobs: int, batch_size: int, seed: int) -> None:
+    async with database.session() as db:
+        user = await users_crud.get_by_username(db, username=username)
+        if user is None:
+            user = await create_user(db, username=username, password=password)
+        digests = await seed_blobs(db, contents=make_contents(count=blobs, seed=seed))
+
+        for start in range(0, files, batch_size):
+            stop = min(start + batch_size, files)
+            await db.execute(
+                INSERT_FILES,
+                {
+                    "start": start,
+                    "stop": stop,
+                    "user_id": str(user.id),
+                    "directories": DIRECTORIES,
+                    "extensions": EXTENSIONS,
+                    "extension_count": len(EXTENSIONS),
+                    "digests": digests,
+                    "blob_count": len(digests),
+                },
+            )
+            await db.commit()
+            logger.info(f"Seeded {stop} of {files} files")
+
+        await db.execute(COUNT_REFERENCES, {"digests": digests})
+        await db.commit()
+        # The files bypass the services, so the usage of the user is recounted once
+        await reconcile_usage(db, user_id=user.id)
+    async with database.engine.connect() as conn:
+        await conn.execute(text("ANALYZE file, blob"))
+    await database.close()
+    await blob_store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--username", default="bench")
+    parser.add_argument("--password", default="bench")
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--blobs", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(
+        main(
+            username=args.username,
+            password=args.password,
+            files=args.files,
+            blobs=args.blobs,
+            batch_size=args.batch_size,
+            seed=args.seed,
+        )
+    )
@@ -0,0 +1,72 @@
+"""Picks the highest password hashing cost that stays within the target latency on this CPU.
+
+bcrypt is tuned by its rounds, argon2 by its time cost with the memory cost and parallelism from the settings. The
+printed settings go into the environment of the service, existing hashes are upgraded when their users log in.
+
+Usage: python -m commands.calibrate_password_hash [--scheme bcrypt] [--target-ms 250] [--samples 5]
+"""
+import argparse
+import logging
+import statistics
+import time
+
+from core.config import PasswordSettings, settings
+from core.enums import PasswordHashScheme
+from core.utils import create_crypt_context
+
+logger = logging.getLogger(__name__)
+
+COST_FIELDS = {
+    PasswordHashScheme.bcrypt: ("bcrypt_rounds", 4, 31),
+    PasswordHashScheme.argon2: ("argon2_time_cost", 1, 100),
+}
+
+
+def measure(password_settings: PasswordSettings, *, samples: int) -> float:
+    """Returns the median time of verifying a password, which is what a login costs."""
+    context = create_crypt_context(password_settings)
+    password_hash = context.hash("calibration")
+    durations = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        context.verify("calibration", password_hash)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def calibrate(
+    password_settings: PasswordSettings, *, scheme: PasswordHashScheme, target: float, samples: int
+) -> tuple[PasswordSettings, float]:
+    field, cost, max_cost = COST_FIELDS[scheme]
+    best: tuple[PasswordSettings, float] | None = None
+    while cost <= max_cost:
+        candidate = password_settings.model_copy(update={"scheme": scheme, field: cost})
+        duration = measure(candidate, samples=samples)
+        logger.info(f"{scheme.value} {field}={cost} takes {duration * 1000:.1f} ms")
+        if duration > target:
+            break
+        best = (candidate, duration)
+        cost += 1
+    if best is None:
+        raise SystemExit(f"Even the lowest cost of {scheme.value} takes longer than {target * 1000:.0f} ms")
+    return best
+
+
+def main(*, scheme: PasswordHashScheme, target_ms: float, samples: int) -> None:
+    password_settings, duration = calibrate(settings.password, scheme=scheme, target=target_ms / 1000, samples=samples)
+    field = COST_FIELDS[scheme][0]
+    print(f"# Verifying a password takes {duration * 1000:.1f} ms")
+    print(f"PASSWORD_SCHEME={scheme.value}")
+    print(f"PASSWORD_{field.upper()}={getattr(password_settings, field)}")
+    if scheme == PasswordHashScheme.argon2:
+        print(f"PASSWORD_ARGON2_MEMORY_COST={password_settings.argon2_memory_cost}")
+        print(f"PASSWORD_ARGON2_PARALLELISM={password_settings.argon2_parallelism}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scheme", type=PasswordHashScheme, default=settings.password.scheme)
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+    main(scheme=args.scheme, target_ms=args.target_ms, samples=args.samples)
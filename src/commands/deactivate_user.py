@@ -0,0 +1,36 @@
+"""Deactivates a user, their tokens are rejected from then on.
+
+The user is dropped from the cache of every worker through the shared cache, without one the workers reject the
+tokens once their cached copy of the user expires.
+
+Usage: python -m commands.deactivate_user <username>
+"""
+import argparse
+import asyncio
+import logging
+
+from core.cache import close_shared_backend
+from db.base import database
+from repositories.users import users_crud
+from services.users import deactivate_user
+
+logger = logging.getLogger(__name__)
+
+
+async def main(*, username: str) -> None:
+    async with database.session() as db:
+        user = await users_crud.get_by_username(db, username=username)
+        if user is None:
+            logger.error(f"User {username} does not exist")
+        else:
+            await deactivate_user(db, user=user)
+            logger.info(f"User(#{user.id}) has been deactivated")
+    await close_shared_backend()
+    await database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("username")
+    args = parser.parse_args()
+    asyncio.run(main(username=args.username))
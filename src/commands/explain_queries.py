@@ -0,0 +1,137 @@
+"""Prints the query plans of the file lookups and checks that they use the expected indexes.
+
+Usage: python -m commands.explain_queries [--user-id UUID] [--path /docs] [--extension pdf] [--query report]
+    [--disable-seqscan]
+"""
+import argparse
+import asyncio
+import contextlib
+import sys
+import typing as tp
+import uuid
+from datetime import datetime
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from core.enums import FileOrderByField, OrderByType
+from core.utils import Cursor
+from db.base import database
+from repositories.files import files_crud
+
+QueryCall = tp.Callable[[AsyncSession], tp.Awaitable[tp.Any]]
+
+
+@contextlib.contextmanager
+def capture_statements(engine: AsyncEngine) -> tp.Iterator[list[tuple[str, tp.Any]]]:
+    statements: list[tuple[str, tp.Any]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # type: ignore
+        statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+def get_checks(*, user_id: str, path: str, extension: str, query: str) -> dict[str, tuple[QueryCall, tuple[str, ...]]]:
+    file_id = uuid.uuid4()
+    cursor = Cursor(created_at=datetime.utcnow(), id=file_id)
+    return {
+        "get_file_by_path": (
+            lambda db: files_crud.get_file_by_path(db, user_id=user_id, target_path=path),
+            ("ix_file_user_id_path",),
+        ),
+        "get_file_by_id_or_path": (
+            lambda db: files_crud.get_file_by_id_or_path(db, user_id=user_id, idx=file_id, path=path),
+            ("ix_file_user_id_path",),
+        ),
+        "get_multi_by_user": (
+            lambda db: files_crud.get_multi_by_user(db, user_id=user_id, skip=10, limit=10),
+            ("ix_file_user_id_created_at_id",),
+        ),
+        "get_page_by_user": (
+            lambda db: files_crud.get_page_by_user(db, user_id=user_id, after=cursor, limit=10),
+            ("ix_file_user_id_created_at_id",),
+        ),
+        "search_files": (
+            lambda db: files_crud.search_files(
+                db,
+                user_id=user_id,
+                path=path,
+                extension=extension,
+                order_by_field=FileOrderByField.created_at,
+                order_by_type=OrderByType.descending,
+                limit=10,
+            ),
+            ("ix_file_user_id_path", "ix_file_user_id_extension"),
+        ),
+        "search_files_by_query": (
+            lambda db: files_crud.search_files(db, user_id=user_id, path="", extension="", query=query, limit=10),
+            ("ix_file_name_trgm",),
+        ),
+        "search_files_by_content": (
+            lambda db: files_crud.search_files(
+                db,
+                user_id=user_id,
+                path="",
+                extension="",
+                query=query,
+                content=True,
+                limit=10,
+            ),
+            ("ix_blob_content_tsv",),
+        ),
+    }
+
+
+async def explain(db: AsyncSession, call: QueryCall, *, disable_seqscan: bool) -> str:
+    with capture_statements(database.engine) as statements:
+        await call(db)
+    statement, parameters = statements[-1]
+
+    connection = await db.connection()
+    if disable_seqscan:
+        await connection.execute(text("SET LOCAL enable_seqscan = off"))
+    results = await connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+    await db.rollback()
+    return "\n".join(row[0] for row in results)
+
+
+async def main(*, user_id: uuid.UUID, path: str, extension: str, query: str, disable_seqscan: bool) -> int:
+    failed = 0
+    async with database.session() as db:
+        checks = get_checks(user_id=str(user_id), path=path, extension=extension, query=query)
+        for name, (call, indexes) in checks.items():
+            plan = await explain(db, call, disable_seqscan=disable_seqscan)
+            is_indexed = any(index in plan for index in indexes)
+            failed += not is_indexed
+            print(f"{'OK' if is_indexed else 'FAIL'} {name} (expects {' or '.join(indexes)})\n{plan}\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=uuid.UUID, default=uuid.uuid4(), help="Owner of the looked up files")
+    parser.add_argument("--path", default="/", help="Path or path prefix to look up")
+    parser.add_argument("--extension", default="txt", help="Extension to search for")
+    parser.add_argument("--query", default="report", help="Search query")
+    parser.add_argument(
+        "--disable-seqscan",
+        action="store_true",
+        help="Forbid sequential scans, useful on small databases where the planner rightly prefers them",
+    )
+    args = parser.parse_args()
+    sys.exit(
+        asyncio.run(
+            main(
+                user_id=args.user_id,
+                path=args.path,
+                extension=args.extension,
+                query=args.query,
+                disable_seqscan=args.disable_seqscan,
+            )
+        )
+    )
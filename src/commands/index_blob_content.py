@@ -0,0 +1,32 @@
+"""Indexes the text content of blobs stored before content search existed.
+
+Usage: python -m commands.index_blob_content [--batch-size 100]
+"""
+import argparse
+import asyncio
+import logging
+
+from db.base import database
+from repositories.blobs import blobs_crud
+from services.files import index_blobs_content
+
+logger = logging.getLogger(__name__)
+
+
+async def main(*, batch_size: int) -> None:
+    after = ""
+    checked = 0
+    async with database.session() as db:
+        while blobs := await blobs_crud.get_unindexed(db, after=after, limit=batch_size):
+            await index_blobs_content(db, blobs=dict(blobs))
+            await db.commit()
+            checked += len(blobs)
+            after = blobs[-1][0]
+            logger.info(f"Checked {checked} blobs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(batch_size=args.batch_size))
@@ -0,0 +1,46 @@
+"""Moves files stored at their path under the storage root into the hash sharded blob store.
+
+Files are migrated one by one while the service is running, each one keeps being served from its old path until
+it refers to the blob.
+
+Usage: python -m commands.migrate_legacy_files [--batch-size 100]
+"""
+import argparse
+import asyncio
+import logging
+
+from core import exceptions
+from core.blobs import blob_store
+from db.base import database
+from repositories.files import files_crud
+from services.files import migrate_legacy_file
+
+logger = logging.getLogger(__name__)
+
+
+async def main(*, batch_size: int) -> None:
+    after = None
+    migrated = skipped = 0
+    async with database.session() as db:
+        while files := await files_crud.get_legacy(db, after=after, limit=batch_size):
+            # A skipped file rolls the transaction back and expires the loaded files, so only their ids are kept
+            file_ids = [file_obj.id for file_obj in files]
+            after = file_ids[-1]
+            for file_id in file_ids:
+                try:
+                    is_migrated = await migrate_legacy_file(db, idx=file_id)
+                except exceptions.BadRequestException:
+                    is_migrated = False
+                if is_migrated:
+                    migrated += 1
+                else:
+                    skipped += 1
+            logger.info(f"Migrated {migrated} files, skipped {skipped} files")
+    await blob_store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(batch_size=args.batch_size))
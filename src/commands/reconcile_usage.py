@@ -0,0 +1,38 @@
+"""Recounts the storage usage of every user from their files and fixes the counters which drifted.
+
+The counters are locked per user while recounting, so it is safe to run while the service is running.
+
+Usage: python -m commands.reconcile_usage [--batch-size 100]
+"""
+import argparse
+import asyncio
+import logging
+
+from db.base import database
+from repositories.users import users_crud
+from services.users import reconcile_usage
+
+logger = logging.getLogger(__name__)
+
+
+async def main(*, batch_size: int) -> None:
+    after = None
+    checked = fixed = 0
+    async with database.session() as db:
+        while user_ids := await users_crud.get_ids(db, after=after, limit=batch_size):
+            after = user_ids[-1]
+            for user_id in user_ids:
+                size_drift, count_drift = await reconcile_usage(db, user_id=user_id)
+                checked += 1
+                if size_drift or count_drift:
+                    fixed += 1
+                    logger.warning(f"Usage of User(#{user_id}) was off by {size_drift} bytes and {count_drift} files")
+            logger.info(f"Checked {checked} users, fixed {fixed} users")
+    await database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(batch_size=args.batch_size))
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+import shutil
+import typing as tp
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from uuid import UUID
+
+from core.compressors import CompressorProtocol
+from core.config import settings
+from core.executors import executor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class FileCacheStats:
+    entries: int
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class FileCache:
+    """Keeps files built on demand, the least recently used ones are evicted past `max_size` bytes."""
+
+    def __init__(self, root: Path, *, max_size: int) -> None:
+        self._root = root
+        self._tmp_directory = root / "tmp"
+        self._max_size = max_size
+        self._entries: OrderedDict[Path, int] = OrderedDict()
+        self._size = 0
+        self._pending: dict[Path, asyncio.Task] = {}
+        # Held while a built file is put into place or a directory is removed, so the two never interleave
+        self._lock = asyncio.Lock()
+        self._loaded = False
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    def _scan(self) -> list[tuple[Path, int]]:
+        entries = []
+        for path in self._root.glob("*/*"):
+            if path.parent == self._tmp_directory or not path.is_file():
+                continue
+            stat = path.stat()
+            entries.append((stat.st_atime, path, stat.st_size))
+        return [(path, size) for _, path, size in sorted(entries)]
+
+    async def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        for path, size in await executor.run_in_thread(self._scan):
+            self._entries[path] = size
+            self._size += size
+        await self._evict()
+
+    @staticmethod
+    def _unlink(paths: list[Path]) -> None:
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    async def _evict(self) -> None:
+        # The entries are dropped on the loop, so the accounting stays consistent while the files are unlinked
+        evicted = []
+        while self._size > self._max_size and len(self._entries) > 1:
+            path, size = self._entries.popitem(last=False)
+            self._size -= size
+            self._evictions += 1
+            evicted.append(path)
+            logger.info(f"Evict cached file {path}")
+        if evicted:
+            await executor.run_in_thread(self._unlink, evicted)
+
+    def _forget(self, path: Path) -> None:
+        size = self._entries.pop(path, None)
+        if size is not None:
+            self._size -= size
+
+    @staticmethod
+    def _place(tmp_path: Path, path: Path) -> int:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        size = tmp_path.stat().st_size
+        os.replace(tmp_path, path)
+        return size
+
+    async def _create(self, path: Path, build: tp.Callable[[Path], tp.Awaitable[None]]) -> Path:
+        logger.info(f"Build cached file {path}")
+        tmp_path = self._tmp_directory / uuid.uuid4().hex
+        try:
+            await executor.run_in_thread(self._tmp_directory.mkdir, parents=True, exist_ok=True)
+            await build(tmp_path)
+            async with self._lock:
+                size = await executor.run_in_thread(self._place, tmp_path, path)
+                self._forget(path)
+                self._entries[path] = size
+                self._size += size
+        finally:
+            await executor.run_in_thread(tmp_path.unlink, missing_ok=True)
+
+        await self._evict()
+        return path
+
+    async def get_or_build(self, path: Path, *, build: tp.Callable[[Path], tp.Awaitable[None]]) -> Path:
+        """Returns the cached file at `path`, `build` writes it to the given temporary path on a miss."""
+        await self._load()
+        if path in self._entries:
+            if await executor.run_in_thread(path.exists):
+                self._entries.move_to_end(path)
+                self._hits += 1
+                return path
+            self._forget(path)
+
+        # Concurrent requests for the same file wait for a single build, which outlives any one of them
+        task = self._pending.get(path)
+        if task is None:
+            self._misses += 1
+            task = asyncio.ensure_future(self._create(path, build))
+            task.add_done_callback(lambda _: self._pending.pop(path, None))
+            self._pending[path] = task
+        else:
+            self._hits += 1
+        return await asyncio.shield(task)
+
+    async def open(self, path: Path, *, build: tp.Callable[[Path], tp.Awaitable[None]]) -> tp.BinaryIO:
+        """Same as `get_or_build`, but the file is returned opened, so an eviction can't unlink it before it's read.
+
+        The file is built again when it is evicted between the build and the opening.
+        """
+        while True:
+            await self.get_or_build(path, build=build)
+            try:
+                return await executor.run_in_thread(path.open, "rb")
+            except FileNotFoundError:
+                logger.info(f"Cached file {path} was evicted before it was opened")
+
+    async def remove(self, path: Path) -> None:
+        self._forget(path)
+        await executor.run_in_thread(path.unlink, missing_ok=True)
+
+    async def remove_directory(self, directory: Path) -> None:
+        """Removes the cached files in `directory`, the builds of files there which are in progress are waited for.
+
+        Files which are built after the removal has started are kept.
+        """
+        pending = [task for path, task in self._pending.items() if path.parent == directory]
+        if pending:
+            await asyncio.wait(pending)
+        async with self._lock:
+            for path in [path for path in self._entries if path.parent == directory]:
+                self._forget(path)
+            await executor.run_in_thread(shutil.rmtree, directory, ignore_errors=True)
+
+    def stats(self) -> FileCacheStats:
+        return FileCacheStats(
+            entries=len(self._entries),
+            size=self._size,
+            max_size=self._max_size,
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+        )
+
+
+class CompressedArtifactCache(FileCache):
+    def get_path(self, file_id: UUID, *, version: str) -> Path:
+        return self._root / file_id.hex / version
+
+    @staticmethod
+    def _build(compressor: CompressorProtocol, source_path: Path, arcname: str, target_path: Path) -> None:
+        chunk_size = settings.app.download_chunk_size
+        with target_path.open("wb") as target:
+            for chunk in compressor.iter_content(source_path, arcname=arcname, chunk_size=chunk_size):
+                target.write(chunk)
+
+    def _get_builder(
+        self,
+        compressor: CompressorProtocol,
+        get_source_path: tp.Callable[[], tp.Awaitable[Path]],
+        arcname: str,
+    ) -> tp.Callable[[Path], tp.Awaitable[None]]:
+        async def build(target_path: Path) -> None:
+            source_path = await get_source_path()
+            await executor.run_in_thread(self._build, compressor, source_path, arcname, target_path)
+
+        return build
+
+    async def get_or_create(
+        self,
+        file_id: UUID,
+        *,
+        version: str,
+        compressor: CompressorProtocol,
+        get_source_path: tp.Callable[[], tp.Awaitable[Path]],
+        arcname: str,
+    ) -> Path:
+        build = self._get_builder(compressor, get_source_path, arcname)
+        return await self.get_or_build(self.get_path(file_id, version=version), build=build)
+
+    async def open_or_create(
+        self,
+        file_id: UUID,
+        *,
+        version: str,
+        compressor: CompressorProtocol,
+        get_source_path: tp.Callable[[], tp.Awaitable[Path]],
+        arcname: str,
+    ) -> tp.BinaryIO:
+        build = self._get_builder(compressor, get_source_path, arcname)
+        return await self.open(self.get_path(file_id, version=version), build=build)
+
+    async def invalidate(self, file_id: UUID) -> None:
+        await self.remove_directory(self._root / file_id.hex)
+
+
+artifact_cache = CompressedArtifactCache(
+    settings.app.storage_directory / "cache" / "compressed",
+    max_size=settings.app.compressed_cache_max_size,
+)
@@ -0,0 +1,200 @@
+import hashlib
+import os
+import time
+import typing as tp
+import uuid
+from pathlib import Path
+
+from fastapi import UploadFile
+
+from core.artifacts import FileCache, FileCacheStats
+from core.config import settings
+from core.executors import executor
+from core.readers import iter_file_object, iter_file_range
+from core.storages import StorageBackend, get_storage_backend
+from core.writers import replace_file, save_file_object, save_stream
+
+
+class BlobStore:
+    """Keeps file contents in a storage backend, addressed by their sha256 digest."""
+
+    def __init__(self, backend: StorageBackend, *, tmp_directory: Path, cache: FileCache) -> None:
+        self._backend = backend
+        self._tmp_directory = tmp_directory
+        self._cache = cache
+
+    @staticmethod
+    def get_key(digest: str) -> str:
+        return f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+    def get_path(self, digest: str) -> Path | None:
+        """Returns the blob path when the backend keeps it on the local file system."""
+        return self._backend.get_local_path(self.get_key(digest))
+
+    def _get_cache_path(self, digest: str) -> Path:
+        return self._cache.root / digest[:2] / digest
+
+    async def get_local_path(self, digest: str) -> Path:
+        """Returns a local path of the blob, a blob of a remote backend is downloaded to the local cache first."""
+        if (path := self.get_path(digest)) is not None:
+            return path
+
+        async def download(target_path: Path) -> None:
+            await save_stream(
+                self.read(digest),
+                file_path=target_path,
+                buffer_size=settings.app.upload_buffer_size,
+                fsync=False,
+            )
+
+        return await self._cache.get_or_build(self._get_cache_path(digest), build=download)
+
+    async def exists(self, digest: str) -> bool:
+        return await self._backend.exists(self.get_key(digest))
+
+    def read(self, digest: str, *, start: int = 0, end: int | None = None) -> tp.AsyncIterator[bytes]:
+        return self._backend.read(self.get_key(digest), start=start, end=end)
+
+    async def read_head(self, digest: str, *, size: int) -> bytes:
+        if size <= 0:
+            return b""
+        return b"".join([chunk async for chunk in self.read(digest, end=size - 1)])
+
+    @staticmethod
+    def _digest_file(file_obj: tp.BinaryIO, chunk_size: int) -> tuple[str, int]:
+        hasher = hashlib.sha256()
+        size = 0
+        file_obj.seek(0)
+        while chunk := file_obj.read(chunk_size):
+            hasher.update(chunk)
+            size += len(chunk)
+        file_obj.seek(0)
+        return hasher.hexdigest(), size
+
+    @classmethod
+    def _digest_path(cls, file_path: Path, chunk_size: int) -> tuple[str, int]:
+        with file_path.open("rb") as file_obj:
+            return cls._digest_file(file_obj, chunk_size)
+
+    async def get_digest(self, upload: UploadFile) -> tuple[str, int]:
+        return await executor.run_in_thread(self._digest_file, upload.file, settings.app.hash_chunk_size)
+
+    async def get_path_digest(self, file_path: Path) -> tuple[str, int]:
+        return await executor.run_in_thread(self._digest_path, file_path, settings.app.hash_chunk_size)
+
+    def _get_tmp_path(self) -> Path:
+        self._tmp_directory.mkdir(parents=True, exist_ok=True)
+        return self._tmp_directory / uuid.uuid4().hex
+
+    def _store(self, file_obj: tp.BinaryIO, *, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._get_tmp_path()
+        try:
+            save_file_object(
+                file_obj,
+                file_path=tmp_path,
+                buffer_size=settings.app.upload_buffer_size,
+                fsync=settings.app.upload_fsync,
+            )
+            replace_file(tmp_path, path, fsync=settings.app.upload_fsync)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    async def write(self, upload: UploadFile, *, digest: str) -> None:
+        path = self.get_path(digest)
+        if path is None:
+            content = iter_file_object(upload.file, chunk_size=settings.app.upload_buffer_size)
+            await self._backend.write(self.get_key(digest), executor.iterate(content))
+            return
+        # Starlette has already spooled the upload, a file on disk is copied in the kernel
+        await executor.run_in_thread(self._store, upload.file, path=path)
+
+    def _link(self, source_path: Path, *, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._get_tmp_path()
+        try:
+            os.link(source_path, tmp_path)
+        except OSError:
+            # Another file system or no hard link support, the content is copied then
+            with source_path.open("rb") as file_obj:
+                self._store(file_obj, path=path)
+            return
+        try:
+            replace_file(tmp_path, path, fsync=settings.app.upload_fsync)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    async def copy(self, source_path: Path, *, digest: str) -> None:
+        """Stores a local file as a blob and leaves the file in place, a local backend links it without copying."""
+        path = self.get_path(digest)
+        if path is None:
+            content = iter_file_range(source_path, chunk_size=settings.app.upload_buffer_size)
+            await self._backend.write(self.get_key(digest), executor.iterate(content))
+            return
+        await executor.run_in_thread(self._link, source_path, path=path)
+
+    async def write_stream(self, stream: tp.AsyncIterator[bytes]) -> tuple[Path, str, int]:
+        """Writes a stream of unknown content to a local file and returns the file path, its digest and size.
+
+        With the local backend the file is on the blobs file system, so `move` puts it into place with a rename and
+        syncs it then. The caller removes the file when the blob is not needed.
+        """
+        hasher = hashlib.sha256()
+        tmp_path = await executor.run_in_thread(self._get_tmp_path)
+        try:
+            size = await save_stream(
+                stream,
+                file_path=tmp_path,
+                buffer_size=settings.app.upload_buffer_size,
+                fsync=False,
+                on_buffer=hasher.update,
+            )
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return tmp_path, hasher.hexdigest(), size
+
+    async def move(self, source_path: Path, *, digest: str) -> None:
+        await self._backend.move_file(self.get_key(digest), source_path)
+
+    async def remove(self, digest: str) -> None:
+        await self._backend.delete(self.get_key(digest))
+        if self.get_path(digest) is None:
+            await self._cache.remove(self._get_cache_path(digest))
+
+    async def check(self) -> dict[str, float]:
+        """Writes, reads and deletes a small object and returns the latency of every step."""
+        key = f"health/{uuid.uuid4().hex}"
+        data = os.urandom(1024)
+
+        async def content() -> tp.AsyncIterator[bytes]:
+            yield data
+
+        latencies = {}
+        start = time.perf_counter()
+        await self._backend.write(key, content())
+        latencies["write"] = round(time.perf_counter() - start, 4)
+        try:
+            start = time.perf_counter()
+            if b"".join([chunk async for chunk in self._backend.read(key)]) != data:
+                raise RuntimeError("Storage returned other content than written")
+            latencies["read"] = round(time.perf_counter() - start, 4)
+        finally:
+            start = time.perf_counter()
+            await self._backend.delete(key)
+            latencies["delete"] = round(time.perf_counter() - start, 4)
+        return latencies
+
+    def cache_stats(self) -> FileCacheStats:
+        """Returns the stats of the local copies of remote blobs."""
+        return self._cache.stats()
+
+    async def close(self) -> None:
+        await self._backend.close()
+
+
+blob_store = BlobStore(
+    get_storage_backend(settings.app.storage_directory / "blobs", storage_settings=settings.storage),
+    tmp_directory=settings.app.storage_directory / "blobs" / "tmp",
+    cache=FileCache(settings.app.storage_directory / "cache" / "blobs", max_size=settings.storage.cache_max_size),
+)
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import time
+import typing as tp
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from core.config import settings
+
+try:
+    from redis import asyncio as aioredis
+except ImportError:  # pragma: no cover
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+T = tp.TypeVar("T")
+
+
+@dataclass(frozen=True, slots=True)
+class CacheStats:
+    name: str
+    size: int
+    max_size: int
+    hits: int
+    shared_hits: int
+    misses: int
+    hit_ratio: float
+
+
+class TTLCache(tp.Generic[T]):
+    def __init__(self, *, ttl: float, max_size: int) -> None:
+        self._ttl = ttl
+        self._max_size = max_size
+        self._entries: OrderedDict[str, tuple[float, T]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    def get(self, key: str) -> T | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: T, *, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self._ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class RedisBackend:
+    def __init__(self, url: str) -> None:
+        if aioredis is None:
+            raise RuntimeError("Install the redis package to use a shared cache backend")
+        self._client = aioredis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> str | None:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: str, *, ttl: float) -> None:
+        await self._client.set(key, value, ex=max(int(ttl), 1))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(key)
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self._client.publish(channel, message)
+
+    async def subscribe(self, channel: str) -> tp.AsyncIterator[str]:
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                yield message["data"]
+        finally:
+            await pubsub.close()
+
+    async def ping(self) -> bool:
+        return bool(await self._client.ping())
+
+    async def close(self) -> None:
+        await self._client.close()
+
+
+class LayeredCache(tp.Generic[T]):
+    """Keeps values locally in front of a shared backend, a deletion is published to the other workers.
+
+    A worker drops its local copy as soon as it receives the deletion, if the message is lost, e.g. while the
+    shared backend is unavailable, the copy stays stale until its `local_ttl` expires.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        ttl: float,
+        local_ttl: float,
+        max_size: int,
+        shared: RedisBackend | None,
+        dumps: tp.Callable[[T], str],
+        loads: tp.Callable[[str], T],
+    ) -> None:
+        self.name = name
+        self._ttl = ttl
+        # With a shared backend the local copy is a short-lived front of it, which deletions usually drop earlier
+        self._local: TTLCache[T] = TTLCache(ttl=local_ttl if shared is not None else ttl, max_size=max_size)
+        self._shared = shared
+        self._dumps = dumps
+        self._loads = loads
+        self._hits = 0
+        self._shared_hits = 0
+        self._misses = 0
+        self._task: asyncio.Task | None = None
+
+    def _key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    @property
+    def _channel(self) -> str:
+        return f"{self.name}:deleted"
+
+    async def get(self, key: str) -> T | None:
+        value = self._local.get(key)
+        if value is not None:
+            self._hits += 1
+            return value
+
+        if self._shared is not None:
+            try:
+                raw_value = await self._shared.get(self._key(key))
+            except Exception as err:
+                logger.error(f"Shared cache is unavailable: {err}")
+                raw_value = None
+            if raw_value is not None:
+                value = self._loads(raw_value)
+                self._local.set(key, value)
+                self._shared_hits += 1
+                return value
+
+        self._misses += 1
+        return None
+
+    async def set(self, key: str, value: T) -> None:
+        self._local.set(key, value)
+        if self._shared is not None:
+            try:
+                await self._shared.set(self._key(key), self._dumps(value), ttl=self._ttl)
+            except Exception as err:
+                logger.error(f"Shared cache is unavailable: {err}")
+
+    async def delete(self, key: str) -> None:
+        self._local.delete(key)
+        if self._shared is not None:
+            try:
+                await self._shared.delete(self._key(key))
+                await self._shared.publish(self._channel, key)
+            except Exception as err:
+                logger.error(f"Shared cache is unavailable: {err}")
+
+    async def _listen(self, shared: RedisBackend) -> None:
+        while True:
+            try:
+                async for key in shared.subscribe(self._channel):
+                    self._local.delete(key)
+            except Exception as err:
+                logger.error(f"Shared cache is unavailable: {err}")
+            # Deletions published meanwhile are missed, the local copies are short-lived anyway
+            await asyncio.sleep(1.0)
+
+    def start(self) -> None:
+        if self._shared is not None and self._task is None:
+            self._task = asyncio.create_task(self._listen(self._shared))
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> CacheStats:
+        lookups = self._hits + self._shared_hits + self._misses
+        return CacheStats(
+            name=self.name,
+            size=len(self._local),
+            max_size=self._local.max_size,
+            hits=self._hits,
+            shared_hits=self._shared_hits,
+            misses=self._misses,
+            hit_ratio=round((self._hits + self._shared_hits) / lookups, 3) if lookups else 0.0,
+        )
+
+
+shared_backend: RedisBackend | None = RedisBackend(settings.cache.redis_url) if settings.cache.redis_url else None
+
+
+async def close_shared_backend() -> None:
+    if shared_backend is not None:
+        await shared_backend.close()
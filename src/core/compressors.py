@@ -1,99 +1,264 @@
+import os
 import tarfile
+import tempfile
+import time
 import typing as tp
 import zipfile
-from io import BytesIO
+from collections import deque
 from pathlib import Path
 
 import py7zr
 from fastapi import Query
 from fastapi.responses import Response, FileResponse, StreamingResponse
 
+from core.config import settings
 from core.enums import CompressionType
+from core.executors import executor
+from core.metrics import compression_duration, compression_ratio
+from core.readers import iter_files_chunks, iter_opened_file
+from core.responses import StreamFileResponse, content_disposition
+
+ArchiveMember = tuple[Path, str]
+
+
+class ChunkSink:
+    """Write-only file object which keeps written bytes until the response generator drains them."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
 
 
 class CompressorProtocol(tp.Protocol):
     suffix: str
     media_type: str
+    accept_ranges: bool = False
+    cacheable: bool = False
 
     @staticmethod
     def prepare_file_path(file_path: str | Path) -> Path:
         return file_path if isinstance(file_path, Path) else Path(file_path)
 
     @classmethod
-    def get_response(cls, *, file_path: str | Path) -> Response:
+    def get_filename(cls, filename: str) -> str:
+        return filename
+
+    @classmethod
+    def iter_content(cls, file_path: Path, *, arcname: str, chunk_size: int) -> tp.Iterator[bytes]:
+        return cls.iter_archive([(file_path, arcname)], chunk_size=chunk_size)
+
+    @classmethod
+    def iter_archive(
+        cls, members: tp.Iterable[ArchiveMember], *, chunk_size: int, read_ahead: bool = False
+    ) -> tp.Iterator[bytes]:
+        raise NotImplementedError
+
+    @classmethod
+    def get_cached_response(cls, *, archive_file: tp.BinaryIO, filename: str) -> Response:
+        raise NotImplementedError
+
+    @classmethod
+    def get_response(cls, *, file_path: str | Path, filename: str | None = None) -> Response:
         raise NotImplementedError
 
 
 class NoneCompressor(CompressorProtocol):
     suffix = ""
     media_type = ""
+    accept_ranges = True
 
     @classmethod
-    def get_response(cls, *, file_path: str | Path) -> FileResponse:
+    def get_response(cls, *, file_path: str | Path, filename: str | None = None) -> FileResponse:
         file_path = cls.prepare_file_path(file_path)
-        return FileResponse(path=file_path.absolute(), filename=file_path.name)
+        return FileResponse(path=file_path.absolute(), filename=filename or file_path.name)
 
 
-class ZipCompressor(CompressorProtocol):
-    suffix = ".zip"
-    media_type = "application/x-zip-compressed"
+class ArchiveCompressor(CompressorProtocol):
+    compression_type: CompressionType
+    cacheable = True
+
+    @classmethod
+    def iter_content(cls, file_path: Path, *, arcname: str, chunk_size: int) -> tp.Iterator[bytes]:
+        return cls.iter_observed_archive([(file_path, arcname)], chunk_size=chunk_size)
+
+    @classmethod
+    def iter_observed_archive(
+        cls, members: tp.Iterable[ArchiveMember], *, chunk_size: int, read_ahead: bool = False
+    ) -> tp.Iterator[bytes]:
+        # Members may be produced lazily and taken once, so their sizes are collected as they are archived
+        source_sizes: list[int] = []
+        members = measure_members(members, sizes=source_sizes)
+        content = cls.iter_archive(members, chunk_size=chunk_size, read_ahead=read_ahead)
+        return cls.observe(content, source_sizes=source_sizes)
+
+    @classmethod
+    def observe(cls, content: tp.Iterator[bytes], *, source_sizes: list[int]) -> tp.Iterator[bytes]:
+        """Measures the time spent in producing the archive, the time its consumer takes isn't counted."""
+        elapsed = 0.0
+        size = 0
+        start = time.perf_counter()
+        for chunk in content:
+            elapsed += time.perf_counter() - start
+            size += len(chunk)
+            yield chunk
+            start = time.perf_counter()
+        elapsed += time.perf_counter() - start
+
+        compression_duration.labels(cls.compression_type.value).observe(elapsed)
+        if source_size := sum(source_sizes):
+            compression_ratio.labels(cls.compression_type.value).observe(size / source_size)
+
+    @classmethod
+    def get_filename(cls, filename: str) -> str:
+        return f"{Path(filename).stem}{cls.suffix}"
+
+    @classmethod
+    def get_cached_response(cls, *, archive_file: tp.BinaryIO, filename: str) -> StreamFileResponse:
+        chunk_size = settings.app.download_chunk_size
+        return StreamFileResponse(
+            executor.iterate(iter_opened_file(archive_file, chunk_size=chunk_size)),
+            size=os.fstat(archive_file.fileno()).st_size,
+            filename=cls.get_filename(filename),
+            media_type=cls.media_type,
+        )
 
     @classmethod
-    def get_response(cls, *, file_path: str | Path) -> StreamingResponse:
+    def get_response(cls, *, file_path: str | Path, filename: str | None = None) -> StreamingResponse:
         file_path = cls.prepare_file_path(file_path)
-        buffer = BytesIO()
-        file_suffix = file_path.suffix
-        zip_filename = file_path.name.replace(file_suffix, cls.suffix)
-        with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as zip_file:
-            zip_file.write(file_path.absolute())
-            zip_file.close()
+        arcname = filename or file_path.name
+        content = cls.iter_content(file_path.absolute(), arcname=arcname, chunk_size=settings.app.download_chunk_size)
+        return StreamingResponse(
+            executor.iterate(content),
+            media_type=cls.media_type,
+            headers={"Content-Disposition": content_disposition(cls.get_filename(arcname))},
+        )
 
+    @classmethod
+    def get_archive_response(cls, *, members: tp.Iterable[ArchiveMember], filename: str) -> StreamingResponse:
+        content = cls.iter_observed_archive(members, chunk_size=settings.app.download_chunk_size, read_ahead=True)
         return StreamingResponse(
-            iter([buffer.getvalue()]),
+            # Members of a remote storage are downloaded while the archive is written, see `iter_archive_members`
+            executor.iterate_on_thread(content, depth=max(settings.app.read_ahead_depth, 1)),
             media_type=cls.media_type,
-            headers={"Content-Disposition": "attachment; filename=%s" % zip_filename},
+            headers={"Content-Disposition": content_disposition(f"{filename}{cls.suffix}")},
         )
 
 
-class TarCompressor(CompressorProtocol):
+class ZipCompressor(ArchiveCompressor):
+    compression_type = CompressionType.zip
+    suffix = ".zip"
+    media_type = "application/x-zip-compressed"
+
+    @classmethod
+    def iter_archive(
+        cls, members: tp.Iterable[ArchiveMember], *, chunk_size: int, read_ahead: bool = False
+    ) -> tp.Iterator[bytes]:
+        sink = ChunkSink()
+        contents = iter_members_contents(members, chunk_size=chunk_size, read_ahead=read_ahead)
+        with zipfile.ZipFile(sink, mode="w") as zip_file:
+            for file_path, arcname, content in contents:
+                zip_info = zipfile.ZipInfo.from_file(file_path, arcname=arcname)
+                zip_info.compress_type = zipfile.ZIP_DEFLATED
+                with zip_file.open(zip_info, mode="w") as entry:
+                    for chunk in content:
+                        entry.write(chunk)
+                        if data := sink.drain():
+                            yield data
+
+        if data := sink.drain():
+            yield data
+
+
+class TarCompressor(ArchiveCompressor):
+    compression_type = CompressionType.tar
     suffix = ".tar.gz"
     media_type = "application/x-gtar"
 
     @classmethod
-    def get_response(cls, *, file_path: str | Path) -> StreamingResponse:
-        file_path = cls.prepare_file_path(file_path)
-        buffer = BytesIO()
-        file_suffix = file_path.suffix
-        tar_filename = file_path.name.replace(file_suffix, cls.suffix)
-        with tarfile.open(fileobj=buffer, mode="w:gz") as tar_file:
-            tar_file.add(file_path.absolute(), arcname=file_path.name, recursive=False)
-            tar_file.close()
+    def iter_archive(
+        cls, members: tp.Iterable[ArchiveMember], *, chunk_size: int, read_ahead: bool = False
+    ) -> tp.Iterator[bytes]:
+        sink = ChunkSink()
+        contents = iter_members_contents(members, chunk_size=chunk_size, read_ahead=read_ahead)
+        with tarfile.open(fileobj=sink, mode="w|gz") as tar_file:  # type: ignore[call-overload]
+            for file_path, arcname, content in contents:
+                tar_info = tar_file.gettarinfo(file_path, arcname=arcname)
+                # Same steps as TarFile.addfile, split up so that the member body is compressed chunk by chunk
+                header = tar_info.tobuf(tar_file.format, tar_file.encoding, tar_file.errors)
+                tar_file.fileobj.write(header)
+                for chunk in content:
+                    tar_file.fileobj.write(chunk)
+                    if data := sink.drain():
+                        yield data
 
-        return StreamingResponse(
-            iter([buffer.getvalue()]),
-            media_type=cls.media_type,
-            headers={"Content-Disposition": "attachment; filename=%s" % tar_filename},
-        )
+                blocks, remainder = divmod(tar_info.size, tarfile.BLOCKSIZE)
+                if remainder > 0:
+                    tar_file.fileobj.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+                    blocks += 1
+                tar_file.offset += len(header) + blocks * tarfile.BLOCKSIZE
+                tar_file.members.append(tar_info)
+
+        if data := sink.drain():
+            yield data
 
 
-class SevenZCompressor(CompressorProtocol):
+class SevenZCompressor(ArchiveCompressor):
+    compression_type = CompressionType.seven_z
     suffix = ".7z"
     media_type = "application/x-7z-compressed"
 
     @classmethod
-    def get_response(cls, *, file_path: str | Path) -> StreamingResponse:
-        file_path = cls.prepare_file_path(file_path)
-        buffer = BytesIO()
-        file_suffix = file_path.suffix
-        seven_z_filename = file_path.name.replace(file_suffix, cls.suffix)
-        with py7zr.SevenZipFile(file=buffer, mode="w") as archive_file:
-            archive_file.write(file_path.absolute(), arcname=file_path.name)
+    def iter_archive(
+        cls, members: tp.Iterable[ArchiveMember], *, chunk_size: int, read_ahead: bool = False
+    ) -> tp.Iterator[bytes]:
+        # 7z needs a seekable output to write its header, so the archive is spooled first
+        with tempfile.SpooledTemporaryFile(max_size=settings.app.spool_max_size) as spool:
+            with py7zr.SevenZipFile(file=spool, mode="w") as archive_file:
+                for file_path, arcname in members:
+                    archive_file.write(file_path, arcname=arcname)
 
-        return StreamingResponse(
-            iter([buffer.getvalue()]),
-            media_type=cls.media_type,
-            headers={"Content-Disposition": "attachment; filename=%s" % seven_z_filename},
-        )
+            spool.seek(0)
+            while chunk := spool.read(chunk_size):
+                yield chunk
+
+
+def measure_members(members: tp.Iterable[ArchiveMember], *, sizes: list[int]) -> tp.Iterator[ArchiveMember]:
+    for file_path, arcname in members:
+        sizes.append(file_path.stat().st_size)
+        yield file_path, arcname
+
+
+def iter_members_contents(
+    members: tp.Iterable[ArchiveMember], *, chunk_size: int, read_ahead: bool
+) -> tp.Iterator[tuple[Path, str, tp.Iterator[bytes]]]:
+    # The paths may be taken by the read-ahead thread, the names follow them in the same order
+    arcnames: deque[str] = deque()
+
+    def iter_paths() -> tp.Iterator[Path]:
+        for file_path, arcname in members:
+            arcnames.append(arcname)
+            yield file_path
+
+    contents = iter_files_chunks(
+        iter_paths(),
+        chunk_size=chunk_size,
+        depth=settings.app.read_ahead_depth if read_ahead else 0,
+        window=settings.app.read_ahead_window,
+    )
+    for file_path, content in contents:
+        yield file_path, arcnames.popleft(), content
 
 
 COMPRESSORS_MAP: tp.Mapping[str, CompressorProtocol] = {
@@ -3,10 +3,11 @@ from logging import config as logging_config
 from pathlib import Path
 
 from dotenv import load_dotenv
-from pydantic import PostgresDsn, field_validator
+from pydantic import Field, PostgresDsn, field_validator
 from pydantic_core.core_schema import ValidationInfo
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from core.enums import ExecutorKind, PasswordHashScheme, StorageBackendKind
 from core.logger import LOGGING
 
 logging_config.dictConfig(LOGGING)
@@ -24,6 +25,18 @@ class JWTSettings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     token_type: str = "Bearer"
+    verified_cache_size: int = 10_000
+
+
+class PasswordSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="password_")
+
+    scheme: PasswordHashScheme = PasswordHashScheme.bcrypt
+    bcrypt_rounds: int = Field(12, ge=4, le=31)
+    argon2_time_cost: int = Field(2, ge=1)
+    # In KiB
+    argon2_memory_cost: int = Field(65536, ge=8)
+    argon2_parallelism: int = Field(2, ge=1)
 
 
 class ApplicationSettings(BaseSettings):
@@ -36,12 +49,83 @@ class ApplicationSettings(BaseSettings):
     docs_url: str = "/docs"
     openapi_url: str = "/openapi.json"
     storage_directory: Path = BASE_DIR / "storage"
+    download_chunk_size: int = 64 * 1024
+    spool_max_size: int = 16 * 1024 * 1024
+    hash_chunk_size: int = 1024 * 1024
+    upload_buffer_size: int = 4 * 1024 * 1024
+    upload_fsync: bool = True
+    user_storage_quota: int | None = None
+    upload_part_max_size: int = 64 * 1024 * 1024
+    max_byte_ranges: int = 16
+    compressed_cache_enabled: bool = True
+    compressed_cache_max_size: int = 1024 * 1024 * 1024
+    accel_redirect_enabled: bool = False
+    accel_redirect_location: str = "/protected/"
+    bulk_download_max_files: int = 10_000
+    batch_upload_max_files: int = 1000
+    read_ahead_depth: int = 16
+    read_ahead_window: int = 8
 
     def model_post_init(self, __context: tp.Any) -> None:
         if not self.storage_directory.exists():
             self.storage_directory.mkdir(parents=True, exist_ok=True)
 
 
+class MetricsSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="metrics_")
+
+    enabled: bool = True
+    path: str = "/metrics"
+
+
+class HealthSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="health_")
+
+    ttl: float = 2.0
+    timeout: float = 3.0
+    min_free_space: int = 1024 * 1024 * 1024
+
+
+class ExecutorSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="executor_")
+
+    kind: ExecutorKind = ExecutorKind.thread
+    max_workers: int = 4
+
+
+class CacheSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="cache_")
+
+    redis_url: str | None = None
+    user_ttl: int = 60
+    user_local_ttl: int = 5
+    user_max_size: int = 10_000
+
+
+class StorageSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="storage_")
+
+    backend: StorageBackendKind = StorageBackendKind.local
+    s3_bucket: str = "files"
+    s3_prefix: str = ""
+    s3_endpoint_url: str | None = None
+    s3_region: str | None = None
+    s3_access_key_id: str | None = None
+    s3_secret_access_key: str | None = None
+    s3_part_size: int = Field(8 * 1024 * 1024, ge=5 * 1024 * 1024)
+    s3_part_concurrency: int = 4
+    s3_max_pool_connections: int = 32
+    cache_max_size: int = 10 * 1024 * 1024 * 1024
+
+
+class SearchSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="search_")
+
+    content_enabled: bool = True
+    content_max_size: int = 256 * 1024
+    text_config: str = Field("simple", pattern=r"^[a-z_]+$")
+
+
 class DatabaseSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="postgres_")
 
@@ -51,7 +135,18 @@ class DatabaseSettings(BaseSettings):
     host: str
     port: int
     echo: bool = False
+    pool_size: int = Field(10, ge=1)
+    pool_max_overflow: int = Field(10, ge=0)
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_cache_size: int = Field(100, ge=0)
+    connect_timeout: float = 10.0
+    command_timeout: float | None = None
     dsn: PostgresDsn | None = None
+    replica_dsns: list[PostgresDsn] = []
+    replica_check_interval: float = 5.0
+    replica_max_lag: float = 5.0
 
     @field_validator("dsn", mode="before")
     def assemble_db_connection(cls, value: PostgresDsn | str, info: ValidationInfo) -> PostgresDsn:
@@ -71,7 +166,14 @@ class DatabaseSettings(BaseSettings):
 class Settings(BaseSettings):
     app: ApplicationSettings = ApplicationSettings()
     jwt: JWTSettings = JWTSettings()
+    password: PasswordSettings = PasswordSettings()
     db: DatabaseSettings = DatabaseSettings()
+    executor: ExecutorSettings = ExecutorSettings()
+    cache: CacheSettings = CacheSettings()
+    search: SearchSettings = SearchSettings()
+    storage: StorageSettings = StorageSettings()
+    metrics: MetricsSettings = MetricsSettings()
+    health: HealthSettings = HealthSettings()
 
 
 settings = Settings()
@@ -11,3 +11,38 @@ class CompressionType(str, Enum):
 class OrderByType(str, Enum):
     ascending = "asc"
     descending = "desc"
+
+
+class FileOrderByField(str, Enum):
+    name = "name"
+    path = "path"
+    size = "size"
+    created_at = "created_at"
+
+
+class FileUploadStatus(str, Enum):
+    created = "created"
+    updated = "updated"
+    unchanged = "unchanged"
+    failed = "failed"
+
+
+class ExecutorKind(str, Enum):
+    thread = "thread"
+    process = "process"
+
+
+class StorageBackendKind(str, Enum):
+    local = "local"
+    s3 = "s3"
+
+
+class PasswordHashScheme(str, Enum):
+    bcrypt = "bcrypt"
+    argon2 = "argon2"
+
+
+class HealthStatus(str, Enum):
+    ok = "ok"
+    degraded = "degraded"
+    fail = "fail"
@@ -27,6 +27,22 @@ class BadRequestException(BaseHTTPException):
         super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=detail, headers=headers)
 
 
+class RangeNotSatisfiableException(BaseHTTPException):
+    def __init__(self, size: int):
+        detail = "Requested range not satisfiable"
+        headers = {"Content-Range": f"bytes */{size}"}
+        super().__init__(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail=detail, headers=headers)
+
+
+class PayloadTooLargeException(BaseHTTPException):
+    base_detail: str = "Payload too large"
+
+    def __init__(self, detail: tp.Any = None, headers: tp.Dict[str, str] | None = None):
+        if detail is None:
+            detail = self.base_detail
+        super().__init__(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail, headers=headers)
+
+
 class UnauthorizedException(BaseHTTPException):
     base_detail: str = "Could not validate credentials"
     base_headers: tp.Dict[str, str] = {"WWW-Authenticate": settings.jwt.token_type}
@@ -45,3 +61,7 @@ class UserNotFoundException(NotFoundException):
 
 class FileNotFoundException(NotFoundException):
     entity_name: str = "File"
+
+
+class UploadNotFoundException(NotFoundException):
+    entity_name: str = "Upload"
@@ -0,0 +1,198 @@
+import asyncio
+import functools
+import threading
+import typing as tp
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from core.config import settings
+from core.enums import ExecutorKind
+
+T = tp.TypeVar("T")
+
+_SENTINEL = object()
+
+
+@dataclass(frozen=True, slots=True)
+class ExecutorStats:
+    kind: str
+    max_workers: int
+    in_flight: int
+    active: int
+    queue_depth: int
+    saturation: float
+    submitted: int
+    completed: int
+
+
+@dataclass(frozen=True, slots=True)
+class _Raised:
+    error: BaseException
+
+
+class _ThreadProducer:
+    """Passes the items of an iterator from its own thread to the event loop, the thread owns the iterator."""
+
+    def __init__(self, iterator: tp.Iterator, *, depth: int, loop: asyncio.AbstractEventLoop) -> None:
+        self._iterator = iterator
+        self._loop = loop
+        self._items: asyncio.Queue = asyncio.Queue()
+        self._slots = threading.Semaphore(depth)
+        self._stopped = threading.Event()
+
+    def _put(self, item: tp.Any) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._items.put_nowait, item)
+        except RuntimeError:
+            # The loop is closed, nobody waits for the items anymore
+            self._stopped.set()
+
+    def _produce(self) -> None:
+        try:
+            for item in self._iterator:
+                self._slots.acquire()
+                if self._stopped.is_set():
+                    return
+                self._put(item)
+            self._put(_SENTINEL)
+        except BaseException as err:
+            self._put(_Raised(err))
+        finally:
+            close = getattr(self._iterator, "close", None)
+            if close is not None:
+                close()
+
+    def start(self) -> None:
+        threading.Thread(target=self._produce, name="iterate", daemon=True).start()
+
+    async def get(self) -> tp.Any:
+        item = await self._items.get()
+        if isinstance(item, _Raised):
+            raise item.error
+        self._slots.release()
+        return item
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._slots.release()
+
+
+class _PoolCounters:
+    def __init__(self, max_workers: int) -> None:
+        self.max_workers = max_workers
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+
+
+class TaskExecutor:
+    def __init__(self, *, kind: ExecutorKind, max_workers: int) -> None:
+        self._kind = kind
+        self._max_workers = max_workers
+        self._pool: Executor | None = None
+        self._iter_pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._counters: dict[int, _PoolCounters] = {}
+
+    @property
+    def pool(self) -> Executor:
+        if self._pool is None:
+            if self._kind == ExecutorKind.process:
+                self._pool = ProcessPoolExecutor(max_workers=self._max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="executor")
+        return self._pool
+
+    @property
+    def iter_pool(self) -> ThreadPoolExecutor:
+        # Generators and open files can't be sent to another process, so they are always handled on threads
+        if self._kind == ExecutorKind.thread:
+            return self.pool  # type: ignore[return-value]
+        if self._iter_pool is None:
+            self._iter_pool = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="executor-iter")
+        return self._iter_pool
+
+    def _submit(self, pool: Executor, func: tp.Callable[..., T], *args: tp.Any) -> Future:
+        with self._lock:
+            counters = self._counters.setdefault(id(pool), _PoolCounters(self._max_workers))
+            counters.in_flight += 1
+            counters.submitted += 1
+
+        def on_done(_: Future) -> None:
+            with self._lock:
+                counters.in_flight -= 1
+                counters.completed += 1
+
+        future = pool.submit(func, *args)
+        future.add_done_callback(on_done)
+        return future
+
+    async def run(self, func: tp.Callable[..., T], /, *args: tp.Any, **kwargs: tp.Any) -> T:
+        if kwargs:
+            func = functools.partial(func, **kwargs)
+        return await asyncio.wrap_future(self._submit(self.pool, func, *args))
+
+    async def run_in_thread(self, func: tp.Callable[..., T], /, *args: tp.Any, **kwargs: tp.Any) -> T:
+        if kwargs:
+            func = functools.partial(func, **kwargs)
+        return await asyncio.wrap_future(self._submit(self.iter_pool, func, *args))
+
+    async def iterate(self, iterator: tp.Iterator[T]) -> tp.AsyncIterator[T]:
+        pending: Future | None = None
+        try:
+            while True:
+                pending = self._submit(self.iter_pool, next, iterator, _SENTINEL)
+                item = await asyncio.wrap_future(pending)
+                if item is _SENTINEL:
+                    break
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                # A cancelled `next` keeps running in the pool, the generator can be closed only after it returns
+                if pending is None:
+                    close()
+                else:
+                    pending.add_done_callback(lambda _: self._submit(self.iter_pool, close))
+
+    @staticmethod
+    async def iterate_on_thread(iterator: tp.Iterator[T], *, depth: int) -> tp.AsyncIterator[T]:
+        """Runs the iterator on a thread of its own, keeping up to `depth` items ahead of the consumer.
+
+        It is meant for iterators which wait for the event loop, e.g. for a download. On a pool thread such waits
+        could take all the threads, while the awaited tasks need the pool themselves.
+        """
+        producer = _ThreadProducer(iterator, depth=depth, loop=asyncio.get_running_loop())
+        producer.start()
+        try:
+            while (item := await producer.get()) is not _SENTINEL:
+                yield item
+        finally:
+            producer.stop()
+
+    def stats(self) -> ExecutorStats:
+        with self._lock:
+            counters = list(self._counters.values())
+        max_workers = sum(c.max_workers for c in counters) or self._max_workers
+        in_flight = sum(c.in_flight for c in counters)
+        active = sum(min(c.in_flight, c.max_workers) for c in counters)
+        return ExecutorStats(
+            kind=self._kind.value,
+            max_workers=max_workers,
+            in_flight=in_flight,
+            active=active,
+            queue_depth=in_flight - active,
+            saturation=round(active / max_workers, 3),
+            submitted=sum(c.submitted for c in counters),
+            completed=sum(c.completed for c in counters),
+        )
+
+    def shutdown(self) -> None:
+        for pool in (self._pool, self._iter_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._iter_pool = None
+        self._counters.clear()
+
+
+executor = TaskExecutor(kind=settings.executor.kind, max_workers=settings.executor.max_workers)
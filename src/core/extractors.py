@@ -0,0 +1,37 @@
+import mimetypes
+
+TEXT_MEDIA_TYPES = {
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "application/x-sh",
+    "application/x-yaml",
+    "application/sql",
+}
+SNIFF_SIZE = 8 * 1024
+
+
+def is_text_media_type(filename: str) -> bool | None:
+    media_type = mimetypes.guess_type(filename)[0]
+    if media_type is None:
+        return None
+    return media_type.startswith("text/") or media_type in TEXT_MEDIA_TYPES
+
+
+def extract_text(content: bytes, *, filename: str) -> str | None:
+    """Returns the text of the leading bytes of a plain text file, None for anything that doesn't look like text."""
+    is_text = is_text_media_type(filename)
+    if is_text is False:
+        return None
+
+    # Unknown types are taken for text only when the head has no NUL bytes and decodes cleanly
+    if is_text is None:
+        head = content[:SNIFF_SIZE]
+        if b"\x00" in head:
+            return None
+        try:
+            head.decode("utf-8")
+        except UnicodeDecodeError as err:
+            if err.start < len(head) - 3:
+                return None
+    return content.decode("utf-8", errors="ignore").replace("\x00", "")
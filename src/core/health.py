@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+import typing as tp
+from dataclasses import dataclass, field
+
+from core.enums import HealthStatus
+
+logger = logging.getLogger(__name__)
+
+ProbeFunction = tp.Callable[[], tp.Awaitable[dict[str, tp.Any] | None]]
+
+
+class ProbeWarning(Exception):
+    """Raised by a probe when its service works but needs attention, e.g. the disk is almost full."""
+
+    def __init__(self, message: str, details: dict[str, tp.Any] | None = None) -> None:
+        super().__init__(message)
+        self.details = details or {}
+
+
+@dataclass(frozen=True, slots=True)
+class ProbeResult:
+    status: HealthStatus
+    latency: float
+    details: dict[str, tp.Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True, slots=True)
+class HealthReport:
+    status: HealthStatus
+    checks: dict[str, ProbeResult]
+
+
+@dataclass(frozen=True, slots=True)
+class Probe:
+    func: ProbeFunction
+    critical: bool
+
+
+class HealthChecker:
+    """Runs the registered probes concurrently and keeps the report for `ttl` seconds.
+
+    Concurrent callers share a single run, so frequent load balancer checks cost at most one run per `ttl`.
+    """
+
+    def __init__(self, *, ttl: float, timeout: float) -> None:
+        self._ttl = ttl
+        self._timeout = timeout
+        self._probes: dict[str, Probe] = {}
+        self._report: HealthReport | None = None
+        self._expires_at = 0.0
+        self._pending: asyncio.Future | None = None
+
+    def register(self, name: str, func: ProbeFunction, *, critical: bool = True) -> None:
+        """A failing critical probe fails the whole report, others only degrade it."""
+        self._probes[name] = Probe(func=func, critical=critical)
+
+    async def _run_probe(self, name: str, probe: Probe) -> ProbeResult:
+        start = time.perf_counter()
+        try:
+            details = await asyncio.wait_for(probe.func(), timeout=self._timeout)
+        except ProbeWarning as err:
+            status, details = HealthStatus.degraded, {**err.details, "error": str(err)}
+        except asyncio.TimeoutError:
+            status, details = HealthStatus.fail, {"error": f"Timed out after {self._timeout}s"}
+        except Exception as err:
+            logger.error(f"Health probe {name} failed: {err!r}")
+            status, details = HealthStatus.fail, {"error": repr(err)}
+        else:
+            status = HealthStatus.ok
+        return ProbeResult(status=status, latency=round(time.perf_counter() - start, 4), details=details or {})
+
+    async def _run(self) -> HealthReport:
+        names = list(self._probes)
+        results = await asyncio.gather(*(self._run_probe(name, self._probes[name]) for name in names))
+        checks = dict(zip(names, results))
+        status = HealthStatus.ok
+        for name, result in checks.items():
+            if result.status == HealthStatus.ok:
+                continue
+            if result.status == HealthStatus.fail and self._probes[name].critical:
+                status = HealthStatus.fail
+                break
+            status = HealthStatus.degraded
+        return HealthReport(status=status, checks=checks)
+
+    async def check(self) -> HealthReport:
+        if self._report is not None and time.monotonic() < self._expires_at:
+            return self._report
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._run())
+            self._pending.add_done_callback(self._store)
+        return await asyncio.shield(self._pending)
+
+    def _store(self, future: asyncio.Future) -> None:
+        self._pending = None
+        if not future.cancelled() and future.exception() is None:
+            self._report = future.result()
+            self._expires_at = time.monotonic() + self._ttl
@@ -0,0 +1,118 @@
+import os
+import time
+import typing as tp
+
+from fastapi import Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    disable_created_metrics,
+    generate_latest,
+    multiprocess,
+)
+
+# Every sample is exposed as is, without the `_created` timestamps of the series
+disable_created_metrics()
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request until its response is sent completely.",
+    labelnames=("method", "route", "status"),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+http_request_body_bytes = Counter(
+    "http_request_body_bytes_total", "Bytes received in request bodies.", labelnames=("method", "route")
+)
+http_response_body_bytes = Counter(
+    "http_response_body_bytes_total", "Bytes sent in response bodies.", labelnames=("method", "route")
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds",
+    "Time of executing a statement and fetching its cursor, by statement kind.",
+    labelnames=("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+db_pool_checkout_duration = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time of waiting for a pooled database connection, including opening a new one.",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+compression_duration = Histogram(
+    "compression_duration_seconds",
+    "Time spent producing compressed content, reading the sources included.",
+    labelnames=("compression_type",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+compression_ratio = Histogram(
+    "compression_ratio",
+    "Compressed size divided by the size of the sources.",
+    labelnames=("compression_type",),
+    buckets=(0.1, 0.25, 0.5, 0.75, 0.9, 1.0, 1.1),
+)
+password_hash_duration = Histogram(
+    "password_hash_duration_seconds",
+    "Time of hashing or verifying a password, waiting for the executor included.",
+    labelnames=("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+class MetricsMiddleware:
+    """Measures every HTTP request and the size of its bodies, labelled by route template to bound the cardinality."""
+
+    def __init__(self, app: tp.Callable) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: tp.Callable, send: tp.Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = "500"
+        received = sent = 0
+
+        async def receive_wrapper() -> dict:
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.labels(method, route, status).observe(time.perf_counter() - start)
+            if received:
+                http_request_body_bytes.labels(method, route).inc(received)
+            if sent:
+                http_response_body_bytes.labels(method, route).inc(sent)
+
+
+def get_registry() -> CollectorRegistry:
+    """Returns the registry to expose, it merges the metrics of all worker processes in the multiprocess mode.
+
+    The mode is on when `PROMETHEUS_MULTIPROC_DIR` is set for every worker, the directory has to be emptied before
+    the workers are started.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(generate_latest(get_registry()), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import typing as tp
+from collections import deque
+from pathlib import Path
+
+_END_OF_FILE = object()
+_END_OF_FILES = object()
+
+
+class ReadAheadReader:
+    """Reads a sequence of files on a background thread, keeping up to `depth` chunks ahead of the consumer.
+
+    The kernel is also asked to prefetch the next `window` files, so disk reads overlap with the archive compression.
+    The paths are taken on the background thread as well, so they may be produced lazily.
+    """
+
+    def __init__(self, paths: tp.Iterable[Path], *, chunk_size: int, depth: int, window: int) -> None:
+        self._paths = paths
+        self._chunk_size = chunk_size
+        self._window = window
+        self._queue: queue.Queue = queue.Queue(maxsize=depth)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._read, name="read-ahead", daemon=True)
+        self._started = False
+
+    @staticmethod
+    def _advise(path: Path) -> None:
+        if not hasattr(os, "posix_fadvise"):
+            return
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+    def _put(self, item: tp.Any) -> bool:
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _iter_paths(self) -> tp.Iterator[Path]:
+        paths = iter(self._paths)
+        upcoming: deque[Path] = deque()
+        while True:
+            while len(upcoming) <= self._window and (path := next(paths, None)) is not None:
+                if self._window:
+                    self._advise(path)
+                upcoming.append(path)
+            if not upcoming:
+                return
+            yield upcoming.popleft()
+
+    def _read(self) -> None:
+        try:
+            for path in self._iter_paths():
+                if not self._put(path):
+                    return
+                with path.open("rb") as file:
+                    while chunk := file.read(self._chunk_size):
+                        if not self._put(chunk):
+                            return
+                if not self._put(_END_OF_FILE):
+                    return
+            self._put(_END_OF_FILES)
+        except BaseException as err:
+            self._put(err)
+
+    def _get(self) -> tp.Any:
+        item = self._queue.get()
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def iter_files(self) -> tp.Iterator[tuple[Path, tp.Iterator[bytes]]]:
+        """Yields each path with its chunk iterator, each one has to be exhausted before the next file is taken."""
+        if not self._started:
+            self._started = True
+            self._thread.start()
+        try:
+            while (path := self._get()) is not _END_OF_FILES:
+                if not isinstance(path, Path):
+                    raise RuntimeError("Read-ahead reader is out of sync")
+                yield path, iter(self._get, _END_OF_FILE)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._stopped.set()
+
+
+def iter_files_chunks(
+    paths: tp.Iterable[Path], *, chunk_size: int, depth: int = 0, window: int = 0
+) -> tp.Iterator[tuple[Path, tp.Iterator[bytes]]]:
+    if depth <= 0:
+        for path in paths:
+            yield path, _iter_file(path, chunk_size=chunk_size)
+        return
+    yield from ReadAheadReader(paths, chunk_size=chunk_size, depth=depth, window=window).iter_files()
+
+
+def _iter_file(path: Path, *, chunk_size: int) -> tp.Iterator[bytes]:
+    with path.open("rb") as file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+def iter_file_range(path: Path, *, chunk_size: int, start: int = 0, end: int | None = None) -> tp.Iterator[bytes]:
+    """Yields the bytes from `start` to the inclusive `end`, or to the end of the file."""
+    with path.open("rb") as file:
+        file.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            chunk = file.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def iter_opened_file(file_obj: tp.BinaryIO, *, chunk_size: int) -> tp.Iterator[bytes]:
+    """Yields the chunks of a file opened by the caller and closes it."""
+    with file_obj:
+        while chunk := file_obj.read(chunk_size):
+            yield chunk
+
+
+def iter_file_object(file_obj: tp.BinaryIO, *, chunk_size: int) -> tp.Iterator[bytes]:
+    file_obj.seek(0)
+    while chunk := file_obj.read(chunk_size):
+        yield chunk
@@ -0,0 +1,211 @@
+import mimetypes
+import typing as tp
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import quote
+
+from fastapi.responses import Response, StreamingResponse
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+from core.config import settings
+
+ByteRange = tuple[int, int]
+RangeReader = tp.Callable[..., tp.AsyncIterator[bytes]]
+
+
+@dataclass(frozen=True, slots=True)
+class FileValidators:
+    etag: str
+    last_modified: datetime
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {"ETag": self.etag, "Last-Modified": format_datetime(self.last_modified, usegmt=True)}
+
+
+def make_validators(*, etag: str, last_modified: datetime) -> FileValidators:
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return FileValidators(etag=f'"{etag}"', last_modified=last_modified.replace(microsecond=0))
+
+
+def _parse_http_date(value: str) -> datetime | None:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def _strip_weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def is_not_modified(request_headers: Headers, validators: FileValidators) -> bool:
+    if if_none_match := request_headers.get("if-none-match"):
+        etags = {_strip_weak(value.strip()) for value in if_none_match.split(",")}
+        return "*" in etags or validators.etag in etags
+
+    if if_modified_since := request_headers.get("if-modified-since"):
+        since = _parse_http_date(if_modified_since)
+        return since is not None and validators.last_modified <= since
+    return False
+
+
+def is_range_allowed(request_headers: Headers, validators: FileValidators) -> bool:
+    if_range = request_headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', "W/")):
+        return if_range == validators.etag
+    return _parse_http_date(if_range) == validators.last_modified
+
+
+def _parse_range_spec(spec: str, *, size: int) -> ByteRange | None:
+    """Returns the satisfiable part of a single range, raises ValueError for a malformed one."""
+    first, separator, last = spec.strip().partition("-")
+    # int() alone would take signs, underscores and whitespace too
+    if not separator or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        raise ValueError(f"Malformed range: {spec}")
+    if not first:
+        length = int(last)
+        return (max(size - length, 0), size - 1) if length > 0 and size > 0 else None
+
+    start = int(first)
+    end = int(last) if last else max(start, size - 1)
+    if start < 0 or end < start:
+        raise ValueError(f"Malformed range: {spec}")
+    return (start, min(end, size - 1)) if start < size else None
+
+
+def _coalesce_ranges(ranges: tp.Iterable[ByteRange]) -> list[ByteRange]:
+    coalesced: list[ByteRange] = []
+    for start, end in sorted(ranges):
+        if coalesced and start <= coalesced[-1][1] + 1:
+            coalesced[-1] = (coalesced[-1][0], max(coalesced[-1][1], end))
+        else:
+            coalesced.append((start, end))
+    return coalesced
+
+
+def parse_range_header(value: str, *, size: int) -> list[ByteRange] | None:
+    """Returns satisfiable inclusive byte ranges, or None when the header has to be ignored."""
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    try:
+        ranges = [_parse_range_spec(item, size=size) for item in spec.split(",")]
+    except ValueError:
+        return None
+
+    coalesced = _coalesce_ranges(byte_range for byte_range in ranges if byte_range is not None)
+    if len(coalesced) > settings.app.max_byte_ranges:
+        return None
+    return coalesced
+
+
+def content_disposition(filename: str) -> str:
+    quoted_filename = quote(filename)
+    if quoted_filename != filename:
+        return f"attachment; filename*=utf-8''{quoted_filename}"
+    return f'attachment; filename="{filename}"'
+
+
+class AccelRedirectResponse(Response):
+    def __init__(
+        self,
+        path: Path,
+        *,
+        filename: str,
+        media_type: str | None = None,
+        headers: tp.Mapping[str, str] | None = None,
+    ) -> None:
+        relative_path = path.relative_to(settings.app.storage_directory)
+        location = f"{settings.app.accel_redirect_location.rstrip('/')}/{quote(relative_path.as_posix())}"
+        response_headers = {"X-Accel-Redirect": location, "Content-Disposition": content_disposition(filename)}
+        response_headers.update(headers or {})
+        media_type = media_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        super().__init__(media_type=media_type, headers=response_headers)
+
+
+class StreamFileResponse(StreamingResponse):
+    def __init__(
+        self,
+        content: tp.AsyncIterator[bytes],
+        *,
+        size: int,
+        filename: str,
+        headers: tp.Mapping[str, str] | None = None,
+        media_type: str | None = None,
+    ) -> None:
+        response_headers = {"Content-Disposition": content_disposition(filename), "Content-Length": str(size)}
+        response_headers.update(headers or {})
+        media_type = media_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        super().__init__(content, media_type=media_type, headers=response_headers)
+
+
+class RangeFileResponse(Response):
+    """Sends byte ranges of a file, `read` is called with the `start` and inclusive `end` of every range."""
+
+    def __init__(
+        self,
+        read: RangeReader,
+        *,
+        ranges: list[ByteRange],
+        file_size: int,
+        filename: str,
+        headers: tp.Mapping[str, str] | None = None,
+    ) -> None:
+        self.read = read
+        self.ranges = ranges
+        self.file_size = file_size
+        self.status_code = 206
+        self.background = None
+
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        response_headers = {"Content-Disposition": content_disposition(filename), "Accept-Ranges": "bytes"}
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.media_type = content_type
+            self._parts: list[tuple[bytes, ByteRange]] = [(b"", ranges[0])]
+            self._closing = b""
+            response_headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+        else:
+            boundary = uuid.uuid4().hex
+            self.media_type = f"multipart/byteranges; boundary={boundary}"
+            self._parts = [
+                (
+                    (
+                        f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+                        f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+                    ).encode("latin-1"),
+                    (start, end),
+                )
+                for start, end in ranges
+            ]
+            self._closing = f"--{boundary}--\r\n".encode("latin-1")
+
+        content_length = len(self._closing) + sum(
+            len(preamble) + (end - start + 1) + (2 if len(ranges) > 1 else 0) for preamble, (start, end) in self._parts
+        )
+        response_headers["Content-Length"] = str(content_length)
+        response_headers.update(headers or {})
+        self.init_headers(response_headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        is_multipart = len(self._parts) > 1
+        for preamble, (start, end) in self._parts:
+            if preamble:
+                await send({"type": "http.response.body", "body": preamble, "more_body": True})
+            async for chunk in self.read(start=start, end=end):
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            if is_multipart:
+                await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+        await send({"type": "http.response.body", "body": self._closing, "more_body": False})
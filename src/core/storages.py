@@ -0,0 +1,302 @@
+import abc
+import asyncio
+import contextlib
+import logging
+import os
+import typing as tp
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from core.config import StorageSettings, settings
+from core.enums import StorageBackendKind
+from core.executors import executor
+from core.readers import iter_file_range
+from core.writers import move_file, replace_file, save_stream
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session as get_aiobotocore_session
+    from botocore.exceptions import ClientError
+except ImportError:  # pragma: no cover
+    get_aiobotocore_session = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class ObjectStat:
+    size: int
+    modified_at: datetime
+
+
+class StorageBackend(abc.ABC):
+    """Stores objects by key, keys are relative slash separated paths."""
+
+    @abc.abstractmethod
+    async def write(self, key: str, stream: tp.AsyncIterator[bytes]) -> int:
+        """Stores the stream under `key` and returns its size, readers never see a partially written object."""
+
+    @abc.abstractmethod
+    async def move_file(self, key: str, file_path: Path) -> None:
+        """Stores a local file under `key`, the file is consumed."""
+
+    @abc.abstractmethod
+    def read(self, key: str, *, start: int = 0, end: int | None = None) -> tp.AsyncIterator[bytes]:
+        """Yields the object bytes from `start` to the inclusive `end`, or to the end of the object."""
+
+    @abc.abstractmethod
+    async def stat(self, key: str) -> ObjectStat | None:
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    async def exists(self, key: str) -> bool:
+        return await self.stat(key) is not None
+
+    def get_local_path(self, key: str) -> Path | None:
+        """Returns the path of the object on the local file system, None for remote storages."""
+        return None
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: Path, *, chunk_size: int, buffer_size: int, fsync: bool) -> None:
+        self._root = root
+        self._tmp_directory = root / "tmp"
+        self._chunk_size = chunk_size
+        self._buffer_size = buffer_size
+        self._fsync = fsync
+
+    def get_local_path(self, key: str) -> Path:
+        return self._root / key
+
+    async def write(self, key: str, stream: tp.AsyncIterator[bytes]) -> int:
+        path = self.get_local_path(key)
+        await executor.run_in_thread(path.parent.mkdir, parents=True, exist_ok=True)
+        await executor.run_in_thread(self._tmp_directory.mkdir, parents=True, exist_ok=True)
+        tmp_path = self._tmp_directory / uuid.uuid4().hex
+        try:
+            size = await save_stream(stream, file_path=tmp_path, buffer_size=self._buffer_size, fsync=self._fsync)
+            await executor.run_in_thread(replace_file, tmp_path, path, fsync=self._fsync)
+        finally:
+            await executor.run_in_thread(tmp_path.unlink, missing_ok=True)
+        return size
+
+    async def move_file(self, key: str, file_path: Path) -> None:
+        await executor.run_in_thread(move_file, file_path, self.get_local_path(key), fsync=self._fsync)
+
+    async def read(self, key: str, *, start: int = 0, end: int | None = None) -> tp.AsyncIterator[bytes]:
+        content = iter_file_range(self.get_local_path(key), chunk_size=self._chunk_size, start=start, end=end)
+        async for chunk in executor.iterate(content):
+            yield chunk
+
+    async def stat(self, key: str) -> ObjectStat | None:
+        try:
+            stat = await executor.run_in_thread(os.stat, self.get_local_path(key))
+        except FileNotFoundError:
+            return None
+        return ObjectStat(size=stat.st_size, modified_at=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc))
+
+    async def exists(self, key: str) -> bool:
+        return await executor.run_in_thread(self.get_local_path(key).exists)
+
+    async def delete(self, key: str) -> None:
+        await executor.run_in_thread(self.get_local_path(key).unlink, missing_ok=True)
+
+
+class MultipartUpload:
+    def __init__(self, client: tp.Any, *, bucket: str, key: str, upload_id: str, concurrency: int) -> None:
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._upload_id = upload_id
+        self._concurrency = concurrency
+        self._parts: list[asyncio.Task] = []
+        self._pending: set[asyncio.Task] = set()
+
+    @classmethod
+    async def create(cls, client: tp.Any, *, bucket: str, key: str, concurrency: int) -> "MultipartUpload":
+        response = await client.create_multipart_upload(Bucket=bucket, Key=key)
+        return cls(client, bucket=bucket, key=key, upload_id=response["UploadId"], concurrency=concurrency)
+
+    async def _upload_part(self, number: int, body: bytes) -> dict:
+        response = await self._client.upload_part(
+            Bucket=self._bucket, Key=self._key, UploadId=self._upload_id, PartNumber=number, Body=body
+        )
+        return {"PartNumber": number, "ETag": response["ETag"]}
+
+    async def send_part(self, body: bytes) -> None:
+        part = asyncio.ensure_future(self._upload_part(len(self._parts) + 1, body))
+        self._parts.append(part)
+        self._pending.add(part)
+        # At most `concurrency` parts are held in memory and sent at once
+        if len(self._pending) >= self._concurrency:
+            done, self._pending = await asyncio.wait(self._pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+
+    async def complete(self, last_part: bytes) -> None:
+        if last_part:
+            await self.send_part(last_part)
+        parts = await asyncio.gather(*self._parts)
+        await self._client.complete_multipart_upload(
+            Bucket=self._bucket, Key=self._key, UploadId=self._upload_id, MultipartUpload={"Parts": parts}
+        )
+
+    async def abort(self) -> None:
+        logger.error(f"Abort multipart upload of {self._key}")
+        for part in self._parts:
+            part.cancel()
+        await asyncio.gather(*self._parts, return_exceptions=True)
+        with contextlib.suppress(Exception):
+            await asyncio.shield(
+                self._client.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id)
+            )
+
+
+class S3Storage(StorageBackend):
+    """Stores objects in an S3 compatible bucket, large objects are sent as concurrent multipart uploads."""
+
+    def __init__(
+        self,
+        bucket: str,
+        *,
+        prefix: str = "",
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        access_key_id: str | None = None,
+        secret_access_key: str | None = None,
+        part_size: int,
+        part_concurrency: int,
+        max_pool_connections: int,
+        chunk_size: int,
+    ) -> None:
+        if get_aiobotocore_session is None:
+            raise RuntimeError("Install the aiobotocore package to use the S3 storage backend")
+        self._bucket = bucket
+        self._prefix = prefix.strip("/")
+        self._client_options = {
+            "endpoint_url": endpoint_url,
+            "region_name": region,
+            "aws_access_key_id": access_key_id,
+            "aws_secret_access_key": secret_access_key,
+            "config": AioConfig(max_pool_connections=max_pool_connections),
+        }
+        self._part_size = part_size
+        self._part_concurrency = part_concurrency
+        self._chunk_size = chunk_size
+        self._client: tp.Any = None
+        self._exit_stack: contextlib.AsyncExitStack | None = None
+        self._lock = asyncio.Lock()
+
+    def _get_object_key(self, key: str) -> str:
+        return f"{self._prefix}/{key}" if self._prefix else key
+
+    async def _get_client(self) -> tp.Any:
+        # A single client is shared, so all requests reuse its connection pool
+        if self._client is None:
+            async with self._lock:
+                if self._client is None:
+                    exit_stack = contextlib.AsyncExitStack()
+                    session = get_aiobotocore_session()
+                    self._client = await exit_stack.enter_async_context(
+                        session.create_client("s3", **self._client_options)
+                    )
+                    self._exit_stack = exit_stack
+        return self._client
+
+    async def write(self, key: str, stream: tp.AsyncIterator[bytes]) -> int:
+        client = await self._get_client()
+        object_key = self._get_object_key(key)
+        buffer = bytearray()
+        size = 0
+        upload: MultipartUpload | None = None
+        try:
+            async for chunk in stream:
+                buffer += chunk
+                size += len(chunk)
+                if len(buffer) >= self._part_size:
+                    if upload is None:
+                        upload = await MultipartUpload.create(
+                            client, bucket=self._bucket, key=object_key, concurrency=self._part_concurrency
+                        )
+                    data, buffer = bytes(buffer), bytearray()
+                    await upload.send_part(data)
+
+            if upload is None:
+                await client.put_object(Bucket=self._bucket, Key=object_key, Body=bytes(buffer))
+            else:
+                await upload.complete(bytes(buffer))
+        except BaseException:
+            if upload is not None:
+                await upload.abort()
+            raise
+        return size
+
+    async def move_file(self, key: str, file_path: Path) -> None:
+        content = iter_file_range(file_path, chunk_size=self._part_size)
+        await self.write(key, executor.iterate(content))
+        file_path.unlink(missing_ok=True)
+
+    async def read(self, key: str, *, start: int = 0, end: int | None = None) -> tp.AsyncIterator[bytes]:
+        client = await self._get_client()
+        options = {"Bucket": self._bucket, "Key": self._get_object_key(key)}
+        if start or end is not None:
+            options["Range"] = f"bytes={start}-{'' if end is None else end}"
+        try:
+            response = await client.get_object(**options)
+        except ClientError as err:
+            # A range can't be satisfied by an empty object, which has nothing to read anyway
+            if err.response.get("Error", {}).get("Code") == "InvalidRange":
+                return
+            raise
+        async with response["Body"] as body:
+            while chunk := await body.read(self._chunk_size):
+                yield chunk
+
+    async def stat(self, key: str) -> ObjectStat | None:
+        client = await self._get_client()
+        try:
+            response = await client.head_object(Bucket=self._bucket, Key=self._get_object_key(key))
+        except ClientError as err:
+            if err.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return ObjectStat(size=response["ContentLength"], modified_at=response["LastModified"])
+
+    async def delete(self, key: str) -> None:
+        client = await self._get_client()
+        await client.delete_object(Bucket=self._bucket, Key=self._get_object_key(key))
+
+    async def close(self) -> None:
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+        self._client = self._exit_stack = None
+
+
+def get_storage_backend(root: Path, *, storage_settings: StorageSettings) -> StorageBackend:
+    if storage_settings.backend == StorageBackendKind.s3:
+        return S3Storage(
+            storage_settings.s3_bucket,
+            prefix=storage_settings.s3_prefix,
+            endpoint_url=storage_settings.s3_endpoint_url,
+            region=storage_settings.s3_region,
+            access_key_id=storage_settings.s3_access_key_id,
+            secret_access_key=storage_settings.s3_secret_access_key,
+            part_size=storage_settings.s3_part_size,
+            part_concurrency=storage_settings.s3_part_concurrency,
+            max_pool_connections=storage_settings.s3_max_pool_connections,
+            chunk_size=settings.app.download_chunk_size,
+        )
+    return LocalStorage(
+        root,
+        chunk_size=settings.app.download_chunk_size,
+        buffer_size=settings.app.upload_buffer_size,
+        fsync=settings.app.upload_fsync,
+    )
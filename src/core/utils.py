@@ -1,14 +1,36 @@
+import base64
+import os
 import typing as tp
 import uuid
 from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
 
-import aiofiles
 from passlib.context import CryptContext
+from passlib.hash import argon2
+
+from core.config import PasswordSettings, settings
+from core.enums import PasswordHashScheme
+
+
+def create_crypt_context(password_settings: PasswordSettings) -> CryptContext:
+    """New passwords are hashed with the configured scheme and costs, hashes made otherwise need an update."""
+    if password_settings.scheme == PasswordHashScheme.argon2 and not argon2.has_backend():
+        raise RuntimeError("Install the argon2-cffi package to hash passwords with argon2")
+    schemes = [password_settings.scheme.value]
+    schemes.extend(scheme.value for scheme in PasswordHashScheme if scheme != password_settings.scheme)
+    return CryptContext(
+        schemes=schemes,
+        deprecated="auto",
+        bcrypt__rounds=password_settings.bcrypt_rounds,
+        argon2__rounds=password_settings.argon2_time_cost,
+        argon2__memory_cost=password_settings.argon2_memory_cost,
+        argon2__parallelism=password_settings.argon2_parallelism,
+    )
 
 
 class PasswordHasher:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = create_crypt_context(settings.password)
 
     @classmethod
     def verify_password(cls, *, plain_password: str, hashed_password: str) -> bool:
@@ -18,24 +40,54 @@ class PasswordHasher:
     def get_password_hash(cls, password: str) -> str:
         return cls.pwd_context.hash(password)
 
+    @classmethod
+    def needs_update(cls, hashed_password: str) -> bool:
+        return cls.pwd_context.needs_update(hashed_password)
+
 
 @dataclass(frozen=True, slots=True)
 class Paginator:
     offset: int
     limit: int
+    cursor: str | None = None
+
 
+def query_paginator(offset: int = 0, limit: int = 10, cursor: str | None = None) -> Paginator:
+    return Paginator(offset=offset, limit=limit, cursor=cursor)
 
-def query_paginator(offset: int = 0, limit: int = 10) -> Paginator:
-    return Paginator(offset=offset, limit=limit)
 
+@dataclass(frozen=True, slots=True)
+class Cursor:
+    created_at: datetime
+    id: uuid.UUID
 
-async def async_save_file(file_obj: tp.Any, *, file_path: str | Path) -> None:
-    if isinstance(file_path, Path):
-        file_path = file_path.absolute()
+    def encode(self) -> str:
+        value = f"{self.created_at.isoformat()}|{self.id.hex}"
+        return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
 
-    async with aiofiles.open(file_path, "wb") as out_file:
-        while content := await file_obj.read(1024):
-            await out_file.write(content)
+    @classmethod
+    def decode(cls, value: str) -> "Cursor":
+        """Raises ValueError for a malformed cursor."""
+        raw_value = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        created_at, _, idx = raw_value.partition("|")
+        return cls(created_at=datetime.fromisoformat(created_at), id=uuid.UUID(hex=idx))
+
+
+def allocate_file(file_path: str | Path, *, size: int) -> None:
+    with open(file_path, "wb") as out_file:
+        out_file.truncate(size)
+
+
+def write_file_range(file_path: str | Path, *, offset: int, data: bytes) -> None:
+    fd = os.open(file_path, os.O_WRONLY)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+    finally:
+        os.close(fd)
 
 
 def is_valid_uuid4(value: tp.Any) -> bool:
@@ -0,0 +1,149 @@
+import errno
+import os
+import tempfile
+import typing as tp
+from pathlib import Path
+
+from core.executors import executor
+
+# Errors raised by the kernel copies when they don't support the given pair of descriptors
+_UNSUPPORTED_COPY_ERRNOS = {errno.EINVAL, errno.ENOSYS, errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+
+def _copy_file_range(in_fd: int, out_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(in_fd, out_fd, count, offset, offset)
+
+
+def _sendfile(in_fd: int, out_fd: int, offset: int, count: int) -> int:
+    return os.sendfile(out_fd, in_fd, offset, count)
+
+
+_KERNEL_COPIES: list[tp.Callable[[int, int, int, int], int]] = [
+    copy for name, copy in (("copy_file_range", _copy_file_range), ("sendfile", _sendfile)) if hasattr(os, name)
+]
+
+
+def get_fileno(file_obj: tp.Any) -> int | None:
+    """Returns the descriptor of a file object backed by a real file, spooled files still kept in memory have none."""
+    if isinstance(file_obj, tempfile.SpooledTemporaryFile):
+        if not file_obj._rolled:
+            return None
+        file_obj = file_obj._file
+    try:
+        return file_obj.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def kernel_copy(in_fd: int, out_fd: int, *, size: int) -> bool:
+    """Copies `size` bytes from the start of `in_fd` without passing them through user space.
+
+    Returns False when neither copy_file_range nor sendfile can handle the descriptors, nothing is written then.
+    """
+    for copy in _KERNEL_COPIES:
+        offset = 0
+        try:
+            while offset < size:
+                copied = copy(in_fd, out_fd, offset, size - offset)
+                if copied == 0:
+                    raise OSError(errno.EIO, "Source file is shorter than expected")
+                offset += copied
+        except OSError as err:
+            if offset or err.errno not in _UNSUPPORTED_COPY_ERRNOS:
+                raise
+            continue
+        return True
+    return False
+
+
+def write_all(fd: int, data: bytes | bytearray | memoryview) -> None:
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def copy_buffered(file_obj: tp.BinaryIO, out_fd: int, *, buffer_size: int) -> None:
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    file_obj.seek(0)
+    while size := file_obj.readinto(buffer):  # type: ignore[attr-defined]
+        write_all(out_fd, view[:size])
+
+
+def fsync_path(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def open_for_write(file_path: Path) -> int:
+    return os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+
+def save_file_object(file_obj: tp.BinaryIO, *, file_path: Path, buffer_size: int, fsync: bool) -> None:
+    """Writes the whole file object to `file_path`, in the kernel when it is backed by a file on disk."""
+    out_fd = open_for_write(file_path)
+    try:
+        in_fd = get_fileno(file_obj)
+        if in_fd is None or not kernel_copy(in_fd, out_fd, size=os.fstat(in_fd).st_size):
+            copy_buffered(file_obj, out_fd, buffer_size=buffer_size)
+        if fsync:
+            os.fsync(out_fd)
+    finally:
+        os.close(out_fd)
+
+
+async def save_stream(
+    stream: tp.AsyncIterator[bytes],
+    *,
+    file_path: Path,
+    buffer_size: int,
+    fsync: bool,
+    on_buffer: tp.Callable[[bytes | bytearray], None] | None = None,
+) -> int:
+    """Writes the stream to `file_path` and returns its size.
+
+    Chunks are gathered into buffers of `buffer_size` bytes, each buffer is passed to `on_buffer` and written in a
+    single thread hop.
+    """
+    buffer = bytearray()
+    size = 0
+    fd = await executor.run_in_thread(open_for_write, file_path)
+
+    def flush(data: bytes | bytearray) -> None:
+        if on_buffer is not None:
+            on_buffer(data)
+        write_all(fd, data)
+
+    try:
+        async for chunk in stream:
+            buffer += chunk
+            size += len(chunk)
+            if len(buffer) >= buffer_size:
+                data, buffer = buffer, bytearray()
+                await executor.run_in_thread(flush, data)
+        if buffer:
+            await executor.run_in_thread(flush, buffer)
+        if fsync:
+            await executor.run_in_thread(os.fsync, fd)
+    finally:
+        os.close(fd)
+    return size
+
+
+def replace_file(source_path: Path, target_path: Path, *, fsync: bool) -> None:
+    """Atomically moves a written file into place, with `fsync` the rename itself is made durable as well."""
+    os.replace(source_path, target_path)
+    if fsync:
+        fsync_path(target_path.parent)
+
+
+def move_file(source_path: Path, target_path: Path, *, fsync: bool) -> None:
+    """Moves a file written without fsync into place, see `replace_file`."""
+    if fsync:
+        fsync_path(source_path)
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    replace_file(source_path, target_path, fsync=fsync)
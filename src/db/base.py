@@ -1,19 +1,70 @@
 import typing as tp
 from contextlib import asynccontextmanager
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base, scoped_session
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker, declarative_base
 
-from core.config import settings
+from core.cache import shared_backend
+from core.config import DatabaseSettings, settings
+from .metrics import observe_queries
+from .pool import InstrumentedPool, PoolStats
+from .replicas import ReplicaSet, RoutingAsyncSession, RoutingSession
 
 Base = declarative_base()
 
 
+def get_engine_options(db_settings: DatabaseSettings) -> dict[str, tp.Any]:
+    return {
+        "echo": db_settings.echo,
+        "future": True,
+        "poolclass": InstrumentedPool,
+        "pool_size": db_settings.pool_size,
+        "max_overflow": db_settings.pool_max_overflow,
+        "pool_timeout": db_settings.pool_timeout,
+        "pool_recycle": db_settings.pool_recycle,
+        "pool_pre_ping": db_settings.pool_pre_ping,
+        "connect_args": {
+            # The first one is the statement cache of the SQLAlchemy adapter, the second one is asyncpg's own
+            "prepared_statement_cache_size": db_settings.statement_cache_size,
+            "statement_cache_size": db_settings.statement_cache_size,
+            "timeout": db_settings.connect_timeout,
+            "command_timeout": db_settings.command_timeout,
+        },
+    }
+
+
 class Database:
-    def __init__(self, dsn: str, echo: bool = False) -> None:
-        self._engine = create_async_engine(dsn, echo=echo, future=True)
-        self._async_session = sessionmaker(self._engine, class_=AsyncSession, expire_on_commit=False)
-        self._session_factory = scoped_session(self._async_session)
+    def __init__(self, dsn: str, *, db_settings: DatabaseSettings) -> None:
+        self._engine = create_async_engine(dsn, **get_engine_options(db_settings))
+        self._replicas = ReplicaSet(
+            self._engine,
+            [
+                create_async_engine(str(replica_dsn), **get_engine_options(db_settings))
+                for replica_dsn in db_settings.replica_dsns
+            ],
+            check_interval=db_settings.replica_check_interval,
+            max_lag=db_settings.replica_max_lag,
+            shared=shared_backend,
+            max_writers=settings.cache.user_max_size,
+        )
+        if settings.metrics.enabled:
+            for engine in (self._engine, *self._replicas.engines):
+                observe_queries(engine.sync_engine)
+        # Every session is owned by a single task, sessions must not be shared between concurrent requests
+        self._session_factory = sessionmaker(
+            self._engine,
+            class_=RoutingAsyncSession,
+            sync_session_class=RoutingSession,
+            replicas=self._replicas,
+            expire_on_commit=False,
+        )
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._engine
+
+    def pool_stats(self) -> PoolStats:
+        return self._engine.sync_engine.pool.stats()
 
     async def create_database(self) -> None:
         async with self._engine.begin() as conn:
@@ -23,9 +74,28 @@ class Database:
         async with self._engine.begin() as conn:
             await conn.run_sync(Base.metadata.drop_all)
 
+    async def start(self) -> None:
+        self._replicas.start()
+
+    async def close(self) -> None:
+        await self._replicas.close()
+        await self._engine.dispose()
+
     @asynccontextmanager
-    async def session(self) -> tp.AsyncGenerator[AsyncSession, None]:
+    async def session(
+        self, *, use_replica: bool = False, user_id: str | None = None
+    ) -> tp.AsyncGenerator[AsyncSession, None]:
+        """With `use_replica` the selects go to a replica until the session touches the primary, see `RoutingSession`.
+
+        Replicas lag behind, so only the sessions which don't write and don't need the latest state should use them.
+        The user who has committed a write within the replication lag window reads from the primary anyway.
+        """
+        if use_replica and user_id is not None and await self._replicas.has_recent_write(user_id):
+            use_replica = False
         session: AsyncSession = self._session_factory()
+        session.sync_session.info["use_replica"] = use_replica
+        if user_id is not None:
+            session.info["user_id"] = user_id
         try:
             yield session
         except Exception:
@@ -35,7 +105,7 @@ class Database:
             await session.close()
 
 
-database = Database(dsn=str(settings.db.dsn), echo=settings.db.echo)
+database = Database(dsn=str(settings.db.dsn), db_settings=settings.db)
 
 
 async def get_session() -> tp.AsyncGenerator[AsyncSession, None]:
@@ -0,0 +1,25 @@
+import time
+import typing as tp
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.metrics import db_query_duration
+
+
+def _before_cursor_execute(conn: tp.Any, cursor: tp.Any, statement: str, *args: tp.Any) -> None:
+    conn.info["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn: tp.Any, cursor: tp.Any, statement: str, *args: tp.Any) -> None:
+    start = conn.info.pop("query_start", None)
+    if start is None:
+        return
+    # The statement kind keeps the label cardinality bounded, e.g. SELECT, INSERT, UPDATE
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    db_query_duration.labels(operation).observe(time.perf_counter() - start)
+
+
+def observe_queries(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -1,7 +1,19 @@
 import uuid
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, func, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    Column,
+    Integer,
+    BigInteger,
+    String,
+    Boolean,
+    DateTime,
+    func,
+    ForeignKey,
+    UniqueConstraint,
+    Index,
+    Computed,
+)
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -14,18 +26,80 @@ class User(Base):
     username = Column(String(256), unique=True, nullable=False)
     password_hash = Column(String(1024), nullable=False)
     is_active = Column(Boolean, default=True)
+    # Tokens issued for an older version are rejected, bumping it revokes all tokens of the user
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     files = relationship("File", back_populates="user")
     created_at = Column(DateTime, index=True, server_default=func.now())
 
 
+class UserUsage(Base):
+    """Counters of what a user stores, changed in the same transaction as the files themselves."""
+
+    __tablename__ = "user_usage"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    used_bytes = Column(BigInteger, nullable=False, default=0, server_default="0")
+    file_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class Blob(Base):
+    __tablename__ = "blob"
+    __table_args__ = (Index("ix_blob_content_tsv", "content_tsv", postgresql_using="gin"),)
+
+    digest = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=1)
+    content_tsv = Column(TSVECTOR, nullable=True)
+    files = relationship("File", back_populates="blob")
+    created_at = Column(DateTime, server_default=func.now())
+
+
 class File(Base):
     __tablename__ = "file"
+    __table_args__ = (
+        Index("ix_file_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_file_user_id_path", "user_id", "path", unique=True, postgresql_ops={"path": "text_pattern_ops"}),
+        Index("ix_file_user_id_extension", "user_id", "extension"),
+        Index("ix_file_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_file_path_trgm", "path", postgresql_using="gin", postgresql_ops={"path": "gin_trgm_ops"}),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(128), nullable=False)
+    extension = Column(String(128), Computed(r"lower(substring(name from '\.([^.]+)$'))", persisted=True))
     path = Column(String(2056), nullable=False)
-    size = Column(Integer, nullable=False)
+    size = Column(BigInteger, nullable=False)
     is_downloadable = Column(Boolean, default=True)
     user_id = Column(UUID, ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
     user = relationship("User", back_populates="files")
+    blob_digest = Column(String(64), ForeignKey("blob.digest"), index=True, nullable=True)
+    blob = relationship("Blob", back_populates="files")
     created_at = Column(DateTime, index=True, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class Upload(Base):
+    __tablename__ = "upload"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    name = Column(String(128), nullable=False)
+    path = Column(String(2056), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("user.id", ondelete="CASCADE"), index=True, nullable=False)
+    parts = relationship("UploadPart", back_populates="upload", passive_deletes=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class UploadPart(Base):
+    __tablename__ = "upload_part"
+    __table_args__ = (UniqueConstraint("upload_id", "offset"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    upload_id = Column(UUID(as_uuid=True), ForeignKey("upload.id", ondelete="CASCADE"), nullable=False)
+    upload = relationship("Upload", back_populates="parts")
+    offset = Column(BigInteger, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    checksum = Column(String(64), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,69 @@
+import time
+import typing as tp
+from dataclasses import dataclass
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from core.metrics import db_pool_checkout_duration
+
+
+@dataclass(frozen=True, slots=True)
+class PoolStats:
+    size: int
+    max_size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    occupancy: float
+    checkouts: int
+    timeouts: int
+    checkout_time_avg: float
+    checkout_time_max: float
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool which measures how long a checkout waits for a connection, including opening a new one."""
+
+    def __init__(self, *args: tp.Any, **kwargs: tp.Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._checkouts = 0
+        self._timeouts = 0
+        self._checkout_time = 0.0
+        self._checkout_time_max = 0.0
+
+    def connect(self) -> tp.Any:
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self._timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self._checkouts += 1
+            self._checkout_time += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+            db_pool_checkout_duration.observe(elapsed)
+
+    def recreate(self) -> "InstrumentedPool":
+        pool = super().recreate()
+        pool._checkouts, pool._timeouts = self._checkouts, self._timeouts
+        pool._checkout_time, pool._checkout_time_max = self._checkout_time, self._checkout_time_max
+        return pool
+
+    def stats(self) -> PoolStats:
+        max_size = self.size() + self._max_overflow
+        checked_out = self.checkedout()
+        return PoolStats(
+            size=self.size(),
+            max_size=max_size,
+            checked_out=checked_out,
+            checked_in=self.checkedin(),
+            overflow=max(self.overflow(), 0),
+            occupancy=round(checked_out / max_size, 3),
+            checkouts=self._checkouts,
+            timeouts=self._timeouts,
+            checkout_time_avg=round(self._checkout_time / self._checkouts, 6) if self._checkouts else 0.0,
+            checkout_time_max=round(self._checkout_time_max, 6),
+        )
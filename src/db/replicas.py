@@ -0,0 +1,197 @@
+import asyncio
+import itertools
+import logging
+import time
+import typing as tp
+from collections import deque
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from core.cache import LayeredCache, RedisBackend
+
+logger = logging.getLogger(__name__)
+
+_PRIMARY_POSITION_QUERY = text("SELECT pg_current_wal_lsn() - '0/0'")
+# NULL when the server is not in recovery, so a primary configured as a replica is never read from
+_REPLAY_POSITION_QUERY = text("SELECT CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() - '0/0' END")
+
+
+@dataclass(slots=True)
+class Replica:
+    engine: AsyncEngine
+    # Unknown until the first check, nothing is read from the replica before it passes
+    is_healthy: bool | None = None
+
+
+class ReplicaSet:
+    """Hands out the healthy replicas round-robin, a background task checks their lag periodically.
+
+    The lag is measured against the WAL positions sampled from the primary on every check: it is the time since
+    the primary reached a position the replica hasn't replayed yet. Unlike the replay timestamps this also catches
+    a replica whose WAL receiver is disconnected, while an idle primary doesn't make a replica look lagging.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        engines: list[AsyncEngine],
+        *,
+        check_interval: float,
+        max_lag: float,
+        shared: RedisBackend | None,
+        max_writers: int,
+    ) -> None:
+        self._primary = primary
+        self._replicas = [Replica(engine=engine) for engine in engines]
+        # (monotonic time, primary WAL position) samples covering `max_lag`
+        self._positions: deque[tuple[float, int]] = deque()
+        self._cycle = itertools.cycle(self._replicas)
+        self._check_interval = check_interval
+        self._max_lag = max_lag
+        self._task: asyncio.Task | None = None
+        # A healthy replica lags up to `max_lag` as of its last check, the users who wrote since read from the primary
+        window = max_lag + check_interval
+        self._recent_writers: LayeredCache[float] = LayeredCache(
+            "recent_writers",
+            ttl=window,
+            local_ttl=window,
+            max_size=max_writers,
+            shared=shared,
+            dumps=str,
+            loads=float,
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self._replicas)
+
+    @property
+    def engines(self) -> list[AsyncEngine]:
+        return [replica.engine for replica in self._replicas]
+
+    def get_engine(self) -> AsyncEngine | None:
+        for _ in range(len(self._replicas)):
+            replica = next(self._cycle)
+            if replica.is_healthy:
+                return replica.engine
+        return None
+
+    async def mark_write(self, user_id: str) -> None:
+        if self._replicas:
+            await self._recent_writers.set(user_id, time.time())
+
+    async def has_recent_write(self, user_id: str) -> bool:
+        return bool(self._replicas) and await self._recent_writers.get(user_id) is not None
+
+    @staticmethod
+    async def _get_position(engine: AsyncEngine, query: tp.Any, *, timeout: float) -> int | None:
+        async with engine.connect() as conn:
+            position = await asyncio.wait_for(conn.scalar(query), timeout=timeout)
+        return None if position is None else int(position)
+
+    async def _sample_primary(self) -> None:
+        try:
+            position = await self._get_position(self._primary, _PRIMARY_POSITION_QUERY, timeout=self._check_interval)
+        except Exception as err:
+            logger.warning(f"Can't get the WAL position of the primary: {err!r}")
+            return
+        now = time.monotonic()
+        self._positions.append((now, tp.cast(int, position)))
+        # Keep the newest sample older than `max_lag`, a replica behind it lags more than that
+        while len(self._positions) > 1 and self._positions[1][0] <= now - self._max_lag:
+            self._positions.popleft()
+
+    def _get_lag(self, position: int) -> float | None:
+        """Seconds since the primary passed the replayed `position`, None if it did so before the sampled history."""
+        for index, (sampled_at, primary_position) in enumerate(self._positions):
+            if primary_position > position:
+                return time.monotonic() - sampled_at if index else None
+        return 0.0 if self._positions else None
+
+    async def _check(self, replica: Replica) -> None:
+        lag = None
+        try:
+            position = await self._get_position(replica.engine, _REPLAY_POSITION_QUERY, timeout=self._check_interval)
+        except Exception as err:
+            reason = f"is unavailable: {err!r}"
+        else:
+            if position is None:
+                reason = "is not in recovery"
+            elif (lag := self._get_lag(position)) is None:
+                reason = "lag is unknown"
+            else:
+                reason = f"lags {lag:.1f}s behind"
+        is_healthy = lag is not None and lag <= self._max_lag
+        if is_healthy != replica.is_healthy:
+            log = logger.info if is_healthy else logger.warning
+            log(f"Replica {replica.engine.url.host} {'is healthy' if is_healthy else reason}")
+        replica.is_healthy = is_healthy
+
+    async def check(self) -> None:
+        await self._sample_primary()
+        await asyncio.gather(*(self._check(replica) for replica in self._replicas))
+
+    async def _run_checks(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self._check_interval)
+
+    def start(self) -> None:
+        if self._replicas and self._task is None:
+            self._task = asyncio.create_task(self._run_checks())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for replica in self._replicas:
+            await replica.engine.dispose()
+
+
+class RoutingSession(Session):
+    """Sends plain selects of a read-only session to a replica, anything else goes to the primary.
+
+    Once a session has used the primary it sticks to it, so it reads its own writes and the rows it has locked.
+    """
+
+    def __init__(self, *args: tp.Any, replicas: ReplicaSet | None = None, **kwargs: tp.Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    def get_bind(self, mapper: tp.Any = None, clause: tp.Any = None, **kwargs: tp.Any) -> Engine:
+        is_select = isinstance(clause, Select)
+        if (
+            self.replicas
+            and self.info.get("use_replica")
+            and is_select
+            and clause._for_update_arg is None
+            and (engine := self.replicas.get_engine()) is not None
+        ):
+            return engine.sync_engine
+        self.info["use_replica"] = False
+        # Flushes and raw statements count as writes too
+        if not is_select:
+            self.info["has_writes"] = True
+        return super().get_bind(mapper, clause, **kwargs)
+
+
+class RoutingAsyncSession(AsyncSession):
+    """Marks the user of the session, see `info["user_id"]`, as a recent writer when it commits a write."""
+
+    sync_session: RoutingSession
+
+    async def commit(self) -> None:
+        await super().commit()
+        user_id = self.info.get("user_id")
+        replicas = self.sync_session.replicas
+        if self.info.pop("has_writes", False) and user_id is not None and replicas:
+            await replicas.mark_write(user_id)
+
+    async def rollback(self) -> None:
+        self.info.pop("has_writes", None)
+        await super().rollback()
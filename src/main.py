@@ -3,7 +3,13 @@ from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse, RedirectResponse
 
 from api.v1 import base
+from core.blobs import blob_store
+from core.cache import close_shared_backend
 from core.config import settings
+from core.executors import executor
+from core.metrics import MetricsMiddleware, metrics_endpoint
+from db.base import database
+from services.users import users_cache
 
 app = FastAPI(
     title=settings.app.title,
@@ -14,6 +20,16 @@ app = FastAPI(
 )
 app.add_route("/", RedirectResponse(url=settings.app.docs_url))
 app.include_router(base.api_router, prefix="/api/v1")
+if settings.metrics.enabled:
+    app.add_middleware(MetricsMiddleware)
+    app.add_route(settings.metrics.path, metrics_endpoint, include_in_schema=False)
+app.add_event_handler("startup", database.start)
+app.add_event_handler("startup", users_cache.start)
+app.add_event_handler("shutdown", executor.shutdown)
+app.add_event_handler("shutdown", users_cache.close)
+app.add_event_handler("shutdown", close_shared_backend)
+app.add_event_handler("shutdown", blob_store.close)
+app.add_event_handler("shutdown", database.close)
 
 
 if __name__ == "__main__":
@@ -43,23 +43,30 @@ class DatabaseRepository(Repository, tp.Generic[ModelType, PydanticSchemaType]):
         results = await db.execute(statement=statement)
         return results.scalars().all()
 
-    async def create(self, db: AsyncSession, *, obj_in: PydanticSchemaType | dict) -> ModelType:
+    async def create(self, db: AsyncSession, *, obj_in: PydanticSchemaType | dict, commit: bool = True) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in, exclude_unset=True)
         db_obj = self._model(**obj_in_data)
         db.add(db_obj)
-        await db.commit()
+        if commit:
+            await db.commit()
+        else:
+            await db.flush()
         await db.refresh(db_obj)
         return db_obj
 
-    async def update(self, db: AsyncSession, *, db_obj: ModelType, obj_in: PydanticSchemaType | dict) -> ModelType:
+    async def update(
+        self, db: AsyncSession, *, db_obj: ModelType, obj_in: PydanticSchemaType | dict, commit: bool = True
+    ) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in, exclude_unset=True)
         statement = update(self._model).where(self._model.id == db_obj.id).values(**obj_in_data).returning(self._model)
         await db.execute(statement=statement)
-        await db.commit()
+        if commit:
+            await db.commit()
         await db.refresh(db_obj)
         return db_obj
 
-    async def delete(self, db: AsyncSession, *, idx: int) -> None:
+    async def delete(self, db: AsyncSession, *, idx: int, commit: bool = True) -> None:
         statement = delete(self._model).where(self._model.id == idx)
         await db.execute(statement=statement)
-        await db.commit()
+        if commit:
+            await db.commit()
@@ -0,0 +1,114 @@
+import typing as tp
+
+from sqlalchemy import select, update, delete, func, text, bindparam, values, column, String, Integer
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from db.models import Blob, File
+from .base import DatabaseRepository, PydanticSchemaType, ModelType
+
+
+class BlobRepository(DatabaseRepository[Blob, PydanticSchemaType]):
+    async def get_by_digest(self, db: AsyncSession, *, digest: str) -> ModelType | None:
+        statement = select(self._model).where(self._model.digest == digest)
+        results = await db.execute(statement=statement)
+        return results.scalar_one_or_none()
+
+    async def acquire(self, db: AsyncSession, *, digest: str, size: int) -> int:
+        statement = (
+            insert(self._model)
+            .values(digest=digest, size=size, ref_count=1)
+            .on_conflict_do_update(
+                index_elements=[self._model.digest],
+                set_={"ref_count": self._model.ref_count + 1},
+            )
+            .returning(self._model.ref_count)
+        )
+        results = await db.execute(statement=statement)
+        return results.scalar_one()
+
+    async def release(self, db: AsyncSession, *, digest: str) -> bool:
+        statement = (
+            update(self._model)
+            .where(self._model.digest == digest)
+            .values(ref_count=self._model.ref_count - 1)
+            .returning(self._model.ref_count)
+        )
+        results = await db.execute(statement=statement)
+        ref_count = results.scalar_one_or_none()
+        if ref_count is None or ref_count > 0:
+            return False
+
+        statement = delete(self._model).where(self._model.digest == digest, self._model.ref_count <= 0)
+        await db.execute(statement=statement)
+        return True
+
+    async def acquire_many(self, db: AsyncSession, *, blobs: tp.Mapping[str, tuple[int, int]]) -> dict[str, int]:
+        """Adds references to the blobs, given as digest -> (size, references), and returns their ref counts."""
+        # Rows are locked in digest order, so concurrent batches can't deadlock on each other
+        statement = insert(self._model).values(
+            [
+                {"digest": digest, "size": size, "ref_count": references}
+                for digest, (size, references) in sorted(blobs.items())
+            ]
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[self._model.digest],
+            set_={"ref_count": self._model.ref_count + statement.excluded.ref_count},
+        ).returning(self._model.digest, self._model.ref_count)
+        results = await db.execute(statement=statement)
+        return {digest: ref_count for digest, ref_count in results.all()}
+
+    async def release_many(self, db: AsyncSession, *, blobs: tp.Mapping[str, int]) -> list[str]:
+        """Drops references to the blobs, given as digest -> references, and returns the digests left unreferenced."""
+        released = values(column("digest", String), column("count", Integer), name="released").data(
+            sorted(blobs.items())
+        )
+        statement = (
+            update(self._model)
+            .where(self._model.digest == released.c.digest)
+            .values(ref_count=self._model.ref_count - released.c.count)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(statement=statement)
+
+        statement = (
+            delete(self._model)
+            .where(self._model.digest.in_(list(blobs)), self._model.ref_count <= 0)
+            .returning(self._model.digest)
+        )
+        results = await db.execute(statement=statement)
+        return results.scalars().all()
+
+    async def set_contents(self, db: AsyncSession, *, contents: tp.Mapping[str, str]) -> None:
+        statement = (
+            update(self._model.__table__)
+            .where(self._model.digest == bindparam("b_digest"))
+            .values(content_tsv=func.to_tsvector(text_search_config(), bindparam("b_content")))
+        )
+        await db.execute(
+            statement,
+            [{"b_digest": digest, "b_content": content} for digest, content in contents.items()],
+        )
+
+    async def get_unindexed(self, db: AsyncSession, *, after: str, limit: int) -> list[tuple[str, str]]:
+        """Returns (digest, any file name) pairs of blobs without indexed content, ordered by digest."""
+        statement = (
+            select(self._model.digest, func.min(File.name))
+            .join(File, File.blob_digest == self._model.digest)
+            .where(self._model.content_tsv.is_(None), self._model.digest > after)
+            .group_by(self._model.digest)
+            .order_by(self._model.digest)
+            .limit(limit)
+        )
+        results = await db.execute(statement=statement)
+        return results.all()
+
+
+def text_search_config() -> tp.Any:
+    # The config name is validated by the settings, regconfig can't be sent as a bind parameter
+    return text(f"'{settings.search.text_config}'::regconfig")
+
+
+blobs_crud: BlobRepository = BlobRepository(Blob)
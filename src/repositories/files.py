@@ -1,22 +1,38 @@
+import typing as tp
 from uuid import UUID
 
-from sqlalchemy import or_, desc, text, and_, asc
+from sqlalchemy import or_, desc, asc, tuple_, func, null, union, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from core.enums import OrderByType
-from db.models import File
+from core.enums import FileOrderByField, OrderByType
+from core.utils import Cursor
+from db.models import Blob, File
 from .base import DatabaseRepository, PydanticSchemaType, ModelType
+from .blobs import text_search_config
+
+
+def escape_like(value: str) -> str:
+    # Postgres only turns LIKE into an index range for the default backslash escape, so no ESCAPE clause here
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
 
 class FileRepository(DatabaseRepository[File, PydanticSchemaType]):
-    async def get_file_by_path(self, db: AsyncSession, *, target_path: str) -> ModelType | None:
-        statement = select(self._model).where(self._model.path == target_path)
+    async def get_file_by_path(self, db: AsyncSession, *, user_id: str | UUID, target_path: str) -> ModelType | None:
+        statement = select(self._model).where(self._model.user_id == str(user_id), self._model.path == target_path)
         results = await db.execute(statement=statement)
         return results.scalar_one_or_none()
 
-    async def get_file_by_id_or_path(self, db: AsyncSession, *, idx: str | UUID | None, path: str) -> ModelType | None:
-        statement = select(self._model).where(or_(self._model.id == idx, self._model.path == path))
+    async def get_file_by_id_or_path(
+        self, db: AsyncSession, *, user_id: str | UUID, idx: str | UUID | None, path: str
+    ) -> ModelType | None:
+        statement = select(self._model).where(
+            self._model.user_id == str(user_id),
+            or_(self._model.id == idx, self._model.path == path),
+        )
+        # A path may look like the id of another file, the id match wins then
+        statement = statement.order_by(desc(self._model.id == idx)).limit(1)
         results = await db.execute(statement=statement)
         return results.scalar_one_or_none()
 
@@ -26,32 +42,182 @@ class FileRepository(DatabaseRepository[File, PydanticSchemaType]):
         statement = (
             select(self._model)
             .where(self._model.user_id == user_id)
-            .order_by(desc("created_at"))
+            .order_by(desc(self._model.created_at), desc(self._model.id))
             .offset(skip)
             .limit(limit)
         )
         results = await db.execute(statement=statement)
         return results.scalars().all()
 
+    async def get_page_by_user(
+        self, db: AsyncSession, *, user_id: str, after: Cursor | None = None, limit: int = 100
+    ) -> list[ModelType]:
+        statement = select(self._model).where(self._model.user_id == user_id)
+        if after is not None:
+            statement = statement.where(
+                tuple_(self._model.created_at, self._model.id) < tuple_(after.created_at, after.id)
+            )
+        statement = statement.order_by(desc(self._model.created_at), desc(self._model.id)).limit(limit)
+        results = await db.execute(statement=statement)
+        return results.scalars().all()
+
+    async def count_usage_by_user(self, db: AsyncSession, *, user_id: str | UUID) -> tuple[int, int]:
+        """Returns the total size and the number of the files of the user, it reads all of them."""
+        statement = select(func.coalesce(func.sum(self._model.size), 0), func.count()).where(
+            self._model.user_id == str(user_id)
+        )
+        results = await db.execute(statement=statement)
+        used_bytes, file_count = results.one()
+        return used_bytes, file_count
+
+    async def get_legacy(self, db: AsyncSession, *, after: UUID | None, limit: int) -> list[ModelType]:
+        """Returns files still stored at their path under the storage root instead of a blob, ordered by id."""
+        statement = select(self._model).where(self._model.blob_digest.is_(None))
+        if after is not None:
+            statement = statement.where(self._model.id > after)
+        results = await db.execute(statement=statement.order_by(self._model.id).limit(limit))
+        return results.scalars().all()
+
+    async def get_for_update(self, db: AsyncSession, *, idx: str | UUID) -> ModelType | None:
+        statement = (
+            select(self._model)
+            .where(self._model.id == idx)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        results = await db.execute(statement=statement)
+        return results.scalar_one_or_none()
+
+    async def set_blob_digest(self, db: AsyncSession, *, idx: str | UUID, digest: str) -> None:
+        """Points a file to its blob keeping `updated_at`, the content itself doesn't change."""
+        statement = (
+            update(self._model)
+            .where(self._model.id == idx)
+            .values(blob_digest=digest, updated_at=self._model.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(statement=statement)
+
+    async def get_multi_by_paths_for_update(
+        self, db: AsyncSession, *, user_id: str | UUID, paths: list[str]
+    ) -> list[ModelType]:
+        statement = (
+            select(self._model)
+            .where(self._model.user_id == str(user_id), self._model.path.in_(paths))
+            .order_by(self._model.path)
+            .with_for_update()
+        )
+        results = await db.execute(statement=statement)
+        return results.scalars().all()
+
+    async def upsert_many(self, db: AsyncSession, *, objs_in: list[dict]) -> list[ModelType]:
+        """Creates the files or overwrites the ones with the same owner and path in a single statement."""
+        statement = insert(self._model).values(objs_in)
+        statement = statement.on_conflict_do_update(
+            index_elements=[self._model.user_id, self._model.path],
+            set_={
+                "name": statement.excluded.name,
+                "size": statement.excluded.size,
+                "blob_digest": statement.excluded.blob_digest,
+                "updated_at": func.now(),
+            },
+        ).returning(*self._model.__table__.columns)
+        # Locked rows are already in the session, they have to be refreshed with the returned values
+        statement = select(self._model).from_statement(statement).execution_options(populate_existing=True)
+        results = await db.execute(statement=statement)
+        return results.scalars().all()
+
+    async def get_multi_by_prefix_or_ids(
+        self, db: AsyncSession, *, user_id: str | UUID, prefix: str | None, ids: list[UUID] | None, limit: int
+    ) -> list[ModelType]:
+        conditions = []
+        if prefix is not None:
+            conditions.append(self._model.path.like(f"{escape_like(prefix)}%"))
+        if ids:
+            conditions.append(self._model.id.in_(ids))
+        statement = (
+            select(self._model)
+            .where(self._model.user_id == str(user_id), or_(*conditions))
+            .order_by(self._model.path)
+            .limit(limit)
+        )
+        results = await db.execute(statement=statement)
+        return results.scalars().all()
+
     async def search_files(
         self,
         db: AsyncSession,
         *,
+        user_id: str | UUID,
         path: str,
         extension: str,
-        order_by_field: str,
-        order_by_type: OrderByType,
+        query: str | None = None,
+        content: bool = False,
+        order_by_field: FileOrderByField | None = None,
+        order_by_type: OrderByType = OrderByType.descending,
         limit: int,
-    ) -> list[ModelType]:
-        order_by_func = asc if order_by_type == OrderByType.ascending else desc
-        statement = (
-            select(self._model)
-            .where(and_(self._model.path.startswith(path), self._model.name.endswith(extension)))
-            .order_by(order_by_func(text(order_by_field)))
+        offset: int = 0,
+    ) -> tuple[list[tuple[ModelType, float | None]], int]:
+        statement = select(self._model).where(self._model.user_id == str(user_id))
+        if path:
+            statement = statement.where(self._model.path.like(f"{escape_like(path)}%"))
+        if extension := extension.lower().lstrip("."):
+            # The stored column holds the last suffix only, compound ones ("tar.gz") are rechecked on the name
+            statement = statement.where(self._model.extension == extension.rsplit(".", 1)[-1])
+            if "." in extension:
+                statement = statement.where(self._model.name.like(f"%.{escape_like(extension)}"))
+
+        rank: tp.Any = null()
+        if query:
+            # The name/path conditions are served by the gin_trgm_ops indexes
+            rank = func.greatest(
+                func.similarity(self._model.name, query),
+                func.word_similarity(query, self._model.path),
+            )
+            matched = or_(
+                self._model.name.op("%")(query),
+                self._model.path.op("%>")(query),
+                self._model.name.ilike(f"%{escape_like(query)}%"),
+            )
+            if content:
+                # A union keeps both sides indexed, an OR across the two tables would scan every file of the user
+                ts_query = func.websearch_to_tsquery(text_search_config(), query)
+                matched_ids = union(
+                    select(self._model.id).where(matched),
+                    select(self._model.id)
+                    .join(Blob, Blob.digest == self._model.blob_digest)
+                    .where(Blob.content_tsv.op("@@")(ts_query)),
+                )
+                matched = self._model.id.in_(matched_ids)
+                statement = statement.outerjoin(Blob, Blob.digest == self._model.blob_digest)
+                rank = rank + func.coalesce(func.ts_rank_cd(Blob.content_tsv, ts_query), 0)
+            statement = statement.where(matched)
+
+        rank = rank.label("rank")
+        if order_by_field is not None:
+            order_by_func = asc if order_by_type == OrderByType.ascending else desc
+            order_by = order_by_func(getattr(self._model, order_by_field.value))
+        elif query:
+            order_by = desc(rank)
+        else:
+            order_by = desc(self._model.created_at)
+
+        matches_statement = (
+            statement.add_columns(rank, func.count().over().label("total"))
+            .order_by(order_by, self._model.id)
+            .offset(offset)
             .limit(limit)
         )
-        results = await db.execute(statement=statement)
-        return results.scalars().all()
+        results = await db.execute(statement=matches_statement)
+        rows = results.all()
+        if rows:
+            total = rows[0].total
+        elif offset:
+            results = await db.execute(statement=select(func.count()).select_from(statement.subquery()))
+            total = results.scalar_one()
+        else:
+            total = 0
+        return [(row[0], row.rank) for row in rows], total
 
 
 files_crud: FileRepository = FileRepository(File)
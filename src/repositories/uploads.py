@@ -0,0 +1,57 @@
+from uuid import UUID
+
+from sqlalchemy import select, delete
+from sqlalchemy.engine import Row
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Upload, UploadPart
+from .base import DatabaseRepository, PydanticSchemaType, ModelType
+
+
+class UploadRepository(DatabaseRepository[Upload, PydanticSchemaType]):
+    async def get_user_upload(self, db: AsyncSession, *, idx: str | UUID, user_id: str | UUID) -> ModelType | None:
+        statement = select(self._model).where(self._model.id == idx, self._model.user_id == user_id)
+        results = await db.execute(statement=statement)
+        return results.scalar_one_or_none()
+
+
+class UploadPartRepository(DatabaseRepository[UploadPart, PydanticSchemaType]):
+    async def save_part(
+        self, db: AsyncSession, *, upload_id: str | UUID, offset: int, size: int, checksum: str, commit: bool = True
+    ) -> Row:
+        statement = (
+            insert(self._model)
+            .values(upload_id=upload_id, offset=offset, size=size, checksum=checksum)
+            .on_conflict_do_update(
+                index_elements=[self._model.upload_id, self._model.offset],
+                set_={"size": size, "checksum": checksum},
+            )
+            .returning(self._model.offset, self._model.size, self._model.checksum)
+        )
+        results = await db.execute(statement=statement)
+        part = results.one()
+        if commit:
+            await db.commit()
+        return part
+
+    async def delete_overlapping(
+        self, db: AsyncSession, *, upload_id: str | UUID, start: int, end: int, commit: bool = True
+    ) -> None:
+        statement = delete(self._model).where(
+            self._model.upload_id == upload_id,
+            self._model.offset < end,
+            self._model.offset + self._model.size > start,
+        )
+        await db.execute(statement=statement)
+        if commit:
+            await db.commit()
+
+    async def get_multi_by_upload(self, db: AsyncSession, *, upload_id: str | UUID) -> list[ModelType]:
+        statement = select(self._model).where(self._model.upload_id == upload_id).order_by(self._model.offset)
+        results = await db.execute(statement=statement)
+        return results.scalars().all()
+
+
+uploads_crud: UploadRepository = UploadRepository(Upload)
+upload_parts_crud: UploadPartRepository = UploadPartRepository(UploadPart)
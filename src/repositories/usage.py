@@ -0,0 +1,43 @@
+from uuid import UUID
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models import UserUsage
+from .base import DatabaseRepository, PydanticSchemaType, ModelType
+
+
+class UsageRepository(DatabaseRepository[UserUsage, PydanticSchemaType]):
+    async def get_by_user(self, db: AsyncSession, *, user_id: str | UUID) -> ModelType | None:
+        statement = select(self._model).where(self._model.user_id == user_id)
+        results = await db.execute(statement=statement)
+        return results.scalar_one_or_none()
+
+    async def add(self, db: AsyncSession, *, user_id: str | UUID, size: int, count: int) -> Row:
+        """Adds to the counters of the user and returns them, the row stays locked until the end of the transaction."""
+        statement = insert(self._model).values(user_id=user_id, used_bytes=size, file_count=count)
+        statement = statement.on_conflict_do_update(
+            index_elements=[self._model.user_id],
+            set_={
+                "used_bytes": self._model.used_bytes + statement.excluded.used_bytes,
+                "file_count": self._model.file_count + statement.excluded.file_count,
+                "updated_at": func.now(),
+            },
+        ).returning(self._model.used_bytes, self._model.file_count)
+        results = await db.execute(statement=statement)
+        return results.one()
+
+    async def set(self, db: AsyncSession, *, user_id: str | UUID, used_bytes: int, file_count: int) -> None:
+        statement = (
+            update(self._model)
+            .where(self._model.user_id == user_id)
+            .values(used_bytes=used_bytes, file_count=file_count)
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(statement=statement)
+
+
+usage_crud: UsageRepository = UsageRepository(UserUsage)
@@ -1,4 +1,6 @@
-from sqlalchemy import select
+from uuid import UUID
+
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.models import User
@@ -11,5 +13,26 @@ class UserRepository(DatabaseRepository[User, PydanticSchemaType]):
         results = await db.execute(statement=statement)
         return results.scalar_one_or_none()
 
+    async def get_ids(self, db: AsyncSession, *, after: UUID | None, limit: int) -> list[UUID]:
+        statement = select(self._model.id)
+        if after is not None:
+            statement = statement.where(self._model.id > after)
+        results = await db.execute(statement=statement.order_by(self._model.id).limit(limit))
+        return results.scalars().all()
+
+    async def increment_token_version(self, db: AsyncSession, *, idx: str | UUID, commit: bool = True) -> int:
+        statement = (
+            update(self._model)
+            .where(self._model.id == idx)
+            .values(token_version=self._model.token_version + 1)
+            .returning(self._model.token_version)
+            .execution_options(synchronize_session=False)
+        )
+        results = await db.execute(statement=statement)
+        token_version = results.scalar_one()
+        if commit:
+            await db.commit()
+        return token_version
+
 
 users_crud: UserRepository = UserRepository(User)
@@ -2,9 +2,9 @@ from datetime import datetime
 from uuid import UUID
 
 from fastapi import UploadFile
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 
-from core.enums import OrderByType
+from core.enums import FileOrderByField, FileUploadStatus, OrderByType
 
 
 class FileInputSchema(BaseModel):
@@ -24,30 +24,62 @@ class FileOutputSchema(BaseModel):
         from_attributes = True
 
 
+class FileUploadResultSchema(BaseModel):
+    filename: str | None
+    path: str | None = None
+    status: FileUploadStatus
+    file: FileOutputSchema | None = None
+    detail: str | None = None
+
+
+class BatchUploadOutputSchema(BaseModel):
+    results: list[FileUploadResultSchema]
+
+
 class FileListSchema(BaseModel):
     account_id: UUID
     skip: int
     limit: int
     files: list[FileOutputSchema]
+    next_cursor: str | None = None
+
+
+class BulkDownloadSchema(BaseModel):
+    path: str | None = Field(None, min_length=1, description="Directory to download")
+    ids: list[UUID] | None = Field(None, min_length=1, description="Files to download")
+
+    @model_validator(mode="after")
+    def check_selection(self) -> "BulkDownloadSchema":
+        if self.path is None and self.ids is None:
+            raise ValueError("Either path or ids is required")
+        return self
 
 
 class OrderBySchema(BaseModel):
-    field: str
-    type: OrderByType
+    field: FileOrderByField
+    type: OrderByType = OrderByType.descending
 
 
 class SearchOptionsSchema(BaseModel):
-    path: str
-    extension: str
-    order_by: OrderBySchema
-    limit: int = 10
+    path: str = ""
+    extension: str = ""
+    order_by: OrderBySchema | None = None
+    limit: int = Field(10, ge=1, le=100)
+    offset: int = Field(0, ge=0)
 
 
 class SearchDataSchema(BaseModel):
-    options: SearchOptionsSchema
-    # Я так и не понял что чего можно использовать "query" :)
-    # query: str | None = None
+    options: SearchOptionsSchema = SearchOptionsSchema()
+    query: str | None = Field(None, min_length=1, max_length=256, description="Fuzzy match on names and paths")
+    content: bool = Field(False, description="Also match the query against text content of the files")
+
+
+class FileMatchSchema(FileOutputSchema):
+    rank: float | None = None
 
 
 class MatchedSearchOutputSchema(BaseModel):
-    matches: list[FileOutputSchema]
+    matches: list[FileMatchSchema]
+    total: int
+    offset: int
+    limit: int
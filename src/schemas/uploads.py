@@ -0,0 +1,36 @@
+from datetime import datetime
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class UploadInputSchema(BaseModel):
+    path: str
+    size: int = Field(ge=0)
+    name: str | None = None
+
+
+class UploadOutputSchema(BaseModel):
+    id: UUID
+    name: str
+    path: str
+    size: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class UploadPartOutputSchema(BaseModel):
+    offset: int
+    size: int
+    checksum: str
+
+    class Config:
+        from_attributes = True
+
+
+class UploadStatusSchema(UploadOutputSchema):
+    received: int
+    parts: list[UploadPartOutputSchema]
+    missing: list[tuple[int, int]]
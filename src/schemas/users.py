@@ -27,3 +27,21 @@ class UserOutputSchema(UserBaseSchema):
 class UserOutputDBSchema(UserOutputSchema):
     class Config:
         from_attributes = True
+
+
+class UserCacheSchema(UserOutputDBSchema):
+    is_active: bool
+    token_version: int = 0
+
+
+class TokenClaimsSchema(BaseModel):
+    username: str
+    user_id: UUID | None = None
+    token_version: int = 0
+
+
+class UsageOutputSchema(BaseModel):
+    used_bytes: int
+    file_count: int
+    quota: int | None
+    available: int | None
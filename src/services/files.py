@@ -1,21 +1,38 @@
+import asyncio
+import functools
 import logging
 import typing as tp
+from collections import Counter
 from dataclasses import dataclass, field
 from pathlib import Path
 from uuid import UUID
 
 from fastapi import UploadFile, Body
-from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core import exceptions
+from core.artifacts import artifact_cache
+from core.blobs import blob_store
+from core.compressors import ArchiveMember, CompressorProtocol
 from core.config import settings
-from core.utils import is_valid_uuid4, async_save_file
-from repositories.base import ModelType, PydanticSchemaType
+from core.enums import FileUploadStatus, OrderByType
+from core.executors import executor
+from core.extractors import extract_text
+from core.readers import iter_file_range
+from core.responses import FileValidators, make_validators
+from core.utils import Cursor, is_valid_uuid4
+from repositories.base import ModelType
+from repositories.blobs import blobs_crud
 from repositories.files import files_crud
+from repositories.usage import usage_crud
+from schemas import files as files_schemas
 
 logger = logging.getLogger(__name__)
 
+# Allowance for the boundaries and part headers of a multipart body, which don't count towards the quota
+MULTIPART_OVERHEAD = 64 * 1024
+
 
 @dataclass(slots=True)
 class PreparedFileObject:
@@ -24,71 +41,648 @@ class PreparedFileObject:
 
     size: int = field(init=False, repr=False)
     name: str = field(init=False, repr=False)
-    full_file_path: str = field(init=False, repr=False)
 
     @tp.no_type_check
     def __post_init__(self) -> None:
         self.size = self.obj.size
-        file_name = self.obj.filename
+        self.path, self.name = normalize_file_path(self.path, file_name=self.obj.filename)
 
-        path = Path(self.path.strip("/"))
-        full_path = settings.app.storage_directory / path
-        if not bool(full_path.suffix):
-            full_path = full_path / file_name
-            path = path / file_name
-        else:
-            file_name = full_path.name
 
-        full_path.parent.mkdir(parents=True, exist_ok=True)
-        self.name = file_name
-        self.full_file_path = full_path.absolute()
-        self.path = f"/{path}"
+def normalize_file_path(path: str, *, file_name: str | None) -> tuple[str, str | None]:
+    normalized_path = Path(path.strip("/"))
+    if not bool(normalized_path.suffix):
+        if file_name is None:
+            return f"/{normalized_path}", None
+        normalized_path = normalized_path / file_name
+    else:
+        file_name = normalized_path.name
+
+    return f"/{normalized_path}", file_name
 
 
 def get_prepared_file_from_body(file: UploadFile, path: tp.Annotated[str, Body(embed=True)]) -> PreparedFileObject:
     return PreparedFileObject(path=path, obj=file)
 
 
-async def get_absolute_storage_file_path(file_obj: PreparedFileObject) -> Path:
+def get_legacy_storage_file_path(file_obj: ModelType) -> Path:
     file_path = file_obj.path.strip("/")
     return settings.app.storage_directory / file_path
 
 
+def get_storage_file_path(file_obj: ModelType) -> Path | None:
+    """Returns the file path on the local file system, None when the content lives in a remote storage."""
+    if file_obj.blob_digest is not None:
+        return blob_store.get_path(file_obj.blob_digest)
+    return get_legacy_storage_file_path(file_obj)
+
+
+async def get_absolute_storage_file_path(file_obj: ModelType) -> Path:
+    """Returns a local path of the file content, remote contents are downloaded to the local cache first."""
+    if file_obj.blob_digest is not None:
+        return await blob_store.get_local_path(file_obj.blob_digest)
+    return get_legacy_storage_file_path(file_obj)
+
+
+def read_file(file_obj: ModelType, *, start: int = 0, end: int | None = None) -> tp.AsyncIterator[bytes]:
+    if file_obj.blob_digest is not None:
+        return blob_store.read(file_obj.blob_digest, start=start, end=end)
+    content = iter_file_range(
+        get_legacy_storage_file_path(file_obj),
+        chunk_size=settings.app.download_chunk_size,
+        start=start,
+        end=end,
+    )
+    return executor.iterate(content)
+
+
+def get_file_validators(file_obj: ModelType, *, compressor: CompressorProtocol) -> FileValidators:
+    last_modified = file_obj.updated_at or file_obj.created_at
+    if file_obj.blob_digest is not None:
+        etag = file_obj.blob_digest
+    else:
+        etag = f"{file_obj.id.hex}-{file_obj.size}-{int(last_modified.timestamp())}"
+    return make_validators(etag=f"{etag}{compressor.suffix}", last_modified=last_modified)
+
+
+async def get_compressed_file_path(
+    file_obj: ModelType, *, compressor: CompressorProtocol, validators: FileValidators
+) -> Path:
+    archive_path = await artifact_cache.get_or_create(
+        file_obj.id,
+        version=validators.etag.strip('"'),
+        compressor=compressor,
+        get_source_path=functools.partial(get_absolute_storage_file_path, file_obj),
+        arcname=file_obj.name,
+    )
+    return archive_path
+
+
+async def open_compressed_file(
+    file_obj: ModelType, *, compressor: CompressorProtocol, validators: FileValidators
+) -> tp.BinaryIO:
+    archive_file = await artifact_cache.open_or_create(
+        file_obj.id,
+        version=validators.etag.strip('"'),
+        compressor=compressor,
+        get_source_path=functools.partial(get_absolute_storage_file_path, file_obj),
+        arcname=file_obj.name,
+    )
+    return archive_file
+
+
+async def get_archive_members(
+    db: AsyncSession, *, user_id: str | UUID, path: str | None, ids: list[UUID] | None
+) -> tp.Iterator[ArchiveMember]:
+    prefix = f"/{path.strip('/')}/".replace("//", "/") if path is not None else None
+    logger.info(f'Get archive members by "{prefix}" path and {len(ids or [])} ids')
+    max_files = settings.app.bulk_download_max_files
+    files = await files_crud.get_multi_by_prefix_or_ids(
+        db,
+        user_id=user_id,
+        prefix=prefix,
+        ids=ids,
+        limit=max_files + 1,
+    )
+    if not files:
+        raise exceptions.FileNotFoundException(path or ", ".join(str(idx) for idx in ids or []))
+    if len(files) > max_files:
+        raise exceptions.BadRequestException(f"Too many files, at most {max_files} can be downloaded at once")
+
+    # Names are kept relative to the requested directory, files picked by id keep their full path
+    strip_length = len(prefix) if prefix is not None and not ids else 1
+    return iter_archive_members(files, strip_length=strip_length, loop=asyncio.get_running_loop())
+
+
+def iter_archive_members(
+    files: tp.Sequence[ModelType], *, strip_length: int, loop: asyncio.AbstractEventLoop
+) -> tp.Iterator[ArchiveMember]:
+    """Taken on an archive thread, so a remote content is downloaded only when its member is about to be written."""
+    for file in files:
+        file_path = get_storage_file_path(file)
+        if file_path is None:
+            file_path = asyncio.run_coroutine_threadsafe(get_absolute_storage_file_path(file), loop).result()
+        yield file_path, file.path[strip_length:]
+
+
 async def create_file(db: AsyncSession, *, prepared_file_object: PreparedFileObject, user_id: str | UUID) -> ModelType:
     logger.info(f"Create file by User(#{user_id})")
     try:
-        await async_save_file(file_obj=prepared_file_object.obj, file_path=prepared_file_object.full_file_path)
+        digest, size = await blob_store.get_digest(prepared_file_object.obj)
     except Exception as err:
         logger.exception(err)
         raise exceptions.BadRequestException("Invalid file")
 
+    file_in_db = await save_file_record(
+        db,
+        user_id=user_id,
+        path=prepared_file_object.path,
+        name=prepared_file_object.name,
+        digest=digest,
+        size=size,
+        store_blob=functools.partial(blob_store.write, prepared_file_object.obj, digest=digest),
+    )
+    return file_in_db
+
+
+async def get_storage_left(db: AsyncSession, *, user_id: str | UUID, path: str) -> int | None:
+    """Returns how many bytes the user may still store at `path`, None when storage is unlimited."""
+    quota = settings.app.user_storage_quota
+    if quota is None:
+        return None
+    usage = await usage_crud.get_by_user(db, user_id=user_id)
+    used = usage.used_bytes if usage is not None else 0
+    # The file being overwritten gives its space back
+    file_in_db = await files_crud.get_file_by_path(db, user_id=user_id, target_path=path)
+    if file_in_db is not None:
+        used -= file_in_db.size
+    return max(quota - used, 0)
+
+
+async def check_multipart_size(db: AsyncSession, *, user_id: str | UUID, content_length: int) -> None:
+    """Rejects a multipart body which can't fit into the storage left to the user, before it is received.
+
+    The paths of the files aren't known before the body is parsed, so no overwritten file gives its space back here.
+    The files themselves are checked exactly when they are saved, this only keeps oversized bodies off the disk.
+    """
+    storage_left = await get_storage_left(db, user_id=user_id, path="")
+    if storage_left is not None and content_length > storage_left + MULTIPART_OVERHEAD:
+        raise exceptions.PayloadTooLargeException("Storage quota exceeded")
+
+
+async def update_usage(db: AsyncSession, *, user_id: str | UUID, size: int, count: int = 0) -> None:
+    """Changes the usage counters of the user in the current transaction, it is rolled back beyond the quota.
+
+    The counters stay locked until commit, so concurrent uploads of the user can't exceed the quota together.
+    """
+    used_bytes, _ = await usage_crud.add(db, user_id=user_id, size=size, count=count)
+    quota = settings.app.user_storage_quota
+    if quota is not None and size > 0 and used_bytes > quota:
+        await db.rollback()
+        logger.error(f"Storage quota of User(#{user_id}) exceeded")
+        raise exceptions.PayloadTooLargeException("Storage quota exceeded")
+
+
+async def limit_stream(stream: tp.AsyncIterator[bytes], *, max_size: int | None) -> tp.AsyncIterator[bytes]:
+    size = 0
+    async for chunk in stream:
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise exceptions.PayloadTooLargeException("Storage quota exceeded")
+        yield chunk
+
+
+async def create_file_from_stream(
+    db: AsyncSession,
+    *,
+    path: str,
+    stream: tp.AsyncIterator[bytes],
+    user_id: str | UUID,
+    content_length: int | None = None,
+    checksum: str | None = None,
+) -> ModelType:
+    logger.info(f"Create file from stream by User(#{user_id})")
+    path, name = normalize_file_path(path, file_name=None)
+    if name is None:
+        raise exceptions.BadRequestException("File name is required in the path")
+
+    storage_left = await get_storage_left(db, user_id=user_id, path=path)
+    if storage_left is not None and content_length is not None and content_length > storage_left:
+        raise exceptions.PayloadTooLargeException("Storage quota exceeded")
+    # Nothing is read from the database while the body is received, so the connection goes back to the pool
+    await db.rollback()
+
+    tmp_path, digest, size = await blob_store.write_stream(limit_stream(stream, max_size=storage_left))
+    try:
+        if checksum is not None and checksum.lower() != digest:
+            logger.error(f'Checksum mismatch for "{path}" uploaded by User(#{user_id})')
+            raise exceptions.BadRequestException("Checksum mismatch")
+        file_in_db = await save_file_record(
+            db,
+            user_id=user_id,
+            path=path,
+            name=name,
+            digest=digest,
+            size=size,
+            store_blob=functools.partial(blob_store.move, tmp_path, digest=digest),
+        )
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return file_in_db
+
+
+async def index_blobs_content(db: AsyncSession, *, blobs: tp.Mapping[str, str]) -> None:
+    """Stores the text content of the blobs, given as digest -> file name, for full-text search."""
+    max_size = settings.search.content_max_size
+    heads = await asyncio.gather(*(blob_store.read_head(digest, size=max_size) for digest in blobs))
+    extracted = await asyncio.gather(
+        *(
+            executor.run_in_thread(extract_text, head, filename=filename)
+            for head, filename in zip(heads, blobs.values())
+        )
+    )
+    contents = {digest: content for digest, content in zip(blobs, extracted) if content}
+    if not contents:
+        return
+    try:
+        async with db.begin_nested():
+            await blobs_crud.set_contents(db, contents=contents)
+    except DBAPIError as err:
+        logger.error(f"Could not index content of {len(contents)} blobs: {err}")
+
+
+async def acquire_blob(
+    db: AsyncSession, *, digest: str, size: int, name: str, store_blob: tp.Callable[[], tp.Awaitable[None]]
+) -> None:
+    # The blob row stays locked until commit, so a concurrent release can't unlink the blob under us
+    ref_count = await blobs_crud.acquire(db, digest=digest, size=size)
+    if not await blob_store.exists(digest):
+        logger.info(f"Write new blob {digest}")
+        try:
+            await store_blob()
+        except Exception as err:
+            await db.rollback()
+            logger.exception(err)
+            raise exceptions.BadRequestException("Invalid file")
+    if ref_count == 1 and settings.search.content_enabled:
+        await index_blobs_content(db, blobs={digest: name})
+
+
+async def save_file_record(
+    db: AsyncSession,
+    *,
+    user_id: str | UUID,
+    path: str,
+    name: str,
+    digest: str,
+    size: int,
+    store_blob: tp.Callable[[], tp.Awaitable[None]],
+) -> ModelType:
+    # The file is locked first, as in a batch upload, so that concurrent overwrites count its old size once
+    files = await files_crud.get_multi_by_paths_for_update(db, user_id=user_id, paths=[path])
+    file_in_db = files[0] if files else None
+    if file_in_db is not None and file_in_db.blob_digest == digest:
+        logger.info(f'File "{path}" content is unchanged')
+        return file_in_db
+
+    if file_in_db is None:
+        await update_usage(db, user_id=user_id, size=size, count=1)
+    else:
+        await update_usage(db, user_id=user_id, size=size - file_in_db.size)
+    await acquire_blob(db, digest=digest, size=size, name=name, store_blob=store_blob)
     obj_in = {
-        "name": prepared_file_object.name,
-        "path": prepared_file_object.path,
-        "size": prepared_file_object.size,
-        "user_id": user_id,
+        "name": name,
+        "path": path,
+        "size": size,
+        "blob_digest": digest,
     }
-    file_in_db = await files_crud.create(db, obj_in=obj_in)
+    if file_in_db is None:
+        try:
+            file_in_db = await files_crud.create(db, obj_in={**obj_in, "user_id": user_id})
+        except IntegrityError as err:
+            await db.rollback()
+            logger.error(f'File "{path}" was created concurrently: {err}')
+            raise exceptions.BadRequestException("File with such path is being uploaded")
+        return file_in_db
+
+    logger.info(f'Overwrite file "{path}"')
+    old_digest = file_in_db.blob_digest
+    legacy_file_path = get_legacy_storage_file_path(file_in_db) if old_digest is None else None
+    # The file has to refer to the new blob before the old one can be deleted
+    file_in_db = await files_crud.update(db, db_obj=file_in_db, obj_in=obj_in, commit=False)
+    # Unlinked while the deleted blob row is locked, so a concurrent upload of the same content writes it anew
+    if old_digest is not None and await blobs_crud.release(db, digest=old_digest):
+        await blob_store.remove(old_digest)
+    await db.commit()
+    await artifact_cache.invalidate(file_in_db.id)
+    if legacy_file_path is not None:
+        legacy_file_path.unlink(missing_ok=True)
     return file_in_db
 
 
+def plan_batch_paths(uploads: list[UploadFile], *, directory: str) -> tuple[list[dict[str, tp.Any]], dict[str, int]]:
+    """Returns a failed result per upload and the index of the upload to store at every path, the last one wins."""
+    results: list[dict[str, tp.Any]] = [
+        {"filename": upload.filename, "status": FileUploadStatus.failed} for upload in uploads
+    ]
+    pending: dict[str, int] = {}
+    for index, upload in enumerate(uploads):
+        if not upload.filename:
+            results[index]["detail"] = "File name is required"
+            continue
+        name = Path(upload.filename).name
+        path = f"/{Path(directory.strip('/'), name)}"
+        results[index].update(path=path, name=name)
+        if (previous := pending.get(path)) is not None:
+            results[previous]["detail"] = "Replaced by a later file with the same path"
+        pending[path] = index
+    return results, pending
+
+
+async def get_batch_digests(
+    uploads: list[UploadFile], *, indexes: tp.Iterable[int], results: list[dict[str, tp.Any]]
+) -> dict[int, tuple[str, int]]:
+    indexes = list(indexes)
+    digests = await asyncio.gather(
+        *(blob_store.get_digest(uploads[index]) for index in indexes), return_exceptions=True
+    )
+    items: dict[int, tuple[str, int]] = {}
+    for index, digest in zip(indexes, digests):
+        if isinstance(digest, BaseException):
+            logger.error(f'Could not read "{results[index]["path"]}": {digest}')
+            results[index]["detail"] = "Invalid file"
+        else:
+            items[index] = digest
+    return items
+
+
+def get_changed_batch_files(
+    items: dict[int, tuple[str, int]], *, existing: dict[str, ModelType], results: list[dict[str, tp.Any]]
+) -> dict[int, tuple[str, int]]:
+    to_store: dict[int, tuple[str, int]] = {}
+    for index, (digest, size) in items.items():
+        file_in_db = existing.get(results[index]["path"])
+        if file_in_db is not None and file_in_db.blob_digest == digest:
+            results[index].update(status=FileUploadStatus.unchanged, file=file_in_db)
+        else:
+            to_store[index] = (digest, size)
+    return to_store
+
+
+def get_batch_usage(
+    to_store: dict[int, tuple[str, int]], *, existing: dict[str, ModelType], results: list[dict[str, tp.Any]]
+) -> tuple[int, int]:
+    """Returns by how many bytes and files storing `to_store` changes the usage of the user."""
+    size = count = 0
+    for index, (_, file_size) in to_store.items():
+        file_in_db = existing.get(results[index]["path"])
+        if file_in_db is None:
+            size += file_size
+            count += 1
+        else:
+            size += file_size - file_in_db.size
+    return size, count
+
+
+async def store_batch_blobs(
+    db: AsyncSession,
+    *,
+    uploads: list[UploadFile],
+    to_store: dict[int, tuple[str, int]],
+    results: list[dict[str, tp.Any]],
+    written: set[str],
+) -> None:
+    """Refers to the blobs of `to_store` and writes the missing ones, uploads which can't be written are dropped."""
+    references = Counter(digest for digest, _ in to_store.values())
+    sizes = {digest: size for digest, size in to_store.values()}
+    ref_counts = await blobs_crud.acquire_many(
+        db,
+        blobs={digest: (sizes[digest], count) for digest, count in references.items()},
+    )
+
+    # Same content in several files is written once
+    digests = {digest: index for index, (digest, _) in to_store.items()}
+    present = await asyncio.gather(*(blob_store.exists(digest) for digest in digests))
+    missing = {digest: index for (digest, index), exists in zip(digests.items(), present) if not exists}
+    stored = await asyncio.gather(
+        *(blob_store.write(uploads[index], digest=digest) for digest, index in missing.items()),
+        return_exceptions=True,
+    )
+    failed = set()
+    for digest, error in zip(missing, stored):
+        if isinstance(error, BaseException):
+            logger.error(f"Could not write blob {digest}: {error}")
+            failed.add(digest)
+        else:
+            written.add(digest)
+    if failed:
+        await blobs_crud.release_many(db, blobs={digest: references[digest] for digest in failed})
+        for index in [index for index, (digest, _) in to_store.items() if digest in failed]:
+            results[index]["detail"] = "Invalid file"
+            del to_store[index]
+
+    new_blobs = {
+        digest: results[index]["name"]
+        for index, (digest, _) in to_store.items()
+        if ref_counts[digest] == references[digest]
+    }
+    if new_blobs and settings.search.content_enabled:
+        await index_blobs_content(db, blobs=new_blobs)
+
+
+async def upsert_batch_files(
+    db: AsyncSession,
+    *,
+    user_id: str | UUID,
+    to_store: dict[int, tuple[str, int]],
+    existing: dict[str, ModelType],
+    results: list[dict[str, tp.Any]],
+) -> tuple[list[str], list[tuple[UUID, Path | None]]]:
+    """Returns the digests left unreferenced and the overwritten files with their legacy file to remove."""
+    old_digests: Counter[str] = Counter()
+    overwritten: list[tuple[UUID, Path | None]] = []
+    for index in to_store:
+        file_in_db = existing.get(results[index]["path"])
+        if file_in_db is None:
+            continue
+        if file_in_db.blob_digest is not None:
+            old_digests[file_in_db.blob_digest] += 1
+            overwritten.append((file_in_db.id, None))
+        else:
+            overwritten.append((file_in_db.id, get_legacy_storage_file_path(file_in_db)))
+
+    files = await files_crud.upsert_many(
+        db,
+        objs_in=[
+            {
+                "user_id": str(user_id),
+                "path": results[index]["path"],
+                "name": results[index]["name"],
+                "size": size,
+                "blob_digest": digest,
+            }
+            for index, (digest, size) in to_store.items()
+        ],
+    )
+    files_by_path = {file.path: file for file in files}
+    for index in to_store:
+        path = results[index]["path"]
+        status = FileUploadStatus.updated if path in existing else FileUploadStatus.created
+        results[index].update(status=status, file=files_by_path[path])
+    unreferenced = await blobs_crud.release_many(db, blobs=old_digests) if old_digests else []
+    return unreferenced, overwritten
+
+
+async def store_batch_files(
+    db: AsyncSession,
+    *,
+    user_id: str | UUID,
+    uploads: list[UploadFile],
+    to_store: dict[int, tuple[str, int]],
+    existing: dict[str, ModelType],
+    results: list[dict[str, tp.Any]],
+    written: set[str],
+) -> tuple[list[str], list[tuple[UUID, Path | None]]]:
+    # The whole batch is counted before any blob is written, so an oversized one writes nothing
+    size, count = get_batch_usage(to_store, existing=existing, results=results)
+    await update_usage(db, user_id=user_id, size=size, count=count)
+    await store_batch_blobs(db, uploads=uploads, to_store=to_store, results=results, written=written)
+
+    # Files whose blob could not be written have been dropped by now and give their share back
+    stored_size, stored_count = get_batch_usage(to_store, existing=existing, results=results)
+    if (stored_size, stored_count) != (size, count):
+        await update_usage(db, user_id=user_id, size=stored_size - size, count=stored_count - count)
+    if not to_store:
+        return [], []
+    return await upsert_batch_files(db, user_id=user_id, to_store=to_store, existing=existing, results=results)
+
+
+async def create_files(
+    db: AsyncSession, *, uploads: list[UploadFile], directory: str, user_id: str | UUID
+) -> list[dict[str, tp.Any]]:
+    logger.info(f"Create {len(uploads)} files by User(#{user_id})")
+    results, pending = plan_batch_paths(uploads, directory=directory)
+    items = await get_batch_digests(uploads, indexes=pending.values(), results=results)
+    if not items:
+        return results
+
+    written: set[str] = set()
+    overwritten: list[tuple[UUID, Path | None]] = []
+    try:
+        existing = {
+            file.path: file
+            for file in await files_crud.get_multi_by_paths_for_update(
+                db,
+                user_id=user_id,
+                paths=[results[index]["path"] for index in items],
+            )
+        }
+        to_store = get_changed_batch_files(items, existing=existing, results=results)
+        if to_store:
+            unreferenced, overwritten = await store_batch_files(
+                db,
+                user_id=user_id,
+                uploads=uploads,
+                to_store=to_store,
+                existing=existing,
+                results=results,
+                written=written,
+            )
+            # Unlinked while the deleted blob rows are locked, as in `discard_unreferenced_blobs`
+            for digest in unreferenced:
+                await blob_store.remove(digest)
+        await db.commit()
+    except Exception as err:
+        logger.exception(err)
+        await db.rollback()
+        await discard_unreferenced_blobs(db, digests=written)
+        detail = err.detail if isinstance(err, exceptions.PayloadTooLargeException) else "Could not save file"
+        for index in items:
+            results[index].update(status=FileUploadStatus.failed, file=None, detail=detail)
+        return results
+
+    for file_id, legacy_file_path in overwritten:
+        await artifact_cache.invalidate(file_id)
+        if legacy_file_path is not None:
+            legacy_file_path.unlink(missing_ok=True)
+    return results
+
+
+async def discard_unreferenced_blobs(db: AsyncSession, *, digests: tp.Iterable[str]) -> None:
+    """Removes the written blobs no file refers to, e.g. after the transaction that referred to them failed."""
+    digests = sorted(digests)
+    if not digests:
+        return
+    try:
+        # A zero reference upsert waits for concurrent uploads which are about to refer to the same blobs
+        await blobs_crud.acquire_many(db, blobs={digest: (0, 0) for digest in digests})
+        for digest in await blobs_crud.release_many(db, blobs={digest: 0 for digest in digests}):
+            await blob_store.remove(digest)
+        await db.commit()
+    except Exception as err:
+        logger.exception(err)
+        await db.rollback()
+
+
+def remove_legacy_file(file_path: Path) -> None:
+    """Removes a file stored at its path under the storage root and the directories left empty by it."""
+    file_path.unlink(missing_ok=True)
+    for directory in file_path.parents:
+        if directory == settings.app.storage_directory or settings.app.storage_directory not in directory.parents:
+            break
+        try:
+            directory.rmdir()
+        except OSError:
+            break
+
+
+async def migrate_legacy_file(db: AsyncSession, *, idx: str | UUID) -> bool:
+    """Moves the content of a file stored at its path under the storage root into the blob store.
+
+    The file keeps being served from its old path until the commit, the old path is removed afterwards. Returns False
+    when the file was overwritten or removed meanwhile.
+    """
+    file_in_db = await files_crud.get(db, idx=idx)
+    if file_in_db is None or file_in_db.blob_digest is not None:
+        return False
+    legacy_file_path = get_legacy_storage_file_path(file_in_db)
+    try:
+        # The content is hashed before the file is locked, legacy files are never written to anymore
+        digest, size = await blob_store.get_path_digest(legacy_file_path)
+    except FileNotFoundError:
+        logger.error(f'Content of file "{file_in_db.path}" is missing at {legacy_file_path}')
+        return False
+
+    file_in_db = await files_crud.get_for_update(db, idx=idx)
+    if file_in_db is None or file_in_db.blob_digest is not None:
+        await db.rollback()
+        return False
+    store_blob = functools.partial(blob_store.copy, legacy_file_path, digest=digest)
+    await acquire_blob(db, digest=digest, size=size, name=file_in_db.name, store_blob=store_blob)
+    await files_crud.set_blob_digest(db, idx=file_in_db.id, digest=digest)
+    await db.commit()
+    await artifact_cache.invalidate(file_in_db.id)
+    await executor.run_in_thread(remove_legacy_file, legacy_file_path)
+    return True
+
+
+async def delete_file(db: AsyncSession, *, user_id: str | UUID, value: str) -> None:
+    file_in_db = await get_file_by_id_or_path(db, user_id=user_id, value=value)
+    # Locked, so a concurrent overwrite or delete is counted once
+    file_in_db = await files_crud.get_for_update(db, idx=file_in_db.id) if file_in_db is not None else None
+    if file_in_db is None:
+        raise exceptions.FileNotFoundException(value)
+
+    logger.info(f'Delete file "{file_in_db.path}" by User(#{user_id})')
+    digest = file_in_db.blob_digest
+    legacy_file_path = get_legacy_storage_file_path(file_in_db) if digest is None else None
+    await update_usage(db, user_id=user_id, size=-file_in_db.size, count=-1)
+    await files_crud.delete(db, idx=file_in_db.id, commit=False)
+    if digest is not None and await blobs_crud.release(db, digest=digest):
+        await blob_store.remove(digest)
+    await db.commit()
+
+    await artifact_cache.invalidate(file_in_db.id)
+    if legacy_file_path is not None:
+        await executor.run_in_thread(remove_legacy_file, legacy_file_path)
+
+
 async def get_file_by_id(db: AsyncSession, *, idx: str) -> ModelType | None:
     logger.info(f"Get file by {idx} id")
     file: ModelType | None = await files_crud.get(db, idx=idx)
     return file
 
 
-async def get_file_by_path(db: AsyncSession, *, target_path: str) -> ModelType | None:
+async def get_file_by_path(db: AsyncSession, *, user_id: str | UUID, target_path: str) -> ModelType | None:
     logger.info(f'Get file by "{target_path}" path')
-    file: ModelType | None = await files_crud.get_file_by_path(db, target_path=target_path)
+    file: ModelType | None = await files_crud.get_file_by_path(db, user_id=user_id, target_path=target_path)
     return file
 
 
-async def get_file_by_id_or_path(db: AsyncSession, *, value: str) -> ModelType | None:
+async def get_file_by_id_or_path(db: AsyncSession, *, user_id: str | UUID, value: str) -> ModelType | None:
     logger.info(f'Get file by "{value}" id or path')
     idx = value if is_valid_uuid4(value) else None
     path = value
-    file: ModelType | None = await files_crud.get_file_by_id_or_path(db, idx=idx, path=path)
+    file: ModelType | None = await files_crud.get_file_by_id_or_path(db, user_id=user_id, idx=idx, path=path)
     return file
 
 
@@ -98,28 +692,56 @@ async def get_files_list(db: AsyncSession, *, skip: int, limit: int) -> list[Mod
     return files
 
 
-async def get_user_files(db: AsyncSession, *, user_id: str, skip: int, limit: int) -> list[ModelType]:
-    logger.info(f"Get User(#{user_id}) files [skip={skip};limit={limit}]")
-    files: list[ModelType] = await files_crud.get_multi_by_user(db, user_id=user_id, skip=skip, limit=limit)
-    return files
+async def get_user_files(
+    db: AsyncSession, *, user_id: str, skip: int, limit: int, cursor: str | None = None
+) -> tuple[list[ModelType], str | None]:
+    if cursor is None and skip:
+        logger.info(f"Get User(#{user_id}) files [skip={skip};limit={limit}]")
+        files: list[ModelType] = await files_crud.get_multi_by_user(db, user_id=user_id, skip=skip, limit=limit)
+        return files, None
+
+    logger.info(f"Get User(#{user_id}) files [cursor={cursor};limit={limit}]")
+    try:
+        after = Cursor.decode(cursor) if cursor is not None else None
+    except ValueError:
+        raise exceptions.BadRequestException("Invalid cursor")
+
+    files = await files_crud.get_page_by_user(db, user_id=user_id, after=after, limit=limit + 1)
+    if len(files) <= limit:
+        return files, None
+    files = files[:limit]
+    return files, Cursor(created_at=files[-1].created_at, id=files[-1].id).encode()
 
 
-async def search_files(db: AsyncSession, *, search_options: PydanticSchemaType | dict) -> list[ModelType]:
+async def search_files(
+    db: AsyncSession, *, user_id: str | UUID, search_options: files_schemas.SearchDataSchema
+) -> dict[str, tp.Any]:
     logger.info("Search files by options")
-    search_options_as_dict = jsonable_encoder(search_options, exclude_unset=True)
-    options = search_options_as_dict["options"]
-    order_by_data = options["order_by"]
+    options = search_options.options
+    order_by = options.order_by
     try:
-        files: list[ModelType] = await files_crud.search_files(
+        matches, total = await files_crud.search_files(
             db,
-            path=options["path"],
-            extension=options["extension"],
-            order_by_field=order_by_data["field"],
-            order_by_type=order_by_data["type"],
-            limit=options["limit"],
+            user_id=user_id,
+            path=options.path,
+            extension=options.extension,
+            query=search_options.query,
+            content=search_options.content and settings.search.content_enabled,
+            order_by_field=order_by.field if order_by else None,
+            order_by_type=order_by.type if order_by else OrderByType.descending,
+            limit=options.limit,
+            offset=options.offset,
         )
     except Exception as err:
         logger.exception(err)
         raise exceptions.BadRequestException("Invalid search data")
-    else:
-        return files
+
+    return {
+        "matches": [
+            files_schemas.FileMatchSchema.model_validate(file).model_copy(update={"rank": rank})
+            for file, rank in matches
+        ],
+        "total": total,
+        "offset": options.offset,
+        "limit": options.limit,
+    }
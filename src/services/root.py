@@ -1,22 +1,78 @@
-import time
-from dataclasses import dataclass
+import shutil
+from dataclasses import asdict
 
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.artifacts import FileCacheStats, artifact_cache
+from core.blobs import blob_store
+from core.cache import CacheStats, shared_backend
+from core.config import settings
+from core.executors import ExecutorStats, executor
+from core.health import HealthChecker, HealthReport, ProbeWarning
+from db.base import database
+from db.pool import PoolStats
+from services.users import users_cache
 
-@dataclass(frozen=True, slots=True)
-class ServiceInfo:
-    name: str
-    access_time: float | None = None
+health_checker = HealthChecker(ttl=settings.health.ttl, timeout=settings.health.timeout)
 
 
-async def database_access_time(db: AsyncSession) -> ServiceInfo:
-    start = time.monotonic()
-    try:
-        await db.execute(text("SELECT 1"))
-    finally:
-        access_time = time.monotonic() - start
-        access_time = round(access_time, 3)
+async def probe_database() -> dict:
+    # A bare pooled connection is enough, a session would only add the ORM overhead
+    async with database.engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    pool_stats = database.pool_stats()
+    return {"occupancy": pool_stats.occupancy, "timeouts": pool_stats.timeouts}
 
-    return ServiceInfo(name="db", access_time=access_time)
+
+async def probe_storage() -> dict:
+    details: dict = await blob_store.check()
+    # Uploads are staged and remote blobs are cached on the local disk whatever the storage backend is
+    disk_usage = await executor.run_in_thread(shutil.disk_usage, settings.app.storage_directory)
+    details["free_space"] = disk_usage.free
+    if disk_usage.free < settings.health.min_free_space:
+        raise ProbeWarning("Storage is running out of free space", details)
+    return details
+
+
+async def probe_executor() -> dict:
+    stats = asdict(executor.stats())
+    if stats["queue_depth"] > stats["max_workers"]:
+        raise ProbeWarning("Executor is saturated", stats)
+    return stats
+
+
+async def probe_shared_cache() -> None:
+    if not await shared_backend.ping():
+        raise RuntimeError("Shared cache backend did not answer the ping")
+
+
+health_checker.register("db", probe_database)
+health_checker.register("storage", probe_storage)
+health_checker.register("executor", probe_executor, critical=False)
+if shared_backend is not None:
+    # The users cache falls back to its local layer and the database without the shared backend
+    health_checker.register("shared_cache", probe_shared_cache, critical=False)
+
+
+async def check_health() -> HealthReport:
+    return await health_checker.check()
+
+
+def database_pool_stats() -> PoolStats:
+    return database.pool_stats()
+
+
+def executor_stats() -> ExecutorStats:
+    return executor.stats()
+
+
+def artifact_cache_stats() -> FileCacheStats:
+    return artifact_cache.stats()
+
+
+def blob_cache_stats() -> FileCacheStats:
+    return blob_store.cache_stats()
+
+
+def users_cache_stats() -> CacheStats:
+    return users_cache.stats()
@@ -0,0 +1,178 @@
+import functools
+import hashlib
+import logging
+import typing as tp
+from pathlib import Path
+from uuid import UUID
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import exceptions
+from core.blobs import blob_store
+from core.config import settings
+from core.executors import executor
+from core.utils import allocate_file, write_file_range
+from repositories.base import ModelType
+from repositories.uploads import uploads_crud, upload_parts_crud
+from schemas.uploads import UploadInputSchema
+from services.files import get_storage_left, normalize_file_path, save_file_record
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIRECTORY = settings.app.storage_directory / "uploads"
+
+
+def get_upload_file_path(upload: ModelType) -> Path:
+    return UPLOADS_DIRECTORY / upload.id.hex
+
+
+def get_missing_ranges(parts: tp.Iterable[tp.Any], *, size: int) -> list[tuple[int, int]]:
+    missing = []
+    position = 0
+    for part in sorted(parts, key=lambda p: p.offset):
+        if part.offset > position:
+            missing.append((position, part.offset))
+        position = max(position, part.offset + part.size)
+    if position < size:
+        missing.append((position, size))
+    return missing
+
+
+async def create_upload(db: AsyncSession, *, upload_in: UploadInputSchema, user_id: str | UUID) -> ModelType:
+    logger.info(f"Create upload by User(#{user_id})")
+    path, name = normalize_file_path(upload_in.path, file_name=upload_in.name)
+    if name is None:
+        raise exceptions.BadRequestException("File name is required when path is a directory")
+    # The whole size is allocated on disk right away, so the quota is checked before
+    storage_left = await get_storage_left(db, user_id=user_id, path=path)
+    if storage_left is not None and upload_in.size > storage_left:
+        raise exceptions.PayloadTooLargeException("Storage quota exceeded")
+
+    obj_in = {"name": name, "path": path, "size": upload_in.size, "user_id": user_id}
+    upload = await uploads_crud.create(db, obj_in=obj_in)
+    try:
+        UPLOADS_DIRECTORY.mkdir(parents=True, exist_ok=True)
+        await executor.run_in_thread(allocate_file, get_upload_file_path(upload), size=upload.size)
+    except Exception as err:
+        logger.exception(err)
+        await uploads_crud.delete(db, idx=upload.id)
+        raise exceptions.BadRequestException("Could not allocate upload")
+    return upload
+
+
+async def get_upload(db: AsyncSession, *, idx: UUID, user_id: str | UUID) -> ModelType:
+    upload = await uploads_crud.get_user_upload(db, idx=idx, user_id=user_id)
+    if upload is None:
+        raise exceptions.UploadNotFoundException(idx)
+    return upload
+
+
+async def get_upload_status(db: AsyncSession, *, upload: ModelType) -> dict:
+    parts = await upload_parts_crud.get_multi_by_upload(db, upload_id=upload.id)
+    missing = get_missing_ranges(parts, size=upload.size)
+    return {
+        "id": upload.id,
+        "name": upload.name,
+        "path": upload.path,
+        "size": upload.size,
+        "created_at": upload.created_at,
+        "received": upload.size - sum(end - start for start, end in missing),
+        "parts": parts,
+        "missing": missing,
+    }
+
+
+async def iter_part_buffers(
+    stream: tp.AsyncIterator[bytes], *, max_size: int, hasher: tp.Any
+) -> tp.AsyncIterator[bytes]:
+    """Hashes the part and yields it in buffers of `upload_buffer_size` bytes."""
+    buffer = bytearray()
+    size = 0
+    async for chunk in stream:
+        size += len(chunk)
+        if size > max_size:
+            raise exceptions.BadRequestException("Part is out of upload bounds")
+        hasher.update(chunk)
+        buffer += chunk
+        if len(buffer) >= settings.app.upload_buffer_size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def write_upload_part(
+    db: AsyncSession,
+    *,
+    upload: ModelType,
+    offset: int,
+    stream: tp.AsyncIterator[bytes],
+    checksum: str | None,
+) -> tp.Any:
+    upload_id, upload_size = upload.id, upload.size
+    logger.info(f"Write part of Upload(#{upload_id}) at {offset} offset")
+    file_path = get_upload_file_path(upload)
+    # Nothing is read from the database while the part is received, so the connection goes back to the pool
+    await db.rollback()
+    hasher = hashlib.sha256()
+    max_size = min(upload_size - offset, settings.app.upload_part_max_size)
+    position = offset
+    try:
+        async for data in iter_part_buffers(stream, max_size=max_size, hasher=hasher):
+            await executor.run_in_thread(write_file_range, file_path, offset=position, data=data)
+            position += len(data)
+
+        size = position - offset
+        if size == 0:
+            raise exceptions.BadRequestException("Empty part")
+
+        digest = hasher.hexdigest()
+        if checksum is not None and checksum.lower() != digest:
+            logger.error(f"Part checksum mismatch for Upload(#{upload_id}) at {offset} offset")
+            raise exceptions.BadRequestException("Part checksum mismatch")
+    except BaseException:
+        # Bytes are written in place, so previously received parts in this range are no longer trustworthy
+        if position > offset:
+            await upload_parts_crud.delete_overlapping(db, upload_id=upload_id, start=offset, end=position)
+        raise
+
+    try:
+        part = await upload_parts_crud.save_part(db, upload_id=upload_id, offset=offset, size=size, checksum=digest)
+    except IntegrityError:
+        # Aborted while the part was being received
+        await db.rollback()
+        raise exceptions.UploadNotFoundException(upload_id)
+    return part
+
+
+async def complete_upload(db: AsyncSession, *, upload: ModelType) -> ModelType:
+    logger.info(f"Complete Upload(#{upload.id})")
+    parts = await upload_parts_crud.get_multi_by_upload(db, upload_id=upload.id)
+    if get_missing_ranges(parts, size=upload.size):
+        raise exceptions.BadRequestException("Upload is incomplete")
+
+    file_path = get_upload_file_path(upload)
+    digest, size = await blob_store.get_path_digest(file_path)
+    # Deleted in the transaction which saves the file. The content is linked into the blob store rather than moved, so
+    # that a failed save or commit leaves both the upload and its file to retry
+    await uploads_crud.delete(db, idx=upload.id, commit=False)
+    file_in_db = await save_file_record(
+        db,
+        user_id=upload.user_id,
+        path=upload.path,
+        name=upload.name,
+        digest=digest,
+        size=size,
+        store_blob=functools.partial(blob_store.copy, file_path, digest=digest),
+    )
+    # An unchanged file is not saved, so its transaction is still open
+    await db.commit()
+    await executor.run_in_thread(file_path.unlink, missing_ok=True)
+    return file_in_db
+
+
+async def abort_upload(db: AsyncSession, *, upload: ModelType) -> None:
+    logger.info(f"Abort Upload(#{upload.id})")
+    await uploads_crud.delete(db, idx=upload.id)
+    get_upload_file_path(upload).unlink(missing_ok=True)
@@ -1,17 +1,26 @@
+import hashlib
 import logging
+import time
 import typing as tp
 from datetime import timedelta, datetime
+from uuid import UUID
 
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.cache import LayeredCache, TTLCache, shared_backend
 from core.config import settings
 from core.exceptions import UnauthorizedException, BadRequestException
+from core.executors import executor
+from core.metrics import password_hash_duration
 from core.utils import PasswordHasher
 from db import get_session
+from db.base import database
 from repositories.base import ModelType
+from repositories.files import files_crud
+from repositories.usage import usage_crud
 from repositories.users import users_crud
 from schemas import users as users_schemas
 
@@ -20,6 +29,25 @@ logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+users_cache: LayeredCache[users_schemas.UserCacheSchema] = LayeredCache(
+    "users",
+    ttl=settings.cache.user_ttl,
+    local_ttl=settings.cache.user_local_ttl,
+    max_size=settings.cache.user_max_size,
+    shared=shared_backend,
+    dumps=lambda user: user.model_dump_json(),
+    loads=users_schemas.UserCacheSchema.model_validate_json,
+)
+
+
+# Tokens are verified once per process, the cache key is a hash so that the tokens themselves aren't kept around.
+# Only the signature is checked once. The token version and the active flag are checked on every request against the
+# cached user instead of being kept in the claims, `invalidate_user` drops that entry in every worker on a change.
+verified_tokens: TTLCache[users_schemas.TokenClaimsSchema] = TTLCache(
+    ttl=settings.jwt.access_token_expire_minutes * 60,
+    max_size=settings.jwt.verified_cache_size,
+)
+
 
 def create_access_token(*, data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
@@ -33,17 +61,34 @@ def create_access_token(*, data: dict, expires_delta: timedelta | None = None) -
     return encoded_jwt
 
 
-def get_username_from_token(*, token: str) -> str:
+def create_user_access_token(user: ModelType) -> str:
+    return create_access_token(data={"sub": user.username, "uid": str(user.id), "ver": user.token_version})
+
+
+def get_claims_from_token(*, token: str) -> users_schemas.TokenClaimsSchema:
+    key = hashlib.sha256(token.encode()).hexdigest()
+    claims = verified_tokens.get(key)
+    if claims is not None:
+        return claims
+
     try:
         payload = jwt.decode(token, settings.jwt.secret_key, algorithms=[settings.jwt.algorithm])
-        username: str | None = payload.get("sub")
-        if username is None:
-            logger.error("Invalid user data from JWT token")
-            raise UnauthorizedException()
     except JWTError:
         logger.error("Invalid JWT token")
         raise UnauthorizedException()
-    return username
+    username: str | None = payload.get("sub")
+    if username is None:
+        logger.error("Invalid user data from JWT token")
+        raise UnauthorizedException()
+
+    # Tokens issued before the claims were added carry only the username
+    claims = users_schemas.TokenClaimsSchema(
+        username=username, user_id=payload.get("uid"), token_version=payload.get("ver", 0)
+    )
+    expires_in = payload["exp"] - time.time() if "exp" in payload else None
+    if expires_in is None or expires_in > 0:
+        verified_tokens.set(key, claims, ttl=expires_in)
+    return claims
 
 
 async def create_user(db: AsyncSession, *, username: str, password: str) -> ModelType:
@@ -53,7 +98,8 @@ async def create_user(db: AsyncSession, *, username: str, password: str) -> Mode
         logger.error(f"User {username} already exists")
         raise BadRequestException(detail="User with such username already exists")
 
-    hashed_password = PasswordHasher.get_password_hash(password=password)
+    with password_hash_duration.labels("hash").time():
+        hashed_password = await executor.run(PasswordHasher.get_password_hash, password=password)
     try:
         obj_in_data = {"username": username, "password_hash": hashed_password}
         user = await users_crud.create(db, obj_in=obj_in_data)
@@ -72,25 +118,116 @@ async def authenticate_user(db: AsyncSession, *, username: str, password: str) -
         logger.error("User does not exist")
         raise UnauthorizedException()
 
-    if not PasswordHasher.verify_password(plain_password=password, hashed_password=user.password_hash):
+    with password_hash_duration.labels("verify").time():
+        is_verified = await executor.run(
+            PasswordHasher.verify_password,
+            plain_password=password,
+            hashed_password=user.password_hash,
+        )
+    if not is_verified:
         logger.error("Incorrect password")
         raise UnauthorizedException()
 
+    # The password is known only here, so hashes of an old scheme or cost are replaced on login
+    if PasswordHasher.needs_update(user.password_hash):
+        logger.info(f"Rehash password of User(#{user.id})")
+        with password_hash_duration.labels("rehash").time():
+            password_hash = await executor.run(PasswordHasher.get_password_hash, password=password)
+        user = await update_user(db, user=user, obj_in={"password_hash": password_hash})
+
     logger.info("Success authenticate user")
     return user
 
 
+async def invalidate_user(username: str) -> None:
+    """Drops the cached user in every worker, it has to follow each committed change of the user."""
+    await users_cache.delete(username)
+
+
+async def update_user(db: AsyncSession, *, user: ModelType, obj_in: dict) -> ModelType:
+    logger.info(f"Update User(#{user.id})")
+    username = user.username
+    user = await users_crud.update(db, db_obj=user, obj_in=obj_in)
+    await invalidate_user(username)
+    return user
+
+
+async def deactivate_user(db: AsyncSession, *, user: ModelType) -> ModelType:
+    # The tokens are revoked too, so that they don't work again if the user is reactivated
+    return await update_user(db, user=user, obj_in={"is_active": False, "token_version": user.token_version + 1})
+
+
+async def delete_user(db: AsyncSession, *, user: ModelType) -> None:
+    logger.info(f"Delete User(#{user.id})")
+    await users_crud.delete(db, idx=user.id)
+    await invalidate_user(user.username)
+
+
+async def revoke_tokens(db: AsyncSession, *, user_id: str | UUID, username: str) -> None:
+    logger.info(f"Revoke tokens of User(#{user_id})")
+    await users_crud.increment_token_version(db, idx=user_id)
+    await invalidate_user(username)
+
+
+async def get_usage(db: AsyncSession, *, user_id: str | UUID) -> dict:
+    usage = await usage_crud.get_by_user(db, user_id=user_id)
+    used_bytes, file_count = (usage.used_bytes, usage.file_count) if usage is not None else (0, 0)
+    quota = settings.app.user_storage_quota
+    return {
+        "used_bytes": used_bytes,
+        "file_count": file_count,
+        "quota": quota,
+        "available": max(quota - used_bytes, 0) if quota is not None else None,
+    }
+
+
+async def reconcile_usage(db: AsyncSession, *, user_id: str | UUID) -> tuple[int, int]:
+    """Recounts the usage of the user from the files and returns by how many bytes and files the counters were off."""
+    # Uploads change the counters before the files, so with the counters locked no file changes are in flight
+    used_bytes, file_count = await usage_crud.add(db, user_id=user_id, size=0, count=0)
+    actual_bytes, actual_count = await files_crud.count_usage_by_user(db, user_id=user_id)
+    if (actual_bytes, actual_count) != (used_bytes, file_count):
+        await usage_crud.set(db, user_id=user_id, used_bytes=actual_bytes, file_count=actual_count)
+    await db.commit()
+    return used_bytes - actual_bytes, file_count - actual_count
+
+
 async def get_current_user(
     token: tp.Annotated[str, Depends(oauth2_scheme)],
     db: AsyncSession = Depends(get_session),
-) -> users_schemas.UserOutputDBSchema:
+) -> users_schemas.UserCacheSchema:
     logger.info("Try to get user from JWT token")
-    username = get_username_from_token(token=token)
-    logger.info("Try to get user by username")
-    user = await users_crud.get_by_username(db, username=username)  # type: ignore
-    if user is None or not user.is_active:
-        logger.error("User does not exists or not active")
+    claims = get_claims_from_token(token=token)
+    user = await users_cache.get(claims.username)
+    if user is None:
+        logger.info("Try to get user by username")
+        user_in_db = await users_crud.get_by_username(db, username=claims.username)  # type: ignore
+        if user_in_db is None:
+            logger.error("User does not exists")
+            raise UnauthorizedException()
+        user = users_schemas.UserCacheSchema.model_validate(user_in_db)
+        await users_cache.set(claims.username, user)
+
+    # A token of a deleted user must not match a new user who took the same username
+    if claims.user_id is not None and claims.user_id != user.id:
+        logger.error("Token was issued for another user")
+        raise UnauthorizedException()
+    if claims.token_version != user.token_version:
+        logger.error("Token has been revoked")
+        raise UnauthorizedException()
+    if not user.is_active:
+        logger.error("User is not active")
         raise UnauthorizedException()
 
+    # The session is the one of the route as well, its commits mark the user as a recent writer
+    db.info["user_id"] = str(user.id)
     logger.info("Success getting user from JWT token")
     return user
+
+
+async def get_user_read_session(
+    current_user: tp.Annotated[users_schemas.UserCacheSchema, Depends(get_current_user)],
+) -> tp.AsyncGenerator[AsyncSession, None]:
+    """Session reading from a replica, unless the current user has written recently, see `Database.session`."""
+    async with database.session(use_replica=True, user_id=str(current_user.id)) as s:
+        yield s
@@ -0,0 +1 @@
+API = "/api/v1"
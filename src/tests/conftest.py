@@ -0,0 +1,54 @@
+import typing as tp
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.base import database
+from main import app
+from repositories.users import users_crud
+from tests import API
+
+
+@pytest.fixture
+async def db() -> tp.AsyncGenerator[AsyncSession, None]:
+    """Session on the primary whose changes are rolled back after the test, skips the test without a database."""
+    try:
+        async with database.engine.connect():
+            pass
+    except OSError:
+        pytest.skip("Database is unavailable")
+
+    async with database.session() as session:
+        yield session
+        await session.rollback()
+    # Pooled connections belong to the event loop of the test
+    await database.engine.dispose()
+
+
+@pytest.fixture
+async def user_id(db: AsyncSession) -> uuid.UUID:
+    user = await users_crud.create(
+        db, obj_in={"username": f"test-{uuid.uuid4().hex}", "password_hash": "hash"}, commit=False
+    )
+    return user.id
+
+
+@pytest.fixture
+def client() -> tp.Generator[TestClient, None, None]:
+    """Client of the app, `client.portal.call` runs a coroutine on the loop of the app."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers(client: TestClient) -> dict[str, str]:
+    """Registers a new user and returns the headers of their requests, skips the test without a database."""
+    credentials = {"username": f"test-{uuid.uuid4().hex}", "password": "password"}
+    try:
+        client.post(f"{API}/users/register", json=credentials)
+    except OSError:
+        pytest.skip("Database is unavailable")
+    response = client.post(f"{API}/users/auth", data=credentials)
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
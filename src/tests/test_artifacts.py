@@ -0,0 +1,90 @@
+import asyncio
+import typing as tp
+import uuid
+from pathlib import Path
+
+import pytest
+
+from core.artifacts import CompressedArtifactCache, FileCache
+
+
+def builder(content: bytes, builds: list[Path]) -> tp.Callable[[Path], tp.Awaitable[None]]:
+    async def build(target_path: Path) -> None:
+        builds.append(target_path)
+        target_path.write_bytes(content)
+
+    return build
+
+
+async def test_build_once_and_hit(tmp_path: Path) -> None:
+    cache = FileCache(tmp_path, max_size=1000)
+    path, builds = tmp_path / "a" / "v1", []
+    results = await asyncio.gather(*(cache.get_or_build(path, build=builder(b"data", builds)) for _ in range(3)))
+    assert results == [path] * 3
+    assert len(builds) == 1
+    assert path.read_bytes() == b"data"
+
+    with await cache.open(path, build=builder(b"other", builds)) as cached_file:
+        assert cached_file.read() == b"data"
+    stats = cache.stats()
+    assert (stats.entries, stats.size, stats.misses, stats.hits) == (1, 4, 1, 3)
+
+
+async def test_least_recently_used_is_evicted(tmp_path: Path) -> None:
+    cache = FileCache(tmp_path, max_size=250)
+    paths, builds = [tmp_path / name / "v1" for name in "abc"], []
+    for path in paths[:2]:
+        await cache.get_or_build(path, build=builder(b"x" * 100, builds))
+    # The first file is used again, so the second one is the least recently used
+    await cache.get_or_build(paths[0], build=builder(b"x" * 100, builds))
+    await cache.get_or_build(paths[2], build=builder(b"x" * 100, builds))
+
+    assert [path.exists() for path in paths] == [True, False, True]
+    stats = cache.stats()
+    assert (stats.entries, stats.size, stats.evictions) == (2, 200, 1)
+
+
+async def test_failed_build_is_not_cached(tmp_path: Path) -> None:
+    cache = FileCache(tmp_path, max_size=1000)
+    path = tmp_path / "a" / "v1"
+
+    async def fail(target_path: Path) -> None:
+        target_path.write_bytes(b"partial")
+        raise RuntimeError("Build failed")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_build(path, build=fail)
+    assert not path.exists()
+    assert list((tmp_path / "tmp").iterdir()) == []
+    assert cache.stats().entries == 0
+
+
+async def test_files_are_loaded_from_disk(tmp_path: Path) -> None:
+    path, builds = tmp_path / "a" / "v1", []
+    await FileCache(tmp_path, max_size=1000).get_or_build(path, build=builder(b"data", builds))
+    await FileCache(tmp_path, max_size=1000).get_or_build(path, build=builder(b"data", builds))
+    assert len(builds) == 1
+
+
+async def test_invalidate_waits_for_build(tmp_path: Path) -> None:
+    cache = CompressedArtifactCache(tmp_path, max_size=1000)
+    file_id = uuid.uuid4()
+    path = cache.get_path(file_id, version="v1")
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def build(target_path: Path) -> None:
+        started.set()
+        await release.wait()
+        target_path.write_bytes(b"stale")
+
+    building = asyncio.ensure_future(cache.get_or_build(path, build=build))
+    await started.wait()
+    invalidating = asyncio.ensure_future(cache.invalidate(file_id))
+    await asyncio.sleep(0.05)
+    assert not invalidating.done()
+
+    release.set()
+    await asyncio.gather(building, invalidating)
+    # The file built from the old content doesn't outlive the invalidation
+    assert not path.exists()
+    assert cache.stats().entries == 0
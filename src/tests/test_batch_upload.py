@@ -0,0 +1,60 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from core.config import settings
+from tests import API
+
+
+def upload_batch(client: TestClient, headers: dict[str, str], files: list[tuple[str, bytes]]) -> list[dict]:
+    response = client.post(
+        f"{API}/files/upload/batch",
+        data={"path": "/batch"},
+        files=[("files", file) for file in files],
+        headers=headers,
+    )
+    assert response.status_code == 200
+    return response.json()["results"]
+
+
+def download(client: TestClient, headers: dict[str, str], path: str) -> bytes:
+    response = client.get(f"{API}/files/download", params={"path": path, "compression_type": "none"}, headers=headers)
+    assert response.status_code == 200
+    return response.content
+
+
+def test_batch_upload(client: TestClient, auth_headers: dict[str, str]) -> None:
+    results = upload_batch(client, auth_headers, [("a.txt", b"first"), ("b.txt", b"second"), ("a.txt", b"third")])
+    assert [(result["path"], result["status"]) for result in results] == [
+        ("/batch/a.txt", "failed"),
+        ("/batch/b.txt", "created"),
+        ("/batch/a.txt", "created"),
+    ]
+    # The last file with the same path wins
+    assert download(client, auth_headers, "/batch/a.txt") == b"third"
+
+    results = upload_batch(client, auth_headers, [("a.txt", b"third"), ("b.txt", b"changed")])
+    assert [result["status"] for result in results] == ["unchanged", "updated"]
+    assert download(client, auth_headers, "/batch/b.txt") == b"changed"
+
+
+def test_batch_upload_beyond_quota(
+    client: TestClient, auth_headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings.app, "user_storage_quota", 1000)
+    results = upload_batch(client, auth_headers, [("a.bin", b"a" * 600), ("b.bin", b"b" * 600)])
+    # The batch is saved in one transaction, so none of its files is kept
+    assert [result["status"] for result in results] == ["failed", "failed"]
+    assert client.get(f"{API}/users/me/usage", headers=auth_headers).json()["used_bytes"] == 0
+
+
+def test_batch_upload_too_many_files(
+    client: TestClient, auth_headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings.app, "batch_upload_max_files", 2)
+    response = client.post(
+        f"{API}/files/upload/batch",
+        data={"path": "/batch"},
+        files=[("files", (f"{number}.txt", b"data")) for number in range(3)],
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
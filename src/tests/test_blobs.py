@@ -0,0 +1,72 @@
+import hashlib
+import os
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.blobs import blob_store
+from db.base import database
+from repositories.blobs import blobs_crud
+from tests import API
+
+
+def new_digest() -> str:
+    return hashlib.sha256(uuid.uuid4().bytes).hexdigest()
+
+
+async def test_acquire_and_release(db: AsyncSession) -> None:
+    digest = new_digest()
+    assert await blobs_crud.acquire(db, digest=digest, size=10) == 1
+    assert await blobs_crud.acquire(db, digest=digest, size=10) == 2
+
+    assert not await blobs_crud.release(db, digest=digest)
+    assert (await blobs_crud.get_by_digest(db, digest=digest)).ref_count == 1
+    # The last reference deletes the blob row
+    assert await blobs_crud.release(db, digest=digest)
+    assert await blobs_crud.get_by_digest(db, digest=digest) is None
+
+
+async def test_release_unknown(db: AsyncSession) -> None:
+    assert not await blobs_crud.release(db, digest=new_digest())
+
+
+async def test_acquire_and_release_many(db: AsyncSession) -> None:
+    shared, single = new_digest(), new_digest()
+    assert await blobs_crud.acquire(db, digest=shared, size=10) == 1
+
+    ref_counts = await blobs_crud.acquire_many(db, blobs={shared: (10, 2), single: (20, 1)})
+    assert ref_counts == {shared: 3, single: 1}
+
+    unreferenced = await blobs_crud.release_many(db, blobs={shared: 2, single: 1})
+    assert unreferenced == [single]
+    assert (await blobs_crud.get_by_digest(db, digest=shared)).ref_count == 1
+    assert await blobs_crud.get_by_digest(db, digest=single) is None
+
+
+def test_files_share_blob(client: TestClient, auth_headers: dict[str, str]) -> None:
+    content = os.urandom(1024)
+    digest = hashlib.sha256(content).hexdigest()
+
+    async def get_ref_count() -> int | None:
+        async with database.session() as db:
+            blob = await blobs_crud.get_by_digest(db, digest=digest)
+            return blob.ref_count if blob is not None else None
+
+    for path in ("/dedup/a.bin", "/dedup/b.bin"):
+        response = client.put(f"{API}/files/content", params={"path": path}, content=content, headers=auth_headers)
+        assert response.status_code == 200
+    assert client.portal.call(get_ref_count) == 2
+    assert blob_store.get_path(digest).read_bytes() == content
+
+    client.delete(f"{API}/files/", params={"path": "/dedup/a.bin"}, headers=auth_headers)
+    assert client.portal.call(get_ref_count) == 1
+    response = client.get(
+        f"{API}/files/download", params={"path": "/dedup/b.bin", "compression_type": "none"}, headers=auth_headers
+    )
+    assert response.content == content
+
+    # The blob goes away with its last file
+    client.delete(f"{API}/files/", params={"path": "/dedup/b.bin"}, headers=auth_headers)
+    assert client.portal.call(get_ref_count) is None
+    assert not blob_store.get_path(digest).exists()
@@ -0,0 +1,60 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tests import API
+
+FILES = {"/project/readme.md": b"readme", "/project/src/main.py": b"print()", "/other/data.csv": b"a,b"}
+
+
+@pytest.fixture
+def files(client: TestClient, auth_headers: dict[str, str]) -> dict[str, str]:
+    ids = {}
+    for path, content in FILES.items():
+        response = client.put(f"{API}/files/content", params={"path": path}, content=content, headers=auth_headers)
+        ids[path] = response.json()["id"]
+    return ids
+
+
+def test_download_directory(client: TestClient, auth_headers: dict[str, str], files: dict[str, str]) -> None:
+    response = client.post(
+        f"{API}/files/download/bulk",
+        params={"compression_type": "zip"},
+        json={"path": "/project"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="project.zip"'
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zip_file:
+        # Names are relative to the directory
+        assert {name: zip_file.read(name) for name in zip_file.namelist()} == {
+            "readme.md": b"readme",
+            "src/main.py": b"print()",
+        }
+
+
+def test_download_by_ids(client: TestClient, auth_headers: dict[str, str], files: dict[str, str]) -> None:
+    ids = [files["/project/readme.md"], files["/other/data.csv"]]
+    response = client.post(
+        f"{API}/files/download/bulk", params={"compression_type": "tar"}, json={"ids": ids}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    with tarfile.open(fileobj=io.BytesIO(response.content), mode="r:gz") as tar_file:
+        assert {name: tar_file.extractfile(name).read() for name in tar_file.getnames()} == {
+            "project/readme.md": b"readme",
+            "other/data.csv": b"a,b",
+        }
+
+
+def test_download_missing_or_unarchived(client: TestClient, auth_headers: dict[str, str]) -> None:
+    response = client.post(
+        f"{API}/files/download/bulk", params={"compression_type": "zip"}, json={"path": "/none"}, headers=auth_headers
+    )
+    assert response.status_code == 404
+    response = client.post(
+        f"{API}/files/download/bulk", params={"compression_type": "none"}, json={"path": "/none"}, headers=auth_headers
+    )
+    assert response.status_code == 400
@@ -0,0 +1,119 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core.cache import LayeredCache, TTLCache
+from db.base import database
+from repositories.users import users_crud
+from services.users import get_claims_from_token, update_user, users_cache
+from tests import API
+
+
+class MemoryBackend:
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+        self.published: list[tuple[str, str]] = []
+        self.available = True
+
+    def _check(self) -> None:
+        if not self.available:
+            raise ConnectionError("Connection refused")
+
+    async def get(self, key: str) -> str | None:
+        self._check()
+        return self.values.get(key)
+
+    async def set(self, key: str, value: str, *, ttl: float) -> None:
+        self._check()
+        self.values[key] = value
+
+    async def delete(self, key: str) -> None:
+        self._check()
+        self.values.pop(key, None)
+
+    async def publish(self, channel: str, message: str) -> None:
+        self._check()
+        self.published.append((channel, message))
+
+
+def layered_cache(shared: MemoryBackend | None) -> LayeredCache[dict]:
+    return LayeredCache(
+        "test", ttl=60, local_ttl=1, max_size=10, shared=shared, dumps=json.dumps, loads=json.loads  # type: ignore
+    )
+
+
+def test_ttl_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache: TTLCache[int] = TTLCache(ttl=10, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    # The least recently used entry goes first
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+async def test_layered_cache_local() -> None:
+    cache = layered_cache(None)
+    assert await cache.get("key") is None
+    await cache.set("key", {"value": 1})
+    assert await cache.get("key") == {"value": 1}
+    await cache.delete("key")
+    assert await cache.get("key") is None
+
+    stats = cache.stats()
+    assert (stats.hits, stats.shared_hits, stats.misses, stats.hit_ratio) == (1, 0, 2, 0.333)
+
+
+async def test_layered_cache_shared() -> None:
+    shared = MemoryBackend()
+    await layered_cache(shared).set("key", {"value": 1})
+    # Another worker finds the value in the shared backend
+    cache = layered_cache(shared)
+    assert await cache.get("key") == {"value": 1}
+    assert await cache.get("key") == {"value": 1}
+    assert (cache.stats().hits, cache.stats().shared_hits) == (1, 1)
+
+    await cache.delete("key")
+    assert shared.values == {}
+    assert shared.published == [("test:deleted", "key")]
+
+
+async def test_layered_cache_shared_unavailable() -> None:
+    shared = MemoryBackend()
+    cache = layered_cache(shared)
+    shared.available = False
+    await cache.set("key", {"value": 1})
+    assert await cache.get("key") == {"value": 1}
+    await cache.delete("key")
+    assert await cache.get("key") is None
+
+
+def test_user_is_cached_until_updated(client: TestClient, auth_headers: dict[str, str]) -> None:
+    assert client.get(f"{API}/users/me/usage", headers=auth_headers).status_code == 200
+    hits = users_cache.stats().hits
+    assert client.get(f"{API}/users/me/usage", headers=auth_headers).status_code == 200
+    assert users_cache.stats().hits == hits + 1
+
+    username = get_claims_from_token(token=auth_headers["Authorization"].removeprefix("Bearer ")).username
+
+    async def deactivate() -> None:
+        async with database.session() as db:
+            user = await users_crud.get_by_username(db, username=username)
+            await update_user(db, user=user, obj_in={"is_active": False})
+
+    client.portal.call(deactivate)  # type: ignore[union-attr]
+    # The update drops the cached user, so it is seen by the next request
+    assert client.get(f"{API}/users/me/usage", headers=auth_headers).status_code == 401
+
+
+def test_cache_stats_are_reported(client: TestClient) -> None:
+    response = client.get(f"{API}/stats")
+    assert response.status_code == 200
+    assert response.json()["users_cache"]["name"] == "users"
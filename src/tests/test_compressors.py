@@ -0,0 +1,55 @@
+import io
+import os
+import tarfile
+import zipfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core.compressors import TarCompressor, ZipCompressor
+from tests import API
+
+CHUNK_SIZE = 64 * 1024
+
+
+@pytest.fixture
+def members(tmp_path: Path) -> list[tuple[Path, str]]:
+    members = []
+    for name, size in (("random.bin", 300 * 1024), ("empty.bin", 0), ("odd.bin", 1001)):
+        file_path = tmp_path / name
+        file_path.write_bytes(os.urandom(size))
+        members.append((file_path, f"dir/{name}"))
+    return members
+
+
+def test_zip_is_streamed(members: list[tuple[Path, str]]) -> None:
+    chunks = list(ZipCompressor.iter_archive(members, chunk_size=CHUNK_SIZE))
+    # Random data doesn't shrink, so the archive is sent before the whole of it is compressed
+    assert len(chunks) > 1
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zip_file:
+        assert zip_file.testzip() is None
+        for file_path, arcname in members:
+            assert zip_file.read(arcname) == file_path.read_bytes()
+
+
+@pytest.mark.parametrize("read_ahead", [False, True])
+def test_tar_is_streamed(members: list[tuple[Path, str]], read_ahead: bool) -> None:
+    chunks = list(TarCompressor.iter_archive(members, chunk_size=CHUNK_SIZE, read_ahead=read_ahead))
+    assert len(chunks) > 1
+    with tarfile.open(fileobj=io.BytesIO(b"".join(chunks)), mode="r:gz") as tar_file:
+        assert tar_file.getnames() == [arcname for _, arcname in members]
+        for file_path, arcname in members:
+            assert tar_file.extractfile(arcname).read() == file_path.read_bytes()
+
+
+def test_download_zip(client: TestClient, auth_headers: dict[str, str]) -> None:
+    content = os.urandom(100 * 1024)
+    client.put(f"{API}/files/content", params={"path": "/report.bin"}, content=content, headers=auth_headers)
+    response = client.get(
+        f"{API}/files/download", params={"path": "/report.bin", "compression_type": "zip"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="report.zip"'
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zip_file:
+        assert zip_file.read("report.bin") == content
@@ -0,0 +1,66 @@
+import contextlib
+import threading
+import typing as tp
+
+import pytest
+
+from core.enums import ExecutorKind
+from core.executors import TaskExecutor
+
+
+@pytest.fixture
+def task_executor() -> tp.Generator[TaskExecutor, None, None]:
+    task_executor = TaskExecutor(kind=ExecutorKind.thread, max_workers=2)
+    yield task_executor
+    task_executor.shutdown()
+
+
+def produce(count: int, closed: threading.Event) -> tp.Iterator[int]:
+    try:
+        yield from range(count)
+    finally:
+        closed.set()
+
+
+async def test_run(task_executor: TaskExecutor) -> None:
+    assert await task_executor.run(int, "ff", base=16) == 255
+    thread_name = await task_executor.run_in_thread(lambda: threading.current_thread().name)
+    assert thread_name.startswith("executor")
+
+    stats = task_executor.stats()
+    assert (stats.submitted, stats.completed, stats.in_flight) == (2, 2, 0)
+
+
+async def test_iterate(task_executor: TaskExecutor) -> None:
+    closed = threading.Event()
+    assert [item async for item in task_executor.iterate(produce(5, closed))] == list(range(5))
+    assert closed.is_set()
+
+
+async def test_iterate_raises(task_executor: TaskExecutor) -> None:
+    def fail() -> tp.Iterator[int]:
+        yield 1
+        raise ValueError("broken")
+
+    items = []
+    with pytest.raises(ValueError, match="broken"):
+        async for item in task_executor.iterate(fail()):
+            items.append(item)
+    assert items == [1]
+
+
+async def test_iterate_on_thread() -> None:
+    closed = threading.Event()
+    items = [item async for item in TaskExecutor.iterate_on_thread(produce(100, closed), depth=4)]
+    assert items == list(range(100))
+    assert closed.wait(timeout=5)
+
+
+async def test_iterate_on_thread_stopped_early() -> None:
+    closed = threading.Event()
+    async with contextlib.aclosing(TaskExecutor.iterate_on_thread(produce(1000, closed), depth=2)) as items:
+        async for item in items:
+            if item == 3:
+                break
+    # The producer stops at the next item instead of running through the whole iterator
+    assert closed.wait(timeout=5)
@@ -0,0 +1,71 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from core.enums import HealthStatus
+from core.health import HealthChecker, ProbeWarning
+from tests import API
+
+
+async def ok() -> dict:
+    return {"answer": 42}
+
+
+async def warn() -> None:
+    raise ProbeWarning("Almost full", {"free": 1})
+
+
+async def broken() -> None:
+    raise ConnectionError("Connection refused")
+
+
+async def hang() -> None:
+    await asyncio.sleep(10)
+
+
+async def test_probes_run_concurrently() -> None:
+    checker = HealthChecker(ttl=0, timeout=0.2)
+    checker.register("ok", ok)
+    checker.register("warn", warn, critical=False)
+    checker.register("hang", hang, critical=False)
+    report = await asyncio.wait_for(checker.check(), timeout=1)
+
+    assert report.status == HealthStatus.degraded
+    assert report.checks["ok"].details == {"answer": 42}
+    assert report.checks["warn"].status == HealthStatus.degraded
+    assert report.checks["warn"].details == {"free": 1, "error": "Almost full"}
+    assert report.checks["hang"].status == HealthStatus.fail
+
+
+async def test_critical_probe_fails_report() -> None:
+    checker = HealthChecker(ttl=0, timeout=1)
+    checker.register("ok", ok)
+    checker.register("broken", broken)
+    report = await checker.check()
+    assert report.status == HealthStatus.fail
+    assert report.checks["broken"].details == {"error": "ConnectionError('Connection refused')"}
+
+
+async def test_report_is_shared() -> None:
+    runs = 0
+
+    async def counted() -> None:
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+
+    checker = HealthChecker(ttl=60, timeout=1)
+    checker.register("counted", counted)
+    reports = await asyncio.gather(*(checker.check() for _ in range(5)))
+    await checker.check()
+    assert runs == 1
+    assert all(report is reports[0] for report in reports)
+
+
+def test_ping(client: TestClient) -> None:
+    response = client.get(f"{API}/ping")
+    report = response.json()
+    assert response.status_code == (503 if report["status"] == "fail" else 200)
+    assert set(report["checks"]) >= {"db", "storage", "executor"}
+    # The latencies are reported on the top level as well
+    assert report["db"] == report["checks"]["db"]["latency"]
@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+
+from tests import API
+
+
+def upload(client: TestClient, headers: dict[str, str], path: str) -> dict:
+    response = client.put(f"{API}/files/content", params={"path": path}, content=path.encode(), headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_list_pages_by_cursor(client: TestClient, auth_headers: dict[str, str]) -> None:
+    uploaded = [upload(client, auth_headers, f"/list/{number}.txt")["id"] for number in range(5)]
+
+    listed, cursor = [], None
+    for _ in range(3):
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        page = client.get(f"{API}/files/list", params=params, headers=auth_headers).json()
+        listed.extend(file["id"] for file in page["files"])
+        cursor = page["next_cursor"]
+    assert cursor is None
+    # Newest files come first
+    assert listed == uploaded[::-1]
+
+
+def test_list_page_is_stable_after_insert(client: TestClient, auth_headers: dict[str, str]) -> None:
+    uploaded = [upload(client, auth_headers, f"/list/{number}.txt")["id"] for number in range(3)]
+    page = client.get(f"{API}/files/list", params={"limit": 2}, headers=auth_headers).json()
+    # Unlike an offset, the cursor doesn't shift when newer files are added before it is used
+    upload(client, auth_headers, "/list/new.txt")
+    page = client.get(
+        f"{API}/files/list", params={"limit": 2, "cursor": page["next_cursor"]}, headers=auth_headers
+    ).json()
+    assert [file["id"] for file in page["files"]] == [uploaded[0]]
+    assert page["next_cursor"] is None
+
+
+def test_list_invalid_cursor(client: TestClient, auth_headers: dict[str, str]) -> None:
+    response = client.get(f"{API}/files/list", params={"cursor": "not a cursor"}, headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,86 @@
+import typing as tp
+
+import pytest
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.config import settings
+from db.models import User
+from db.replicas import ReplicaSet, RoutingAsyncSession, RoutingSession
+
+
+@pytest.fixture
+async def engines() -> tp.AsyncGenerator[list[AsyncEngine], None]:
+    engines = [create_async_engine(str(settings.db.dsn)) for _ in range(3)]
+    yield engines
+    for engine in engines:
+        await engine.dispose()
+
+
+@pytest.fixture
+def replicas(engines: list[AsyncEngine]) -> ReplicaSet:
+    primary, *replica_engines = engines
+    return ReplicaSet(primary, replica_engines, check_interval=1, max_lag=5, shared=None, max_writers=10)
+
+
+def set_healthy(replicas: ReplicaSet, *states: bool) -> None:
+    for replica, is_healthy in zip(replicas._replicas, states):
+        replica.is_healthy = is_healthy
+
+
+def test_healthy_replicas_round_robin(replicas: ReplicaSet, engines: list[AsyncEngine]) -> None:
+    # Nothing is read from a replica before its first check
+    assert replicas.get_engine() is None
+    set_healthy(replicas, True, True)
+    assert [replicas.get_engine() for _ in range(4)] == [engines[1], engines[2], engines[1], engines[2]]
+    set_healthy(replicas, False, True)
+    assert [replicas.get_engine() for _ in range(2)] == [engines[2], engines[2]]
+
+
+async def test_recent_writers(replicas: ReplicaSet) -> None:
+    assert not await replicas.has_recent_write("user")
+    await replicas.mark_write("user")
+    assert await replicas.has_recent_write("user")
+    assert not await replicas.has_recent_write("other")
+
+
+def test_session_routing(replicas: ReplicaSet, engines: list[AsyncEngine]) -> None:
+    set_healthy(replicas, True, False)
+    session = RoutingSession(bind=engines[0].sync_engine, replicas=replicas)
+    session.info["use_replica"] = True
+    assert session.get_bind(clause=select(User)) is engines[1].sync_engine
+    assert session.get_bind(clause=select(User).with_for_update()) is engines[0].sync_engine
+    # The session sticks to the primary once it has used it
+    assert session.get_bind(clause=select(User)) is engines[0].sync_engine
+
+    session = RoutingSession(bind=engines[0].sync_engine, replicas=replicas)
+    session.info["use_replica"] = True
+    assert session.get_bind(clause=update(User).values(is_active=True)) is engines[0].sync_engine
+    assert session.info["has_writes"]
+    assert session.get_bind(clause=select(User)) is engines[0].sync_engine
+
+
+async def test_commit_marks_recent_writer(replicas: ReplicaSet, engines: list[AsyncEngine]) -> None:
+    session_factory = sessionmaker(
+        engines[0], class_=RoutingAsyncSession, sync_session_class=RoutingSession, replicas=replicas
+    )
+    try:
+        async with session_factory() as session:
+            session.info["user_id"] = "reader"
+            await session.execute(select(User.id).limit(1))
+            await session.commit()
+            session.info["user_id"] = "writer"
+            await session.execute(text("SELECT 1"))
+            await session.commit()
+    except OSError:
+        pytest.skip("Database is unavailable")
+    assert not await replicas.has_recent_write("reader")
+    assert await replicas.has_recent_write("writer")
+
+
+async def test_primary_is_not_used_as_replica(replicas: ReplicaSet) -> None:
+    await replicas.check()
+    # The replicas are the primary itself, which is not in recovery
+    assert [replica.is_healthy for replica in replicas._replicas] == [False, False]
+    assert replicas.get_engine() is None
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from starlette.datastructures import Headers
+
+from core.config import settings
+from core.responses import is_not_modified, is_range_allowed, make_validators, parse_range_header
+
+VALIDATORS = make_validators(etag="abc", last_modified=datetime(2023, 10, 1, 12, 30, 15, 123456))
+LAST_MODIFIED = VALIDATORS.headers["Last-Modified"]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("bytes=0-99", [(0, 99)]),
+        ("bytes=100-", [(100, 999)]),
+        ("bytes=900-2000", [(900, 999)]),
+        ("bytes=-100", [(900, 999)]),
+        ("bytes=-2000", [(0, 999)]),
+        ("bytes=0-9, 20-29", [(0, 9), (20, 29)]),
+        ("bytes=20-29,0-9", [(0, 9), (20, 29)]),
+        ("bytes=0-9,5-19,20-29", [(0, 29)]),
+        ("bytes=0-9,-10", [(0, 9), (990, 999)]),
+        ("bytes=0-9,1000-1099", [(0, 9)]),
+    ],
+)
+def test_parse_range_header(value: str, expected: list[tuple[int, int]]) -> None:
+    assert parse_range_header(value, size=1000) == expected
+
+
+@pytest.mark.parametrize("value", ["bytes=1000-", "bytes=1000-1099,2000-", "bytes=-0"])
+def test_parse_range_header_unsatisfiable(value: str) -> None:
+    assert parse_range_header(value, size=1000) == []
+
+
+def test_parse_range_header_empty_file() -> None:
+    assert parse_range_header("bytes=-100", size=0) == []
+    assert parse_range_header("bytes=0-", size=0) == []
+
+
+@pytest.mark.parametrize(
+    "value", ["items=0-9", "bytes=", "bytes=-", "bytes=9-0", "bytes=a-9", "bytes=0-9,10", "bytes=--9", "bytes=+1-9"]
+)
+def test_parse_range_header_ignored(value: str) -> None:
+    assert parse_range_header(value, size=1000) is None
+
+
+def test_parse_range_header_too_many_ranges(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings.app, "max_byte_ranges", 2)
+    assert parse_range_header("bytes=0-0,2-2", size=1000) == [(0, 0), (2, 2)]
+    assert parse_range_header("bytes=0-0,2-2,4-4", size=1000) is None
+
+
+def test_validators() -> None:
+    assert VALIDATORS.etag == '"abc"'
+    assert VALIDATORS.last_modified == datetime(2023, 10, 1, 12, 30, 15, tzinfo=timezone.utc)
+    assert LAST_MODIFIED == "Sun, 01 Oct 2023 12:30:15 GMT"
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({}, False),
+        ({"If-None-Match": '"abc"'}, True),
+        ({"If-None-Match": 'W/"abc"'}, True),
+        ({"If-None-Match": '"xyz", "abc"'}, True),
+        ({"If-None-Match": "*"}, True),
+        ({"If-None-Match": '"xyz"'}, False),
+        ({"If-Modified-Since": LAST_MODIFIED}, True),
+        ({"If-Modified-Since": "Mon, 02 Oct 2023 00:00:00 GMT"}, True),
+        ({"If-Modified-Since": "Sat, 30 Sep 2023 00:00:00 GMT"}, False),
+        ({"If-Modified-Since": "yesterday"}, False),
+        # If-None-Match takes precedence over If-Modified-Since
+        ({"If-None-Match": '"xyz"', "If-Modified-Since": LAST_MODIFIED}, False),
+    ],
+)
+def test_is_not_modified(headers: dict[str, str], expected: bool) -> None:
+    assert is_not_modified(Headers(headers=headers), VALIDATORS) is expected
+
+
+@pytest.mark.parametrize(
+    "headers, expected",
+    [
+        ({}, True),
+        ({"If-Range": '"abc"'}, True),
+        ({"If-Range": '"xyz"'}, False),
+        # Weak validators never match
+        ({"If-Range": 'W/"abc"'}, False),
+        ({"If-Range": LAST_MODIFIED}, True),
+        ({"If-Range": "Sat, 30 Sep 2023 00:00:00 GMT"}, False),
+        ({"If-Range": "yesterday"}, False),
+    ],
+)
+def test_is_range_allowed(headers: dict[str, str], expected: bool) -> None:
+    assert is_range_allowed(Headers(headers=headers), VALIDATORS) is expected
+
+
+def test_is_not_modified_after_change() -> None:
+    changed = make_validators(etag="def", last_modified=VALIDATORS.last_modified + timedelta(seconds=1))
+    headers = Headers(headers={"If-None-Match": VALIDATORS.etag})
+    assert not is_not_modified(headers, changed)
+    assert not is_range_allowed(Headers(headers={"If-Range": LAST_MODIFIED}), changed)
@@ -0,0 +1,60 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from db.base import database
+from tests import API
+
+PATHS = ["/docs/report.pdf", "/docs/notes.txt", "/backup/site.tar.gz", "/backup/photos.zip", "/docs/old/report.txt"]
+
+
+@pytest.fixture
+def files(client: TestClient, auth_headers: dict[str, str]) -> dict[str, str]:
+    ids = {}
+    for path in PATHS:
+        response = client.put(
+            f"{API}/files/content", params={"path": path}, content=path.encode(), headers=auth_headers
+        )
+        ids[path] = response.json()["id"]
+    return ids
+
+
+def search(client: TestClient, headers: dict[str, str], **data: object) -> dict:
+    response = client.post(f"{API}/files/search", json=data, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def found_paths(result: dict) -> set[str]:
+    return {match["path"] for match in result["matches"]}
+
+
+def test_search_by_path_and_extension(client: TestClient, auth_headers: dict[str, str], files: dict[str, str]) -> None:
+    result = search(client, auth_headers, options={"path": "/docs", "extension": "txt"})
+    assert found_paths(result) == {"/docs/notes.txt", "/docs/old/report.txt"}
+    assert result["total"] == 2
+
+    result = search(client, auth_headers, options={"extension": ".tar.gz"})
+    assert found_paths(result) == {"/backup/site.tar.gz"}
+
+
+def test_search_pages(client: TestClient, auth_headers: dict[str, str], files: dict[str, str]) -> None:
+    options = {"limit": 2, "order_by": {"field": "name", "type": "asc"}}
+    pages = [search(client, auth_headers, options={**options, "offset": offset}) for offset in (0, 2, 4, 6)]
+    assert [page["total"] for page in pages] == [5, 5, 5, 5]
+    assert [match["name"] for page in pages for match in page["matches"]] == sorted(
+        path.rsplit("/", 1)[-1] for path in PATHS
+    )
+
+
+def test_fuzzy_search(client: TestClient, auth_headers: dict[str, str], files: dict[str, str]) -> None:
+    async def has_trigrams() -> bool:
+        async with database.session() as db:
+            results = await db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+            return results.scalar() is not None
+
+    if not client.portal.call(has_trigrams):  # type: ignore[union-attr]
+        pytest.skip("pg_trgm is unavailable")
+    result = search(client, auth_headers, query="reprot")
+    assert found_paths(result) >= {"/docs/report.pdf", "/docs/old/report.txt"}
+    assert all(match["rank"] is not None for match in result["matches"])
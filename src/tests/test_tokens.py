@@ -0,0 +1,65 @@
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core.exceptions import UnauthorizedException
+from db.base import database
+from repositories.users import users_crud
+from services.users import (
+    create_access_token,
+    deactivate_user,
+    get_claims_from_token,
+    update_user,
+    verified_tokens,
+)
+from tests import API
+
+
+def get_token(headers: dict[str, str]) -> str:
+    return headers["Authorization"].removeprefix("Bearer ")
+
+
+def test_verified_token_is_cached() -> None:
+    token = create_access_token(data={"sub": "cached", "uid": None, "ver": 3})
+    claims = get_claims_from_token(token=token)
+    assert (claims.username, claims.token_version) == ("cached", 3)
+    assert verified_tokens.get(hashlib.sha256(token.encode()).hexdigest()) == claims
+    assert get_claims_from_token(token=token) is claims
+
+
+def test_invalid_token() -> None:
+    with pytest.raises(UnauthorizedException):
+        get_claims_from_token(token=create_access_token(data={"sub": "user"}) + "x")
+
+
+def test_revoke_tokens(client: TestClient, auth_headers: dict[str, str]) -> None:
+    response = client.post(f"{API}/users/tokens/revoke", headers=auth_headers)
+    assert response.status_code == 204
+    # The token stays in the cache of verified tokens, but its version is outdated
+    assert client.get(f"{API}/users/me/usage", headers=auth_headers).status_code == 401
+
+
+def test_deactivated_user_tokens_stay_revoked(client: TestClient, auth_headers: dict[str, str]) -> None:
+    username = get_claims_from_token(token=get_token(auth_headers)).username
+
+    async def deactivate() -> None:
+        async with database.session() as db:
+            user = await users_crud.get_by_username(db, username=username)
+            await deactivate_user(db, user=user)
+
+    async def reactivate() -> None:
+        async with database.session() as db:
+            user = await users_crud.get_by_username(db, username=username)
+            await update_user(db, user=user, obj_in={"is_active": True})
+
+    assert client.get(f"{API}/users/me/usage", headers=auth_headers).status_code == 200
+    client.portal.call(deactivate)  # type: ignore[union-attr]
+    assert client.get(f"{API}/users/me/usage", headers=auth_headers).status_code == 401
+    # The tokens issued before the deactivation don't work again after a reactivation
+    client.portal.call(reactivate)  # type: ignore[union-attr]
+    assert client.get(f"{API}/users/me/usage", headers=auth_headers).status_code == 401
+
+    response = client.post(f"{API}/users/auth", data={"username": username, "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert client.get(f"{API}/users/me/usage", headers=headers).status_code == 200
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import typing as tp
+
+import pytest
+from fastapi.testclient import TestClient
+
+from repositories.files import files_crud
+from services.uploads import UPLOADS_DIRECTORY
+from tests import API
+
+DATA = os.urandom(300 * 1024)
+PART_SIZE = 128 * 1024
+
+
+def create_upload(client: TestClient, headers: dict[str, str], path: str) -> str:
+    response = client.post(f"{API}/files/uploads", json={"path": path, "size": len(DATA)}, headers=headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def upload_parts(client: TestClient, headers: dict[str, str], upload_id: str, offsets: tp.Iterable[int]) -> None:
+    for offset in offsets:
+        end = offset + PART_SIZE
+        part = DATA[offset:end]
+        response = client.put(
+            f"{API}/files/uploads/{upload_id}",
+            params={"offset": offset},
+            content=part,
+            headers={**headers, "X-Content-SHA256": hashlib.sha256(part).hexdigest()},
+        )
+        assert response.status_code == 200
+
+
+def download(client: TestClient, headers: dict[str, str], path: str) -> bytes:
+    response = client.get(f"{API}/files/download", params={"path": path, "compression_type": "none"}, headers=headers)
+    assert response.status_code == 200
+    return response.content
+
+
+def test_resumable_upload(client: TestClient, auth_headers: dict[str, str]) -> None:
+    upload_id = create_upload(client, auth_headers, "/uploads/data.bin")
+    upload_parts(client, auth_headers, upload_id, [2 * PART_SIZE, 0])
+
+    status = client.get(f"{API}/files/uploads/{upload_id}", headers=auth_headers).json()
+    assert status["received"] == len(DATA) - PART_SIZE
+    assert status["missing"] == [[PART_SIZE, 2 * PART_SIZE]]
+    response = client.post(f"{API}/files/uploads/{upload_id}/complete", headers=auth_headers)
+    assert response.status_code == 400
+
+    upload_parts(client, auth_headers, upload_id, [PART_SIZE])
+    response = client.post(f"{API}/files/uploads/{upload_id}/complete", headers=auth_headers)
+    assert response.status_code == 201
+    assert download(client, auth_headers, "/uploads/data.bin") == DATA
+    assert not (UPLOADS_DIRECTORY / upload_id.replace("-", "")).exists()
+    assert client.get(f"{API}/files/uploads/{upload_id}", headers=auth_headers).status_code == 404
+
+
+def test_part_checksum_mismatch(client: TestClient, auth_headers: dict[str, str]) -> None:
+    upload_id = create_upload(client, auth_headers, "/uploads/data.bin")
+    response = client.put(
+        f"{API}/files/uploads/{upload_id}",
+        params={"offset": 0},
+        content=DATA[:PART_SIZE],
+        headers={**auth_headers, "X-Content-SHA256": hashlib.sha256(b"other").hexdigest()},
+    )
+    assert response.status_code == 400
+    status = client.get(f"{API}/files/uploads/{upload_id}", headers=auth_headers).json()
+    assert status["received"] == 0
+
+
+def test_complete_retried_after_failed_save(
+    client: TestClient, auth_headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    upload_id = create_upload(client, auth_headers, "/uploads/data.bin")
+    upload_parts(client, auth_headers, upload_id, range(0, len(DATA), PART_SIZE))
+
+    async def lost_connection(*args: tp.Any, **kwargs: tp.Any) -> tp.NoReturn:
+        raise ConnectionError("Connection lost")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(files_crud, "create", lost_connection)
+        with pytest.raises(ConnectionError):
+            client.post(f"{API}/files/uploads/{upload_id}/complete", headers=auth_headers)
+
+    # Neither the upload nor its content is gone with the failed save
+    response = client.post(f"{API}/files/uploads/{upload_id}/complete", headers=auth_headers)
+    assert response.status_code == 201
+    assert download(client, auth_headers, "/uploads/data.bin") == DATA
@@ -0,0 +1,85 @@
+import os
+import typing as tp
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+
+from core import exceptions
+from core.config import settings
+from repositories.usage import usage_crud
+from services.files import get_storage_left, update_usage
+from tests import API
+
+
+async def test_update_usage(db: AsyncSession, user_id: uuid.UUID) -> None:
+    await update_usage(db, user_id=user_id, size=600, count=1)
+    await update_usage(db, user_id=user_id, size=400, count=2)
+    await update_usage(db, user_id=user_id, size=-100, count=-1)
+    assert tuple(await usage_crud.add(db, user_id=user_id, size=0, count=0)) == (900, 2)
+
+
+async def test_update_usage_within_quota(
+    db: AsyncSession, user_id: uuid.UUID, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings.app, "user_storage_quota", 1000)
+    await update_usage(db, user_id=user_id, size=1000, count=1)
+    assert await get_storage_left(db, user_id=user_id, path="/file") == 0
+
+
+async def test_update_usage_beyond_quota(
+    db: AsyncSession, user_id: uuid.UUID, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings.app, "user_storage_quota", 1000)
+    await update_usage(db, user_id=user_id, size=600, count=1)
+    with pytest.raises(exceptions.PayloadTooLargeException):
+        await update_usage(db, user_id=user_id, size=600, count=1)
+    # The whole transaction is rolled back
+    assert await usage_crud.get_by_user(db, user_id=user_id) is None
+
+
+async def test_update_usage_freeing_space_beyond_quota(
+    db: AsyncSession, user_id: uuid.UUID, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    await update_usage(db, user_id=user_id, size=1500, count=2)
+    # Users over a lowered quota can still delete their files
+    monkeypatch.setattr(settings.app, "user_storage_quota", 1000)
+    await update_usage(db, user_id=user_id, size=-100, count=-1)
+    assert await get_storage_left(db, user_id=user_id, path="/file") == 0
+
+
+async def test_get_storage_left(db: AsyncSession, user_id: uuid.UUID, monkeypatch: pytest.MonkeyPatch) -> None:
+    assert await get_storage_left(db, user_id=user_id, path="/file") is None
+    monkeypatch.setattr(settings.app, "user_storage_quota", 1000)
+    assert await get_storage_left(db, user_id=user_id, path="/file") == 1000
+    await update_usage(db, user_id=user_id, size=300, count=1)
+    assert await get_storage_left(db, user_id=user_id, path="/file") == 700
+
+
+def test_upload_beyond_quota_is_rejected_unparsed(
+    client: TestClient, auth_headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings.app, "user_storage_quota", 1000)
+
+    async def parse_form(*args: tp.Any, **kwargs: tp.Any) -> tp.NoReturn:
+        raise AssertionError("The body is parsed")
+
+    monkeypatch.setattr(Request, "_get_form", parse_form)
+    response = client.post(
+        f"{API}/files/upload", data={"path": "/big.bin"}, files={"file": os.urandom(256 * 1024)}, headers=auth_headers
+    )
+    assert response.status_code == 413
+
+
+def test_upload_within_quota(
+    client: TestClient, auth_headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings.app, "user_storage_quota", 1000)
+    response = client.post(
+        f"{API}/files/upload", data={"path": "/small.bin"}, files={"file": b"data"}, headers=auth_headers
+    )
+    assert response.status_code == 201
+    usage = client.get(f"{API}/users/me/usage", headers=auth_headers).json()
+    assert usage == {"used_bytes": 4, "file_count": 1, "quota": 1000, "available": 996}
@@ -0,0 +1,23 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from core.utils import Cursor
+
+
+@pytest.mark.parametrize(
+    "created_at",
+    [datetime(2023, 10, 1, 12, 30, 15, 123456), datetime(2023, 10, 1, 12, 30, 15, tzinfo=timezone.utc)],
+)
+def test_cursor_round_trip(created_at: datetime) -> None:
+    cursor = Cursor(created_at=created_at, id=uuid.uuid4())
+    encoded = cursor.encode()
+    assert "=" not in encoded
+    assert Cursor.decode(encoded) == cursor
+
+
+@pytest.mark.parametrize("value", ["", "not a cursor", Cursor.__name__])
+def test_cursor_decode_malformed(value: str) -> None:
+    with pytest.raises(ValueError):
+        Cursor.decode(value)
@@ -0,0 +1,75 @@
+import errno
+import os
+import typing as tp
+from pathlib import Path
+
+import pytest
+
+from core import writers
+from core.writers import kernel_copy
+
+DATA = os.urandom(256 * 1024)
+
+
+@pytest.fixture
+def descriptors(tmp_path: Path) -> tp.Generator[tuple[int, int, Path], None, None]:
+    source_path, target_path = tmp_path / "source", tmp_path / "target"
+    source_path.write_bytes(DATA)
+    in_fd = os.open(source_path, os.O_RDONLY)
+    out_fd = os.open(target_path, os.O_WRONLY | os.O_CREAT)
+    yield in_fd, out_fd, target_path
+    os.close(in_fd)
+    os.close(out_fd)
+
+
+def unsupported(in_fd: int, out_fd: int, offset: int, count: int) -> int:
+    raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+
+def in_parts(in_fd: int, out_fd: int, offset: int, count: int) -> int:
+    return os.write(out_fd, os.pread(in_fd, min(count, 1000), offset))
+
+
+def test_kernel_copy(descriptors: tuple[int, int, Path]) -> None:
+    in_fd, out_fd, target_path = descriptors
+    assert kernel_copy(in_fd, out_fd, size=len(DATA))
+    assert target_path.read_bytes() == DATA
+
+
+def test_kernel_copy_falls_back_to_next_copy(
+    descriptors: tuple[int, int, Path], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    in_fd, out_fd, target_path = descriptors
+    monkeypatch.setattr(writers, "_KERNEL_COPIES", [unsupported, in_parts])
+    assert kernel_copy(in_fd, out_fd, size=len(DATA))
+    assert target_path.read_bytes() == DATA
+
+
+def test_kernel_copy_unsupported(descriptors: tuple[int, int, Path], monkeypatch: pytest.MonkeyPatch) -> None:
+    in_fd, out_fd, target_path = descriptors
+    monkeypatch.setattr(writers, "_KERNEL_COPIES", [unsupported, unsupported])
+    assert not kernel_copy(in_fd, out_fd, size=len(DATA))
+    assert target_path.read_bytes() == b""
+
+
+def test_kernel_copy_fails_after_partial_copy(
+    descriptors: tuple[int, int, Path], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    in_fd, out_fd, _ = descriptors
+
+    def interrupted(in_fd: int, out_fd: int, offset: int, count: int) -> int:
+        if offset:
+            raise OSError(errno.EINVAL, os.strerror(errno.EINVAL))
+        return in_parts(in_fd, out_fd, offset, count)
+
+    # Some bytes are written already, so the next copy can't start over
+    monkeypatch.setattr(writers, "_KERNEL_COPIES", [interrupted, in_parts])
+    with pytest.raises(OSError):
+        kernel_copy(in_fd, out_fd, size=len(DATA))
+
+
+def test_kernel_copy_short_source(descriptors: tuple[int, int, Path]) -> None:
+    in_fd, out_fd, _ = descriptors
+    with pytest.raises(OSError) as exc_info:
+        kernel_copy(in_fd, out_fd, size=len(DATA) + 1)
+    assert exc_info.value.errno == errno.EIO